@@ -1,28 +1,122 @@
-from flask import Flask, render_template, redirect, url_for, flash, request, jsonify, session
+from flask import Flask, render_template, redirect, url_for, flash, request, jsonify, session, abort, g, send_from_directory, send_file
 from flask_sqlalchemy import SQLAlchemy
+import flask_migrate
 from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
+from werkzeug.wsgi import wrap_file
+from werkzeug.http import is_resource_modified
+from sqlalchemy import event
 import os
-from datetime import datetime
+from datetime import datetime, timedelta
 import base64
-from PIL import Image, ImageDraw, ImageFilter
+import binascii
+import hashlib
+import inspect
+import json
+import time
+from PIL import Image, ImageDraw, ImageFilter, ImageFont, ImageOps
 import io
 import random
+import traceback
+from collections import Counter
+import click
+from markupsafe import Markup, escape
+from PyPDF2 import PdfReader, PdfWriter
+
+import content_index
+import metrics
+import query_plans
+import route_bench
+import search_index
+import sqlite_tuning
+import synthetic_data
+from pdf_store import PDFStore, UploadStaging
+from sql_profiler import SQLProfiler
 
 # Initialize Flask app
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-key-for-testing')
 app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///bookverse.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Per-process pool; each gunicorn worker gets its own
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = sqlite_tuning.engine_options(
+    app.config['SQLALCHEMY_DATABASE_URI'], pool_size=int(os.environ.get('DB_POOL_SIZE', 5)))
+app.config['SQLITE_PRAGMAS'] = dict(sqlite_tuning.PRAGMAS)  # set on every connection to an SQLite file
 app.config['UPLOAD_FOLDER'] = os.path.join(os.getcwd(), 'static', 'uploads')
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max upload
+app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max request; larger PDFs use chunked uploads
+app.config['UPLOAD_CHUNK_SIZE'] = 8 * 1024 * 1024  # chunk size suggested to chunked upload clients
+app.config['PDF_MAX_UPLOAD_SIZE'] = 1024 * 1024 * 1024  # 1GB per chunked upload
+app.config['UPLOAD_SESSION_MAX_AGE'] = 24 * 60 * 60  # unfinished chunked uploads are discarded after a day
+app.config['PDF_CHUNK_SIZE'] = 64 * 1024  # 64KB per streamed chunk
+app.config['BOOKS_PER_PAGE'] = 24
+app.config['DISCUSSIONS_PER_PAGE'] = 20
+app.config['REPLIES_PER_PAGE'] = 50
+app.config['REVIEWS_PER_PAGE'] = 20
+app.config['SUPPORT_QUERIES_PER_PAGE'] = 20
+app.config['CONTENT_RESULTS'] = 20  # page matches shown alongside title matches on /search
+app.config['RECENT_REVIEWS'] = 10  # reviews shown on a book page; the rest are on /book/<id>/reviews
+app.config['ARTWORK_FOLDER'] = os.environ.get('ARTWORK_FOLDER', os.path.join(app.instance_path, 'artwork'))
+app.config['ARTWORK_VARIANTS'] = 4  # differently seeded renders of the home page artwork
+app.config['AVATAR_CACHE_FOLDER'] = os.environ.get('AVATAR_CACHE_FOLDER', os.path.join(app.instance_path, 'avatars'))
+app.config['AVATAR_SIZES'] = (24, 48, 100)
+app.config['AVATAR_CACHE_MAX_FILES'] = 10000  # least recently used variants are evicted beyond this
+app.config['RECENT_ACTIVITY_SLOTS'] = 20  # newest rows of each kind kept in the dashboard feed
+app.config['DASHBOARD_OPEN_QUERIES'] = 10
+app.config['JOB_TIMEOUT'] = int(os.environ.get('JOB_TIMEOUT', 300))  # seconds before a running job is killed
+app.config['JOB_MAX_ATTEMPTS'] = 3
+app.config['JOB_RETRY_DELAY'] = 30  # seconds before the first retry, doubled for each later one
+app.config['JOB_POLL_INTERVAL'] = 1.0  # seconds an idle worker waits before checking the queue again
+app.config['PAGE_CACHE_FOLDER'] = os.environ.get('PAGE_CACHE_FOLDER', os.path.join(app.instance_path, 'pages'))
+app.config['PAGE_CACHE_MAX_BYTES'] = 512 * 1024 * 1024  # least recently used page files are evicted beyond this
+app.config['PAGE_RANGE_MAX'] = 10  # most pages returned by one /pages/<first>-<last> request
+app.config['SQL_PROFILING'] = os.environ.get('SQL_PROFILING', '0') == '1'  # per-request SQL stats on /admin/perf
+app.config['SQL_PROFILE_HISTORY'] = 200  # request profiles kept per worker process
+app.config['SQL_QUERY_BUDGET'] = 30  # requests running more statements are flagged as N+1 suspects
+app.config['SQL_REPEAT_BUDGET'] = 5  # ...as are requests repeating one statement more often than this
+app.config['SQL_TIME_BUDGET'] = 0.5  # seconds of SQL per request before it is flagged
+app.config['METRICS_DB'] = os.environ.get('METRICS_DB', os.path.join(app.instance_path, 'metrics.db'))  # shared by the workers on a host
+app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')  # /metrics requires it as a bearer token, and is off if unset
+app.config['PDF_STORE_ROOT'] = os.environ.get('PDF_STORE_ROOT', os.path.join(app.instance_path, 'pdfs'))
 
 # Ensure upload directory exists
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
+pdf_store = PDFStore(app.config['PDF_STORE_ROOT'], app.config['PDF_CHUNK_SIZE'])
+upload_staging = UploadStaging(pdf_store)
+
 # Initialize extensions
 db = SQLAlchemy(app)
+profiler = SQLProfiler(capacity=app.config['SQL_PROFILE_HISTORY'],
+                       max_queries=app.config['SQL_QUERY_BUDGET'],
+                       max_repeats=app.config['SQL_REPEAT_BUDGET'],
+                       max_sql_time=app.config['SQL_TIME_BUDGET'],
+                       enabled=app.config['SQL_PROFILING'])
+metrics_registry = metrics.create_registry(app.config['METRICS_DB'])
+http_requests = metrics_registry.counter(
+    'bookverse_http_requests_total', 'HTTP requests by endpoint, method and status', ('endpoint', 'method', 'status'))
+http_latency = metrics_registry.histogram(
+    'bookverse_http_request_duration_seconds', 'Time to produce a response, excluding streaming the body',
+    ('endpoint',))
+http_response_size = metrics_registry.histogram(
+    'bookverse_http_response_size_bytes', 'Size of responses with a known length', ('endpoint',),
+    buckets=metrics.SIZE_BUCKETS)
+http_in_progress = metrics_registry.gauge(
+    'bookverse_http_requests_in_progress', 'Requests being handled right now', ('endpoint',))
+pdf_bytes_served = metrics_registry.counter(
+    'bookverse_pdf_bytes_served_total', 'Bytes of PDF content sent to readers', ('route',))
+uploads_total = metrics_registry.counter(
+    'bookverse_uploads_total', 'PDF uploads stored, by upload method', ('method',))
+reviews_total = metrics_registry.counter(
+    'bookverse_reviews_total', 'Reviews submitted, by whether they were new or replaced an earlier one', ('action',))
+cache_requests = metrics_registry.counter(
+    'bookverse_cache_requests_total', 'Lookups in the on-disk render caches', ('cache', 'result'))
+
+with app.app_context():
+    sqlite_tuning.configure_engine(db.engine, app.config['SQLITE_PRAGMAS'])
+    profiler.install(db.engine)
+migrate = flask_migrate.Migrate(app, db, directory=os.path.join(app.root_path, 'migrations'),
+                                render_as_batch=True)
 login_manager = LoginManager(app)
 login_manager.login_view = 'login'
 
@@ -34,9 +128,11 @@ class User(UserMixin, db.Model):
     password_hash = db.Column(db.String(128))
     full_name = db.Column(db.String(100))
     user_type = db.Column(db.String(20), default='reader')
-    avatar = db.Column(db.Text)
+    # Source image as a data URI, read only when rendering size variants
+    avatar = db.deferred(db.Column(db.Text))
+    avatar_sha256 = db.Column(db.String(64))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    books = db.relationship('Book', backref='author', lazy=True)
+    books = db.relationship('Book', backref=db.backref('author', lazy='joined'), lazy=True)
     
     def set_password(self, password):
         self.password_hash = generate_password_hash(password)
@@ -48,29 +144,60 @@ class Book(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text)
-    author_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    pdf_data = db.Column(db.LargeBinary)
+    author_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    # Legacy in-row storage; new PDFs live in pdf_store and only their hash is kept here
+    pdf_data = db.deferred(db.Column(db.LargeBinary))
+    pdf_sha256 = db.Column(db.String(64), index=True)
+    pdf_size = db.Column(db.Integer)
+    pdf_mimetype = db.Column(db.String(100))
+    pdf_updated_at = db.Column(db.DateTime)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     amazon_link = db.Column(db.String(255))
+    # Filled in by the process_pdf background job
+    page_count = db.Column(db.Integer)
+    pdf_info = db.Column(db.Text)  # JSON document information dictionary
     reviews = db.relationship('Review', backref='book', lazy=True)
-    discussions = db.relationship('Discussion', backref='book', lazy=True)
+    discussions = db.relationship('Discussion', backref=db.backref('book', lazy='joined'), lazy=True)
+    stats = db.relationship('BookStats', backref='book', uselist=False, lazy='joined',
+                            cascade='all, delete-orphan')
+    
+    def set_pdf(self, stream, mimetype='application/pdf'):
+        """Copy an uploaded PDF into the content-addressed store and record its metadata"""
+        self.set_stored_pdf(*pdf_store.put(stream), mimetype=mimetype)
+    
+    def set_stored_pdf(self, sha256, size, mimetype='application/pdf'):
+        """Point the book at a PDF that is already in the content-addressed store"""
+        self.pdf_sha256 = sha256
+        self.pdf_size = size
+        self.pdf_mimetype = mimetype
+        self.pdf_data = None
+        self.pdf_updated_at = datetime.utcnow()
+    
+    __table_args__ = (
+        # Supports the newest-first keyset pagination used by /browse
+        db.Index('ix_book_created_at_id', 'created_at', 'id'),
+    )
 
 class UserLibrary(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    book_id = db.Column(db.Integer, db.ForeignKey('book.id'), nullable=False)
+    book_id = db.Column(db.Integer, db.ForeignKey('book.id'), nullable=False, index=True)
     added_at = db.Column(db.DateTime, default=datetime.utcnow)
     user = db.relationship('User', backref=db.backref('library', lazy=True))
     book = db.relationship('Book')
+    
+    __table_args__ = (db.Index('ix_user_library_user_id_book_id', 'user_id', 'book_id', unique=True),)
 
 class Review(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     book_id = db.Column(db.Integer, db.ForeignKey('book.id'), nullable=False)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     rating = db.Column(db.Integer, nullable=False)
     comment = db.Column(db.Text)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    user = db.relationship('User', backref=db.backref('reviews', lazy=True))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    user = db.relationship('User', backref=db.backref('reviews', lazy=True), lazy='joined')
+    
+    __table_args__ = (db.Index('ix_review_book_id_created_at', 'book_id', 'created_at'),)
 
 class Discussion(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -78,44 +205,176 @@ class Discussion(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     title = db.Column(db.String(200), nullable=False)
     content = db.Column(db.Text, nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    user = db.relationship('User', backref=db.backref('discussions', lazy=True))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    # Maintained by add_reply; last_activity_at is the later of created_at and last_reply_at
+    reply_count = db.Column(db.Integer, nullable=False, default=0)
+    last_reply_at = db.Column(db.DateTime)
+    last_activity_at = db.Column(db.DateTime, default=datetime.utcnow)
+    user = db.relationship('User', backref=db.backref('discussions', lazy=True), lazy='joined')
     replies = db.relationship('DiscussionReply', backref='discussion', lazy=True)
+    
+    __table_args__ = (
+        db.Index('ix_discussion_last_activity_at_id', 'last_activity_at', 'id'),
+        db.Index('ix_discussion_book_id_last_activity_at', 'book_id', 'last_activity_at', 'id'),
+        db.Index('ix_discussion_user_id_last_activity_at', 'user_id', 'last_activity_at', 'id'),
+    )
 
 class DiscussionReply(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     discussion_id = db.Column(db.Integer, db.ForeignKey('discussion.id'), nullable=False)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     content = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    user = db.relationship('User', backref=db.backref('replies', lazy=True))
+    user = db.relationship('User', backref=db.backref('replies', lazy=True), lazy='joined')
+    
+    __table_args__ = (db.Index('ix_discussion_reply_discussion_id_created_at', 'discussion_id', 'created_at', 'id'),)
 
 class SupportQuery(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     subject = db.Column(db.String(200), nullable=False)
     message = db.Column(db.Text, nullable=False)
-    status = db.Column(db.String(20), default='open')
+    # active_history loads the old status on change so the open-query counter can be adjusted
+    status = db.column_property(db.Column(db.String(20), default='open'), active_history=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     response = db.Column(db.Text)
-    user = db.relationship('User', backref=db.backref('queries', lazy=True))
+    user = db.relationship('User', backref=db.backref('queries', lazy=True), lazy='joined')
+    
+    __table_args__ = (db.Index('ix_support_query_status_created_at', 'status', 'created_at'),)
 
 class Badge(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     badge_type = db.Column(db.String(50), nullable=False)
     badge_name = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text)
     awarded_at = db.Column(db.DateTime, default=datetime.utcnow)
     user = db.relationship('User', backref=db.backref('badges', lazy=True))
 
+class BookStats(db.Model):
+    """Per-book counters kept up to date in the same transaction as the rows they count"""
+    COUNTERS = ('review_count', 'rating_sum', 'rating_1_count', 'rating_2_count', 'rating_3_count',
+                'rating_4_count', 'rating_5_count', 'discussion_count', 'library_count')
+    
+    book_id = db.Column(db.Integer, db.ForeignKey('book.id'), primary_key=True)
+    review_count = db.Column(db.Integer, nullable=False, default=0)
+    rating_sum = db.Column(db.Integer, nullable=False, default=0)
+    rating_1_count = db.Column(db.Integer, nullable=False, default=0)
+    rating_2_count = db.Column(db.Integer, nullable=False, default=0)
+    rating_3_count = db.Column(db.Integer, nullable=False, default=0)
+    rating_4_count = db.Column(db.Integer, nullable=False, default=0)
+    rating_5_count = db.Column(db.Integer, nullable=False, default=0)
+    discussion_count = db.Column(db.Integer, nullable=False, default=0)
+    library_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __init__(self, **kwargs):
+        for name in self.COUNTERS:
+            kwargs.setdefault(name, 0)
+        super().__init__(**kwargs)
+    
+    @property
+    def average_rating(self):
+        return self.rating_sum / self.review_count if self.review_count else 0
+    
+    @property
+    def rating_histogram(self):
+        return {rating: getattr(self, f'rating_{rating}_count') for rating in range(1, 6)}
+
+class SiteCounter(db.Model):
+    """Named site-wide counters, maintained by the mapper events below"""
+    name = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+class RecentActivity(db.Model):
+    """Fixed-size ring of the newest row ids of each kind for the admin dashboard.
+
+    Entry ``seq`` of a kind is written to slot ``seq % RECENT_ACTIVITY_SLOTS``,
+    overwriting the oldest entry, so the table never grows past
+    kinds x slots rows.
+    """
+    kind = db.Column(db.String(20), primary_key=True)
+    slot = db.Column(db.Integer, primary_key=True)
+    seq = db.Column(db.Integer, nullable=False)
+    subject_id = db.Column(db.Integer, nullable=False)
+    
+    __table_args__ = (db.Index('ix_recent_activity_kind_seq', 'kind', 'seq'),)
+
+class BookPage(db.Model):
+    """Size and extracted text of one page of a book's PDF"""
+    book_id = db.Column(db.Integer, db.ForeignKey('book.id'), primary_key=True)
+    page_number = db.Column(db.Integer, primary_key=True)  # 1-based
+    width = db.Column(db.Float)
+    height = db.Column(db.Float)
+    rotation = db.Column(db.Integer, default=0)
+    text = db.deferred(db.Column(db.Text))
+
+class Job(db.Model):
+    """Durable background job, claimed and run by the worker processes in worker.py.
+
+    ``attempts`` is incremented on every claim and doubles as a version number,
+    so a worker whose lease has expired cannot overwrite the outcome of a
+    later attempt.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text, nullable=False, default='{}')
+    book_id = db.Column(db.Integer, index=True)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, done, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=3)
+    timeout = db.Column(db.Integer, nullable=False, default=300)
+    run_after = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    lease_expires_at = db.Column(db.DateTime)
+    worker = db.Column(db.String(100))
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+    
+    __table_args__ = (db.Index('ix_job_status_run_after', 'status', 'run_after'),)
+
+@app.before_request
+def start_request_metrics():
+    g.metrics_endpoint = request.endpoint or 'unmatched'
+    g.metrics_started = time.perf_counter()
+    http_in_progress.inc(endpoint=g.metrics_endpoint)
+
+def finish_request_metrics(status, size=None):
+    started = g.pop('metrics_started', None)
+    if started is None:
+        return
+    endpoint = g.metrics_endpoint
+    http_in_progress.dec(endpoint=endpoint)
+    http_requests.inc(endpoint=endpoint, method=request.method, status=status)
+    http_latency.observe(time.perf_counter() - started, endpoint=endpoint)
+    if size is not None:
+        http_response_size.observe(size, endpoint=endpoint)
+
+@app.before_request
+def start_sql_profile():
+    if request.endpoint != 'static':
+        profiler.start(request.method, request.full_path.rstrip('?'))
+
+@app.after_request
+def finish_sql_profile(response):
+    profiler.finish(request.endpoint, response.status_code)
+    finish_request_metrics(response.status_code, response.content_length)
+    return response
+
+@app.teardown_request
+def abandon_sql_profile(exception=None):
+    # Requests that raised skip after_request; record them as server errors
+    if exception is not None:
+        profiler.finish(request.endpoint, 500)
+        finish_request_metrics(500)
+
 @login_manager.user_loader
 def load_user(user_id):
     return User.query.get(int(user_id))
 
 # Helper functions
-def create_cozy_corner_image(width=500, height=300):
+def create_cozy_corner_image(width=500, height=300, seed=None):
     """Create a cozy reading corner image for the home page"""
+    rng = random.Random(seed)
     img = Image.new('RGBA', (width, height), (255, 0, 0, 0))
     draw = ImageDraw.Draw(img)
     
@@ -125,10 +384,10 @@ def create_cozy_corner_image(width=500, height=300):
     
     # Add subtle texture to wall
     for i in range(1000):
-        x = random.randint(0, width)
-        y = random.randint(0, height)
+        x = rng.randint(0, width)
+        y = rng.randint(0, height)
         r, g, b = wall_color
-        variation = random.randint(-10, 10)
+        variation = rng.randint(-10, 10)
         texture_color = (r + variation, g + variation, b + variation)
         draw.point([x, y], fill=texture_color)
     
@@ -140,9 +399,9 @@ def create_cozy_corner_image(width=500, height=300):
     for i in range(20):
         y = 2*height//3 + i * 20
         if y < height:
-            plank_color = (floor_color[0] + random.randint(-20, 20),
-                         floor_color[1] + random.randint(-20, 20),
-                         floor_color[2] + random.randint(-20, 20))
+            plank_color = (floor_color[0] + rng.randint(-20, 20),
+                         floor_color[1] + rng.randint(-20, 20),
+                         floor_color[2] + rng.randint(-20, 20))
             draw.rectangle([0, y, width, y + 15], fill=plank_color)
     
     # Cozy reading nook - large bookshelf on the left
@@ -168,9 +427,9 @@ def create_cozy_corner_image(width=500, height=300):
         if y_pos < 2*height//3:
             x_pos = 60
             while x_pos < 290:
-                book_width = random.randint(15, 30)
-                book_height = random.randint(70, 90)
-                book_color = random.choice(book_colors)
+                book_width = rng.randint(15, 30)
+                book_height = rng.randint(70, 90)
+                book_color = rng.choice(book_colors)
                 
                 if x_pos + book_width < 290:
                     # Draw book
@@ -183,15 +442,50 @@ def create_cozy_corner_image(width=500, height=300):
     # Apply a soft blur for a dreamy effect
     img = img.filter(ImageFilter.GaussianBlur(radius=1))
     
-    # Convert to base64 for embedding in HTML
-    buffered = io.BytesIO()
-    img.save(buffered, format="PNG")
-    img_str = base64.b64encode(buffered.getvalue()).decode('utf-8')
-    
-    return f"data:image/png;base64,{img_str}"
+    return img
+
+# Fingerprint of the drawing code; a change to it invalidates every cached render
+COZY_CORNER_VERSION = hashlib.sha256(inspect.getsource(create_cozy_corner_image).encode('utf-8')).hexdigest()[:12]
+
+_cozy_corner_files = []
+
+def get_cozy_corner_files():
+    """Render the home page artwork variants once and return their file names.
+
+    Renders are written to ARTWORK_FOLDER under names containing the drawing
+    code fingerprint, so they survive restarts and are shared by all workers
+    until the drawing code changes.
+    """
+    if _cozy_corner_files:
+        return _cozy_corner_files
+    
+    folder = app.config['ARTWORK_FOLDER']
+    os.makedirs(folder, exist_ok=True)
+    files = []
+    for variant in range(app.config['ARTWORK_VARIANTS']):
+        filename = f'cozy-corner-{COZY_CORNER_VERSION}-{variant}.png'
+        path = os.path.join(folder, filename)
+        if not os.path.exists(path):
+            temp_path = f'{path}.{os.getpid()}.tmp'
+            create_cozy_corner_image(seed=variant).save(temp_path, format='PNG', optimize=True)
+            os.replace(temp_path, path)
+        files.append(filename)
+    
+    _cozy_corner_files[:] = files
+    return _cozy_corner_files
+
+@app.cli.command('render-artwork')
+def render_artwork_command():
+    """Pre-render the home page artwork and remove renders of older drawing code"""
+    current = get_cozy_corner_files()
+    for filename in os.listdir(app.config['ARTWORK_FOLDER']):
+        if filename.startswith('cozy-corner-') and filename not in current:
+            os.remove(os.path.join(app.config['ARTWORK_FOLDER'], filename))
+    for filename in current:
+        click.echo(os.path.join(app.config['ARTWORK_FOLDER'], filename))
 
 def generate_avatar(username, email, width=100, height=100):
-    """Generate an avatar based on user initials"""
+    """Generate an avatar image based on user initials"""
     img = Image.new('RGB', (width, height), color=(73, 109, 137))
     d = ImageDraw.Draw(img)
     
@@ -203,14 +497,993 @@ def generate_avatar(username, email, width=100, height=100):
     
     # Calculate text position and size
     font_size = int(width / 2)
-    d.text((width/2, height/2), initials, fill=(255, 255, 255), anchor="mm")
+    font = ImageFont.load_default(size=font_size)
+    d.text((width/2, height/2), initials, fill=(255, 255, 255), font=font, anchor="mm")
     
-    # Convert to base64 for embedding in HTML
-    buffered = io.BytesIO()
-    img.save(buffered, format="PNG")
-    img_str = base64.b64encode(buffered.getvalue()).decode('utf-8')
+    return img
+
+def avatar_version(user):
+    """Short identifier of a user's current avatar, used in cache keys and URLs"""
+    if user.avatar_sha256:
+        return user.avatar_sha256[:16]
+    # Generated avatars depend only on the name they are drawn from
+    return 'initials-' + hashlib.sha256((user.username or user.email).encode('utf-8')).hexdigest()[:8]
+
+@app.template_global()
+def avatar_url(user, size=48):
+    """URL of a user's avatar at one of the fixed AVATAR_SIZES"""
+    return url_for('avatar', user_id=user.id, size=size, v=avatar_version(user))
+
+def evict_avatar_cache():
+    """Remove the least recently used variants once the cache exceeds its file budget"""
+    folder = app.config['AVATAR_CACHE_FOLDER']
+    entries = [entry for entry in os.scandir(folder) if entry.name.endswith('.png')]
+    excess = len(entries) - app.config['AVATAR_CACHE_MAX_FILES']
+    if excess <= 0:
+        return
+    
+    entries.sort(key=lambda entry: entry.stat().st_mtime)
+    for entry in entries[:excess]:
+        try:
+            os.remove(entry.path)
+        except FileNotFoundError:
+            pass
+
+def get_avatar_variant(user, size):
+    """Return the path of a user's avatar rendered at size, creating it on first use.
+
+    Variants are cached on disk under a key that includes the avatar hash, so
+    a changed avatar never serves a stale image; cache hits refresh the file's
+    mtime so eviction drops the least recently used variants first.
+    """
+    folder = app.config['AVATAR_CACHE_FOLDER']
+    path = os.path.join(folder, f'{user.id}-{size}-{avatar_version(user)}.png')
+    if os.path.exists(path):
+        os.utime(path)
+        cache_requests.inc(cache='avatar', result='hit')
+        return path
+    cache_requests.inc(cache='avatar', result='miss')
+    
+    if user.avatar_sha256:
+        image_data = base64.b64decode(user.avatar.split(',', 1)[1])
+        img = ImageOps.fit(Image.open(io.BytesIO(image_data)).convert('RGB'), (size, size), Image.LANCZOS)
+    else:
+        img = generate_avatar(user.username, user.email, size, size)
+    
+    os.makedirs(folder, exist_ok=True)
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    img.save(temp_path, format='PNG', optimize=True)
+    os.replace(temp_path, path)
+    evict_avatar_cache()
+    return path
+
+class PDFBlobFile:
+    """Seekable read-only file object over a book's pdf_data blob.
+
+    The blob handle is reopened for every read so no SQLite lock is held while
+    a slow client downloads the rest of the file.
+    """
+    def __init__(self, connection, book_id):
+        self.connection = connection
+        self.book_id = book_id
+        self.position = 0
+        with self._open() as blob:
+            self.size = len(blob)
+
+    def _open(self):
+        return self.connection.driver_connection.blobopen(
+            Book.__tablename__, 'pdf_data', self.book_id, readonly=True
+        )
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self.size - self.position
+        with self._open() as blob:
+            blob.seek(min(self.position, self.size))
+            data = blob.read(size)
+        self.position += len(data)
+        return data
+
+    def seek(self, offset, whence=0):
+        if whence == 1:
+            offset += self.position
+        elif whence == 2:
+            offset += self.size
+        self.position = max(offset, 0)
+        return self.position
+
+    def tell(self):
+        return self.position
+
+    def close(self):
+        self.connection.close()
+
+def open_pdf_blob(book_id):
+    """Open a legacy in-row PDF as a file object without materializing the whole blob.
+
+    SQLite connections that support incremental blob I/O read straight from the
+    database pages; other backends fall back to loading the column once.
+    """
+    if db.engine.dialect.name == 'sqlite':
+        connection = db.engine.raw_connection()
+        if hasattr(connection.driver_connection, 'blobopen'):
+            try:
+                return PDFBlobFile(connection, book_id)
+            except Exception:
+                connection.close()
+                raise
+        connection.close()
+    
+    pdf_data = db.session.query(Book.pdf_data).filter_by(id=book_id).scalar()
+    return io.BytesIO(pdf_data or b'')
+
+def open_book_pdf(book):
+    """Open a book's PDF from the store, falling back to rows not yet migrated"""
+    if book.pdf_sha256 and pdf_store.exists(book.pdf_sha256):
+        return pdf_store.open(book.pdf_sha256)
+    return open_pdf_blob(book.id)
+
+def release_pdf(sha256):
+    """Delete a stored PDF once no book references its content any more.
+
+    Call it after the change that dropped the reference has been committed.
+    The check runs under the store's lock, which uploads hold until the book
+    pointing at their file is committed, so it never deletes a file that an
+    upload of the same content has just started to use.
+    """
+    if not sha256:
+        return
+    with pdf_store.lock():
+        if not Book.query.filter_by(pdf_sha256=sha256).count():
+            pdf_store.delete(sha256)
+        # End the read transaction, so it does not outlive the lock
+        db.session.rollback()
+
+def ensure_pdf_metadata(book):
+    """Backfill size, hash and modification time for PDFs stored before they were tracked"""
+    if book.pdf_sha256 is not None:
+        return
+    
+    book.pdf_size = db.session.query(db.func.length(Book.pdf_data)).filter_by(id=book.id).scalar() or 0
+    digest = hashlib.sha256()
+    if book.pdf_size:
+        stream = open_pdf_blob(book.id)
+        try:
+            for chunk in iter(lambda: stream.read(app.config['PDF_CHUNK_SIZE']), b''):
+                digest.update(chunk)
+        finally:
+            stream.close()
+        book.pdf_updated_at = book.created_at or datetime.utcnow()
+    # A book without a PDF gets the hash of empty content, so it is only checked once
+    book.pdf_sha256 = digest.hexdigest()
+    db.session.commit()
+
+def evict_page_cache():
+    """Remove the least recently used split pages once the cache exceeds its byte budget"""
+    folder = app.config['PAGE_CACHE_FOLDER']
+    entries = [(entry.stat(), entry.path) for entry in os.scandir(folder) if entry.name.endswith('.pdf')]
+    excess = sum(stat.st_size for stat, _path in entries) - app.config['PAGE_CACHE_MAX_BYTES']
+    if excess <= 0:
+        return
+    
+    entries.sort(key=lambda entry: entry[0].st_mtime)
+    for stat, path in entries:
+        if excess <= 0:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        excess -= stat.st_size
+
+def get_page_range(book, first, last):
+    """Return the path of a standalone PDF holding pages first..last (1-based) of a book.
+
+    Split files are cached on disk under the source PDF's content hash, so a
+    replaced PDF never serves stale pages; cache hits refresh the file's mtime
+    so eviction drops the least recently used ranges first. Returns None if
+    the range is past the end of the book.
+    """
+    folder = app.config['PAGE_CACHE_FOLDER']
+    path = os.path.join(folder, f'{book.pdf_sha256}-{first}-{last}.pdf')
+    if os.path.exists(path):
+        os.utime(path)
+        cache_requests.inc(cache='page', result='hit')
+        return path
+    cache_requests.inc(cache='page', result='miss')
+    
+    stream = open_book_pdf(book)
+    try:
+        reader = PdfReader(stream)
+        if reader.is_encrypted:
+            reader.decrypt('')
+        if last > len(reader.pages):
+            return None
+        
+        writer = PdfWriter()
+        for index in range(first - 1, last):
+            writer.add_page(reader.pages[index])
+        
+        os.makedirs(folder, exist_ok=True)
+        temp_path = f'{path}.{os.getpid()}.tmp'
+        with open(temp_path, 'wb') as temp_file:
+            writer.write(temp_file)
+        os.replace(temp_path, path)
+    finally:
+        stream.close()
+    
+    evict_page_cache()
+    return path
+
+def page_url(book, first, last=None):
+    """URL of a page range, versioned by the PDF's hash so it can be cached indefinitely"""
+    version = book.pdf_sha256[:16]
+    if last is None or last == first:
+        return url_for('book_page', book_id=book.id, first=first, v=version)
+    return url_for('book_page', book_id=book.id, first=first, last=last, v=version)
+
+@app.cli.command('migrate-pdf-store')
+def migrate_pdf_store():
+    """Move PDF blobs still stored in the book table into the PDF store"""
+    book_ids = [row.id for row in db.session.query(Book.id).filter(Book.pdf_data.isnot(None))]
+    
+    for book_id in book_ids:
+        book = db.session.get(Book, book_id)
+        stream = open_pdf_blob(book_id)
+        try:
+            book.pdf_sha256, book.pdf_size = pdf_store.put(stream)
+        finally:
+            stream.close()
+        book.pdf_mimetype = book.pdf_mimetype or 'application/pdf'
+        book.pdf_updated_at = book.pdf_updated_at or book.created_at or datetime.utcnow()
+        book.pdf_data = None
+        db.session.commit()
+        click.echo(f'Moved book {book_id} ({book.pdf_size} bytes) to {pdf_store.path_for(book.pdf_sha256)}')
     
-    return f"data:image/png;base64,{img_str}"
+    click.echo(f'Migrated {len(book_ids)} books')
+
+JOB_HANDLERS = {}
+
+def job_handler(kind):
+    """Register a function as the handler for jobs of this kind; it is called with the decoded payload"""
+    def register(func):
+        JOB_HANDLERS[kind] = func
+        return func
+    return register
+
+def enqueue_job(kind, payload=None, book_id=None):
+    """Add a job to the current transaction so it is queued only if the transaction commits"""
+    job = Job(kind=kind, payload=json.dumps(payload or {}), book_id=book_id,
+              max_attempts=app.config['JOB_MAX_ATTEMPTS'], timeout=app.config['JOB_TIMEOUT'])
+    db.session.add(job)
+    return job
+
+def claim_job(worker_name):
+    """Lease the next runnable job to a worker and return it, or None if the queue is empty.
+
+    Queued jobs whose retry delay has passed and running jobs whose lease has
+    expired are both claimable. The claim is a compare-and-set on ``attempts``,
+    so two workers racing for the same row cannot both win it.
+    """
+    while True:
+        now = datetime.utcnow()
+        candidate = db.session.query(Job.id, Job.attempts, Job.timeout).filter(db.or_(
+            db.and_(Job.status == 'queued', Job.run_after <= now),
+            db.and_(Job.status == 'running', Job.lease_expires_at < now),
+        )).order_by(Job.run_after, Job.id).first()
+        if candidate is None:
+            db.session.rollback()
+            return None
+        
+        claimed = Job.query.filter_by(id=candidate.id, attempts=candidate.attempts).update({
+            Job.status: 'running',
+            Job.attempts: Job.attempts + 1,
+            Job.worker: worker_name,
+            # The grace period lets the supervisor kill a job before its lease can be taken over
+            Job.lease_expires_at: now + timedelta(seconds=candidate.timeout + 60),
+        }, synchronize_session=False)
+        db.session.commit()
+        if not claimed:
+            continue
+        
+        job = db.session.get(Job, candidate.id)
+        if job.attempts > job.max_attempts:
+            # Its last attempt died without reporting back
+            finish_job(job.id, job.attempts, 'failed', 'Lease expired on the final attempt')
+            continue
+        return job
+
+def finish_job(job_id, attempts, status, error=None):
+    """Record the outcome of one attempt unless a later attempt has claimed the job since"""
+    values = {Job.status: status, Job.last_error: error, Job.lease_expires_at: None}
+    if status in ('done', 'failed'):
+        values[Job.finished_at] = datetime.utcnow()
+    updated = Job.query.filter_by(id=job_id, attempts=attempts, status='running').\
+        update(values, synchronize_session=False)
+    db.session.commit()
+    return bool(updated)
+
+def fail_job(job_id, attempts, error):
+    """Schedule a retry with exponential backoff, or mark the job failed once it is out of attempts"""
+    job = db.session.get(Job, job_id)
+    if job is None or job.attempts != attempts:
+        return False
+    if attempts >= job.max_attempts:
+        return finish_job(job_id, attempts, 'failed', error)
+    
+    delay = app.config['JOB_RETRY_DELAY'] * 2 ** (attempts - 1)
+    updated = Job.query.filter_by(id=job_id, attempts=attempts, status='running').update({
+        Job.status: 'queued',
+        Job.last_error: error,
+        Job.lease_expires_at: None,
+        Job.run_after: datetime.utcnow() + timedelta(seconds=delay),
+    }, synchronize_session=False)
+    db.session.commit()
+    return bool(updated)
+
+def run_job(job):
+    """Run a claimed job and record its outcome; exceptions count as a failed attempt"""
+    job_id, attempts = job.id, job.attempts
+    try:
+        JOB_HANDLERS[job.kind](json.loads(job.payload))
+    except Exception:
+        db.session.rollback()
+        fail_job(job_id, attempts, traceback.format_exc(limit=5))
+        return False
+    return finish_job(job_id, attempts, 'done')
+
+def get_book_job_statuses(book_ids):
+    """Return the most recent job of each book, keyed by book id"""
+    if not book_ids:
+        return {}
+    latest = db.session.query(db.func.max(Job.id)).filter(Job.book_id.in_(book_ids)).group_by(Job.book_id)
+    return {job.book_id: job for job in Job.query.filter(Job.id.in_(latest))}
+
+@job_handler('process_pdf')
+def process_pdf(payload):
+    """Extract page count, document information, page sizes and text from a book's PDF"""
+    book = db.session.get(Book, payload['book_id'])
+    if book is None or book.pdf_sha256 != payload['sha256']:
+        return  # the book was deleted or its PDF replaced; a newer job handles the new file
+    
+    with pdf_store.open(payload['sha256']) as pdf_file:
+        reader = PdfReader(pdf_file)
+        if reader.is_encrypted:
+            reader.decrypt('')
+        
+        info = {key.lstrip('/'): str(value) for key, value in (reader.metadata or {}).items()}
+        BookPage.query.filter_by(book_id=book.id).delete()
+        
+        pages = []
+        texts = []
+        for page_number, page in enumerate(reader.pages, start=1):
+            try:
+                text = page.extract_text() or ''
+            except Exception:
+                text = ''
+            texts.append(text)
+            pages.append(dict(book_id=book.id, page_number=page_number,
+                              width=float(page.mediabox.width), height=float(page.mediabox.height),
+                              rotation=page.rotation or 0, text=text))
+            if len(pages) == 100:
+                db.session.execute(BookPage.__table__.insert(), pages)
+                pages = []
+        if pages:
+            db.session.execute(BookPage.__table__.insert(), pages)
+        
+        book.page_count = len(reader.pages)
+        book.pdf_info = json.dumps(info)
+        if db.engine.dialect.name == 'sqlite':
+            content_index.index_book_pages(db.session.connection().connection.driver_connection,
+                                           book.id, book.pdf_sha256, texts)
+    db.session.commit()
+
+def enqueue_pdf_processing(book):
+    """Queue text and metadata extraction for a book's current PDF"""
+    if book.id is None:
+        db.session.flush()
+    return enqueue_job('process_pdf', {'book_id': book.id, 'sha256': book.pdf_sha256}, book_id=book.id)
+
+@app.cli.command('process-pdfs')
+@click.option('--all', 'reprocess', is_flag=True, help='Also reprocess books that already have page data.')
+def process_pdfs_command(reprocess):
+    """Queue PDF processing for stored books that have not been processed yet"""
+    books = Book.query.filter(Book.pdf_sha256.isnot(None), Book.pdf_size > 0)
+    if not reprocess:
+        books = books.filter(Book.page_count.is_(None))
+    count = 0
+    for book in books:
+        enqueue_pdf_processing(book)
+        count += 1
+    db.session.commit()
+    click.echo(f'Queued {count} books; run "python -m worker" to process them')
+
+def upgrade_schema():
+    """Bring a database created before migrations existed up to the current models.
+
+    Adds missing columns and indexes in place; migrate_database then stamps the
+    database so later schema changes arrive as migrations.
+    """
+    inspector = db.inspect(db.engine)
+    with db.engine.begin() as connection:
+        for table in db.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    column_type = column.type.compile(dialect=db.engine.dialect)
+                    connection.execute(db.text(
+                        f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'
+                    ))
+            for index in table.indexes:
+                index.create(bind=connection, checkfirst=True)
+
+def remove_duplicate_library_entries():
+    """Delete all but the oldest of each user's repeated library entries for a book"""
+    oldest = db.session.query(db.func.min(UserLibrary.id)).\
+        group_by(UserLibrary.user_id, UserLibrary.book_id)
+    removed = UserLibrary.query.filter(UserLibrary.id.notin_(oldest)).delete(synchronize_session=False)
+    db.session.commit()
+    return removed
+
+# The last revision whose schema upgrade_schema reproduces from the models
+MODELS_REVISION = '7f7be886b207'
+
+def migrate_database():
+    """Apply pending migrations, first adopting databases created before migrations existed.
+
+    Then fills the tables derived from the main ones if they were never built,
+    which is the case on a new database and on one that predates them.
+    """
+    inspector = db.inspect(db.engine)
+    if inspector.has_table('user') and not inspector.has_table('alembic_version'):
+        # The unique library index cannot be built over duplicate entries
+        removed = remove_duplicate_library_entries()
+        upgrade_schema()
+        # The models' tables and indexes are now in place; later revisions add what they do not describe
+        flask_migrate.stamp(revision=MODELS_REVISION)
+        if removed:
+            rebuild_book_stats()
+    flask_migrate.upgrade()
+    
+    if db.session.query(Book.id).outerjoin(BookStats).filter(BookStats.book_id.is_(None)).first():
+        rebuild_book_stats()
+    if not SiteCounter.query.first():
+        rebuild_dashboard()
+    if Discussion.query.filter(Discussion.last_activity_at.is_(None)).first():
+        rebuild_discussion_activity()
+
+@app.cli.command('upgrade-db')
+def upgrade_db_command():
+    """Apply pending migrations and build the derived counters of a new or pre-migration database"""
+    migrate_database()
+    click.echo('Database is up to date')
+
+# GET routes whose queries check-query-plans explains, by the user type they need
+QUERY_PLAN_ROUTES = {
+    None: ['/'],
+    'reader': ['/browse', '/api/books', '/search?q=the', '/book/{book}', '/book/{book}/reviews',
+               '/book/{book}/discussions', '/discussions', '/discussion/{discussion}', '/library',
+               '/profile', '/book/{book}/new-discussion'],
+    'author': ['/author/dashboard', '/author/books/status', '/author/reviews', '/author/discussions'],
+    'admin': ['/admin/dashboard', '/admin/reviews', '/admin/discussions'],
+    'tech_support': ['/tech_support/dashboard'],
+}
+
+# Routes that sort rows gathered from several index searches (one per book of
+# the author), so the sort only ever sees the current author's rows
+QUERY_PLAN_SORTED_ROUTES = {'/author/reviews', '/author/discussions'}
+
+def explain_route_queries(users, book_id, discussion_id):
+    """Request each QUERY_PLAN_ROUTES page and explain every SELECT it runs.
+
+    ``users`` maps user type -> id of the user to request that type's routes
+    as; routes of types missing from it are skipped. Returns a (path,
+    statement count, problems) tuple per route requested.
+    """
+    statements = []
+    def capture(connection, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            statements.append((statement, parameters))
+    
+    client = app.test_client()
+    explain_connection = db.engine.raw_connection()
+    event.listen(db.engine, 'before_cursor_execute', capture)
+    results = []
+    try:
+        for user_type, paths in QUERY_PLAN_ROUTES.items():
+            if user_type and user_type not in users:
+                continue
+            with client.session_transaction() as client_session:
+                client_session.clear()
+                if user_type:
+                    client_session['_user_id'] = str(users[user_type])
+                    client_session['_fresh'] = True
+            
+            for path in paths:
+                path = path.format(book=book_id, discussion=discussion_id)
+                del statements[:]
+                # A fresh app context per request, so g and the session start empty as in production
+                with app.app_context():
+                    response = client.get(path)
+                problems = []
+                for statement, parameters in statements:
+                    plan = query_plans.explain(explain_connection.driver_connection, statement, parameters)
+                    for problem in query_plans.find_problems(plan, allow_sort=path in QUERY_PLAN_SORTED_ROUTES):
+                        if problem not in problems:
+                            problems.append(problem)
+                if response.status_code != 200:
+                    problems.append(f'HTTP {response.status_code}')
+                results.append((path, len(statements), problems))
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', capture)
+        explain_connection.close()
+    return results
+
+@app.cli.command('check-query-plans')
+def check_query_plans_command():
+    """Explain every query the main GET routes issue and report full table scans and unindexed sorts"""
+    if db.engine.dialect.name != 'sqlite':
+        raise click.ClickException('Query plans can only be checked on SQLite databases')
+    book = Book.query.order_by(Book.id).first()
+    discussion = Discussion.query.order_by(Discussion.id).first()
+    if not book or not discussion:
+        raise click.ClickException('The database needs at least one book and one discussion')
+    
+    users = {}
+    for user_type in QUERY_PLAN_ROUTES:
+        if not user_type:
+            continue
+        user = User.query.filter_by(user_type=user_type).first()
+        if user:
+            users[user_type] = user.id
+        else:
+            click.echo(f'Skipping {user_type} routes: no {user_type} user')
+    
+    failures = 0
+    for path, statement_count, problems in explain_route_queries(users, book.id, discussion.id):
+        if problems:
+            failures += 1
+            click.echo(f'{path}: ' + '; '.join(problems))
+        else:
+            click.echo(f'{path}: {statement_count} queries, all indexed')
+    
+    if failures:
+        raise click.ClickException(f'{failures} routes scan or sort without an index')
+
+@app.cli.command('bench-routes')
+@click.option('--requests', 'request_count', type=int, default=50, help='Timed requests per route.')
+@click.option('--warmup', type=int, default=5, help='Untimed requests per route made first.')
+@click.option('--dataset', default='current', help='Name to store the results under in the report.')
+@click.option('--output', default='bench-report.json', help='JSON report to write.')
+@click.option('--baseline', help='Earlier report to compare against.')
+@click.option('--threshold', type=float, default=0.2, help='Allowed slowdown as a fraction (0.2 = 20%).')
+def bench_routes_command(request_count, warmup, dataset, output, baseline, threshold):
+    """Time the main routes as each role and report latency percentiles, queries per request and peak RSS"""
+    try:
+        subjects, users = route_bench.find_subjects(lambda sql: db.session.execute(db.text(sql)).all())
+    except ValueError as error:
+        raise click.ClickException(str(error))
+    
+    queries = []
+    def count_query(connection, cursor, statement, parameters, context, executemany):
+        queries.append(statement)
+    
+    client = app.test_client()
+    routes = {}
+    event.listen(db.engine, 'before_cursor_execute', count_query)
+    try:
+        for user_type, paths in route_bench.BENCH_ROUTES.items():
+            if user_type and user_type not in users:
+                click.echo(f'Skipping {user_type} routes: no {user_type} user')
+                continue
+            with client.session_transaction() as client_session:
+                client_session.clear()
+                if user_type:
+                    client_session['_user_id'] = str(users[user_type][0])
+                    client_session['_fresh'] = True
+            
+            for path in paths:
+                url = path.format(**subjects)
+                latencies, statuses, counts = [], [], []
+                for number in range(warmup + request_count):
+                    del queries[:]
+                    started = time.perf_counter()
+                    # A fresh app context per request, so g and the session start empty as in production
+                    with app.app_context():
+                        response = client.get(url)
+                        response.get_data()
+                        response.close()
+                    if number >= warmup:
+                        latencies.append(time.perf_counter() - started)
+                        statuses.append(response.status_code)
+                        counts.append(len(queries))
+                routes[route_bench.route_key(user_type, path)] = route_bench.summarize(latencies, statuses, counts)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count_query)
+    
+    results = {'routes': routes, 'peak_rss_mb': route_bench.peak_rss_mb()}
+    report = route_bench.new_report('test-client', request_count, warmup)
+    report['datasets'][dataset] = results
+    route_bench.write_report(report, output)
+    click.echo(route_bench.format_results(results))
+    click.echo(f'Report written to {output}')
+    
+    if baseline:
+        try:
+            regressions = route_bench.compare(report, route_bench.load_report(baseline), threshold)
+        except ValueError as error:
+            raise click.ClickException(str(error))
+        for regression in regressions:
+            click.echo(f'REGRESSION {regression}')
+        if regressions:
+            raise click.ClickException(f'{len(regressions)} regressions against {baseline}')
+        click.echo(f'No regressions against {baseline}')
+
+class BatchLoader:
+    """Request-scoped dataloader that fetches rows of one model by primary key.
+
+    All ids requested together are fetched with a single IN query and cached
+    for the rest of the request, so loops over related rows issue a constant
+    number of queries instead of one per row.
+    """
+    def __init__(self, model):
+        self.model = model
+        self.cache = {}
+    
+    def load_many(self, ids):
+        missing = {row_id for row_id in ids if row_id not in self.cache}
+        if missing:
+            for row in self.model.query.filter(self.model.id.in_(missing)):
+                self.cache[row.id] = row
+            for row_id in missing:
+                self.cache.setdefault(row_id, None)
+        return [self.cache[row_id] for row_id in ids]
+    
+    def load(self, row_id):
+        return self.load_many([row_id])[0]
+
+def get_loader(model):
+    """Return the current request's BatchLoader for a model"""
+    loaders = g.setdefault('batch_loaders', {})
+    if model not in loaders:
+        loaders[model] = BatchLoader(model)
+    return loaders[model]
+
+def review_stat_deltas(rating, count=1):
+    """Counter changes for adding (count > 0) or removing (count < 0) reviews with this rating"""
+    return Counter({'review_count': count, 'rating_sum': count * rating, f'rating_{rating}_count': count})
+
+def update_book_stats(book_id, deltas):
+    """Apply counter deltas to a book's stats row inside the current transaction.
+
+    The increments are issued as UPDATE ... SET col = col + n so concurrent
+    workers never overwrite each other's changes. Call it after making the
+    change the deltas describe: a book without a stats row gets one counted
+    from the tables, which then already include it.
+    """
+    values = {getattr(BookStats, name): getattr(BookStats, name) + delta
+              for name, delta in deltas.items() if delta}
+    if not values:
+        return
+    
+    updated = BookStats.query.filter_by(book_id=book_id).update(values, synchronize_session=False)
+    if not updated:
+        db.session.add_all(count_book_stats([book_id]).values())
+
+def get_book_stats(book_id):
+    """Return a book's stats row, or an all-zero one if it has none yet"""
+    return db.session.get(BookStats, book_id) or BookStats(book_id=book_id)
+
+def count_book_stats(book_ids=None):
+    """Return new stats rows counted from the reviews, discussions and library tables, by book id.
+
+    Counts the given books, or every book if ``book_ids`` is None.
+    """
+    books = db.session.query(Book.id)
+    if book_ids is not None:
+        books = books.filter(Book.id.in_(book_ids))
+    stats = {book_id: BookStats(book_id=book_id) for book_id, in books}
+    
+    def counts(model, *columns):
+        query = db.session.query(model.book_id, *columns, db.func.count()).group_by(model.book_id, *columns)
+        if book_ids is not None:
+            query = query.filter(model.book_id.in_(book_ids))
+        return query
+    
+    for book_id, rating, count in counts(Review, Review.rating):
+        if book_id in stats and 1 <= rating <= 5:
+            for name, delta in review_stat_deltas(rating, count).items():
+                setattr(stats[book_id], name, getattr(stats[book_id], name) + delta)
+    
+    for model, counter in ((Discussion, 'discussion_count'), (UserLibrary, 'library_count')):
+        for book_id, count in counts(model):
+            if book_id in stats:
+                setattr(stats[book_id], counter, count)
+    return stats
+
+def rebuild_book_stats():
+    """Recompute every book's stats row from the reviews, discussions and library tables"""
+    stats = count_book_stats()
+    BookStats.query.delete()
+    db.session.add_all(stats.values())
+    db.session.commit()
+    return len(stats)
+
+@app.cli.command('rebuild-book-stats')
+def rebuild_book_stats_command():
+    """Repair drift in the book_stats table by recomputing it"""
+    click.echo(f'Rebuilt stats for {rebuild_book_stats()} books')
+
+# Models counted on the admin dashboard, keyed by the kind used in RecentActivity
+DASHBOARD_MODELS = {'user': User, 'book': Book, 'review': Review, 'discussion': Discussion}
+# Kinds whose newest rows are kept in the RecentActivity ring
+ACTIVITY_KINDS = ('user', 'book')
+
+def bump_counter(connection, name, delta=1):
+    """Atomically add ``delta`` to a site counter on the given connection and return its new value"""
+    table = SiteCounter.__table__
+    updated = connection.execute(
+        table.update().where(table.c.name == name).values(value=table.c.value + delta)
+    ).rowcount
+    if not updated:
+        connection.execute(table.insert().values(name=name, value=delta))
+    return connection.execute(db.select(table.c.value).where(table.c.name == name)).scalar()
+
+def record_activity(connection, kind, subject_id):
+    """Write a new row id into the next slot of a kind's activity ring"""
+    table = RecentActivity.__table__
+    seq = bump_counter(connection, f'{kind}_activity_seq')
+    slot = seq % app.config['RECENT_ACTIVITY_SLOTS']
+    values = dict(seq=seq, subject_id=subject_id)
+    updated = connection.execute(
+        table.update().where(table.c.kind == kind, table.c.slot == slot).values(**values)
+    ).rowcount
+    if not updated:
+        connection.execute(table.insert().values(kind=kind, slot=slot, **values))
+
+def forget_activity(connection, kind, subject_id):
+    table = RecentActivity.__table__
+    connection.execute(table.delete().where(table.c.kind == kind, table.c.subject_id == subject_id))
+
+def _count_inserted(kind):
+    def after_insert(mapper, connection, target):
+        bump_counter(connection, f'{kind}_count')
+        if kind in ACTIVITY_KINDS:
+            record_activity(connection, kind, target.id)
+    return after_insert
+
+def _count_deleted(kind):
+    def after_delete(mapper, connection, target):
+        bump_counter(connection, f'{kind}_count', -1)
+        if kind in ACTIVITY_KINDS:
+            forget_activity(connection, kind, target.id)
+    return after_delete
+
+for _kind, _model in DASHBOARD_MODELS.items():
+    event.listen(_model, 'after_insert', _count_inserted(_kind))
+    event.listen(_model, 'after_delete', _count_deleted(_kind))
+
+@event.listens_for(SupportQuery, 'after_insert')
+def count_new_query(mapper, connection, target):
+    if target.status == 'open':
+        bump_counter(connection, 'open_query_count')
+
+@event.listens_for(SupportQuery, 'after_update')
+def count_query_status_change(mapper, connection, target):
+    history = db.inspect(target).attrs.status.history
+    if not history.has_changes():
+        return
+    was_open = 'open' in history.deleted
+    delta = (target.status == 'open') - was_open
+    if delta:
+        bump_counter(connection, 'open_query_count', delta)
+
+@event.listens_for(SupportQuery, 'after_delete')
+def count_deleted_query(mapper, connection, target):
+    if target.status == 'open':
+        bump_counter(connection, 'open_query_count', -1)
+
+def get_counters():
+    """Return every site counter as a dict"""
+    return dict(db.session.query(SiteCounter.name, SiteCounter.value))
+
+def get_recent(kind, limit=5):
+    """Return the newest rows of a kind from its activity ring, newest first"""
+    ids = [subject_id for subject_id, in db.session.query(RecentActivity.subject_id).
+           filter_by(kind=kind).order_by(RecentActivity.seq.desc()).limit(limit)]
+    return [row for row in get_loader(DASHBOARD_MODELS[kind]).load_many(ids) if row is not None]
+
+def rebuild_dashboard():
+    """Recompute the site counters and refill the activity rings from the main tables"""
+    SiteCounter.query.delete()
+    RecentActivity.query.delete()
+    
+    for kind, model in DASHBOARD_MODELS.items():
+        db.session.add(SiteCounter(name=f'{kind}_count', value=model.query.count()))
+    db.session.add(SiteCounter(name='open_query_count',
+                               value=SupportQuery.query.filter_by(status='open').count()))
+    
+    slots = app.config['RECENT_ACTIVITY_SLOTS']
+    for kind in ACTIVITY_KINDS:
+        model = DASHBOARD_MODELS[kind]
+        newest = db.session.query(model.id).order_by(model.created_at.desc(), model.id.desc()).limit(slots).all()
+        for seq, (subject_id,) in enumerate(reversed(newest), start=1):
+            db.session.add(RecentActivity(kind=kind, slot=seq % slots, seq=seq, subject_id=subject_id))
+        db.session.add(SiteCounter(name=f'{kind}_activity_seq', value=len(newest)))
+    
+    db.session.commit()
+
+@app.cli.command('rebuild-dashboard')
+def rebuild_dashboard_command():
+    """Recompute the admin dashboard counters and recent-activity feed"""
+    rebuild_dashboard()
+    for name, value in sorted(get_counters().items()):
+        click.echo(f'{name}: {value}')
+
+@app.cli.command('reindex-content')
+@click.option('--processes', type=int, default=None, help='Extraction processes (default: one per CPU).')
+@click.option('--full', is_flag=True, help='Reindex books that are already up to date.')
+def reindex_content_command(processes, full):
+    """Index the text of every book PDF for content search, resuming where a previous run stopped"""
+    if db.engine.dialect.name != 'sqlite':
+        raise click.ClickException('Content search needs an SQLite database')
+    
+    books = []
+    for book in Book.query.filter(Book.pdf_size > 0):
+        ensure_pdf_metadata(book)
+        if pdf_store.exists(book.pdf_sha256):
+            source = ('file', pdf_store.path_for(book.pdf_sha256))
+        else:
+            source = ('blob', db.engine.url.database, Book.__tablename__, 'pdf_data', book.id)
+        books.append((book.id, book.pdf_sha256, source))
+    
+    def report(book_id, error):
+        if error:
+            click.echo(f'Book {book_id} failed: {error}', err=True)
+    
+    connection = db.engine.raw_connection()
+    try:
+        count = content_index.reindex(connection.driver_connection, books, processes, full, report)
+    finally:
+        connection.close()
+    click.echo(f'Indexed {count} of {len(books)} books')
+
+def find_pages(query_text, limit, offset=0):
+    """Search the text of book pages, returning (book_id, page_number, snippet) tuples"""
+    if db.engine.dialect.name == 'sqlite':
+        connection = db.session.connection().connection.driver_connection
+        return content_index.search_pages(connection, query_text, limit, offset)
+    
+    # Other backends have no FTS5 index; fall back to unranked substring matching
+    rows = db.session.query(BookPage.book_id, BookPage.page_number, BookPage.text).\
+        filter(BookPage.text.ilike(f'%{query_text}%')).\
+        order_by(BookPage.book_id, BookPage.page_number).limit(limit).offset(offset).all()
+    return [(row.book_id, row.page_number, row.text[:200]) for row in rows]
+
+def highlight_matches(text):
+    """Escape indexed text for HTML and turn the index's match markers into <mark> tags"""
+    if not text:
+        return ''
+    text = str(escape(text))
+    return Markup(text.replace(search_index.MATCH_START, '<mark>').replace(search_index.MATCH_END, '</mark>'))
+
+def find_books(query_text, limit, offset=0):
+    """Search titles, descriptions and authors, returning (book_id, title, snippet, author) tuples"""
+    if db.engine.dialect.name == 'sqlite':
+        connection = db.session.connection().connection.driver_connection
+        return search_index.search_books(connection, query_text, limit, offset)
+    
+    # Other backends have no FTS5 index; fall back to unranked substring matching
+    pattern = f'%{query_text}%'
+    rows = db.session.query(Book.id, Book.title, Book.description, User.username).\
+        join(User, User.id == Book.author_id).\
+        filter(db.or_(Book.title.ilike(pattern), Book.description.ilike(pattern),
+                      User.username.ilike(pattern))).\
+        order_by(Book.created_at.desc(), Book.id.desc()).\
+        limit(limit).offset(offset).all()
+    return [(row.id, row.title, row.description, row.username) for row in rows]
+
+def encode_cursor(created_at, row_id):
+    """Encode a keyset position as an opaque URL-safe token"""
+    payload = json.dumps([created_at.isoformat(), row_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii')
+
+def decode_cursor(cursor):
+    """Decode a token produced by encode_cursor, aborting with 400 if it is malformed"""
+    try:
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, TypeError, binascii.Error):
+        abort(400)
+
+def keyset_page(query, time_column, id_column, cursor, limit, descending=True):
+    """Return one page of a query ordered by (time_column, id_column) and the cursor for the next page"""
+    key = db.tuple_(time_column, id_column)
+    if cursor:
+        position = decode_cursor(cursor)
+        query = query.filter(key < position if descending else key > position)
+    
+    if descending:
+        query = query.order_by(time_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(time_column, id_column)
+    
+    rows = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(getattr(rows[-1], time_column.key), getattr(rows[-1], id_column.key))
+    
+    return rows, next_cursor
+
+def get_book_page(cursor=None, limit=None):
+    """Return one page of books, newest first, and the cursor for the next page"""
+    query = db.session.query(
+        Book.id, Book.title, Book.description, Book.amazon_link, Book.created_at,
+        User.username, User.id.label('author_id'),
+        BookStats.review_count, BookStats.rating_sum
+    ).join(User, User.id == Book.author_id).\
+        outerjoin(BookStats, BookStats.book_id == Book.id)
+    
+    return keyset_page(query, Book.created_at, Book.id, cursor, limit or app.config['BOOKS_PER_PAGE'])
+
+def get_discussion_page(query, cursor=None, limit=None):
+    """Return one page of discussions, most recently active first, and the cursor for the next page"""
+    return keyset_page(query, Discussion.last_activity_at, Discussion.id, cursor,
+                       limit or app.config['DISCUSSIONS_PER_PAGE'])
+
+def rebuild_discussion_activity():
+    """Recompute reply_count, last_reply_at and last_activity_at for every discussion"""
+    replies = DiscussionReply.query.filter(DiscussionReply.discussion_id == Discussion.id)
+    last_reply_at = replies.with_entities(db.func.max(DiscussionReply.created_at)).scalar_subquery()
+    updated = Discussion.query.update({
+        Discussion.reply_count: replies.with_entities(db.func.count()).scalar_subquery(),
+        Discussion.last_reply_at: last_reply_at,
+        Discussion.last_activity_at: db.func.coalesce(last_reply_at, Discussion.created_at),
+    }, synchronize_session=False)
+    db.session.commit()
+    return updated
+
+@app.cli.command('rebuild-discussion-activity')
+def rebuild_discussion_activity_command():
+    """Recompute denormalized reply counts and last-activity times on discussions"""
+    click.echo(f'Updated {rebuild_discussion_activity()} discussions')
+
+@app.cli.command('generate-data')
+@click.option('--users', type=int, default=1000)
+@click.option('--books', type=int, default=200)
+@click.option('--reviews', type=int, default=5000)
+@click.option('--library', type=int, default=5000)
+@click.option('--discussions', type=int, default=500)
+@click.option('--replies', type=int, default=5000)
+@click.option('--max-pages', type=int, default=8, help='Pages in the longest generated PDF.')
+@click.option('--seed', type=int, default=0, help='The same seed and volumes always generate the same rows.')
+def generate_data_command(users, books, reviews, library, discussions, replies, max_pages, seed):
+    """Add deterministic synthetic users, books, reviews and discussions for scale testing"""
+    if db.engine.dialect.name != 'sqlite':
+        raise click.ClickException('Synthetic data can only be bulk loaded into an SQLite database')
+    # The search index triggers index the generated books as they are inserted
+    
+    def report(table, rows, seconds):
+        click.echo(f'{table}: {rows:,} rows in {seconds:.1f}s')
+    
+    started = time.perf_counter()
+    connection = db.engine.raw_connection()
+    try:
+        generator = synthetic_data.DatasetGenerator(connection.driver_connection, 'web', seed=seed, progress=report)
+        total = generator.generate(users, books, reviews, library, discussions, replies, max_pages,
+                                   store_pdf=lambda data: pdf_store.put(io.BytesIO(data)))
+    finally:
+        connection.close()
+    
+    # The generator writes the main tables only; derive the denormalized ones from them
+    rebuild_book_stats()
+    rebuild_dashboard()
+    rebuild_discussion_activity()
+    click.echo(f'Generated {total:,} rows in {time.perf_counter() - started:.1f}s; '
+               f'run "flask process-pdfs" to count the new books\' pages')
 
 def add_sample_data():
     """Add sample books and users for testing"""
@@ -266,7 +1539,8 @@ def add_sample_data():
                 title=f"Sample Book {i+1}",
                 description=sample_descriptions[i],
                 author_id=author.id,
-                amazon_link=f"https://amazon.com/sample-book-{i+1}"
+                amazon_link=f"https://amazon.com/sample-book-{i+1}",
+                stats=BookStats()
             )
             db.session.add(book)
         
@@ -283,9 +1557,16 @@ def index():
         elif current_user.user_type == 'admin':
             return redirect(url_for('admin_dashboard'))
     
-    cozy_corner = create_cozy_corner_image()
+    cozy_corner = url_for('artwork', filename=random.choice(get_cozy_corner_files()))
     return render_template('index.html', cozy_corner=cozy_corner)
 
+@app.route('/artwork/<path:filename>')
+def artwork(filename):
+    # File names are fingerprinted, so the content behind a URL never changes
+    response = send_from_directory(app.config['ARTWORK_FOLDER'], filename, max_age=365 * 24 * 3600)
+    response.cache_control.immutable = True
+    return response
+
 @app.route('/login', methods=['GET', 'POST'])
 def login():
     if current_user.is_authenticated:
@@ -330,7 +1611,6 @@ def register():
         
         user = User(email=email, username=username, full_name=full_name, user_type=user_type)
         user.set_password(password)
-        user.avatar = generate_avatar(username, email)
         
         db.session.add(user)
         db.session.commit()
@@ -340,6 +1620,24 @@ def register():
     
     return render_template('register.html')
 
+@app.route('/avatar/<int:user_id>/<int:size>')
+def avatar(user_id, size):
+    if size not in app.config['AVATAR_SIZES']:
+        abort(404)
+    
+    user = User.query.get_or_404(user_id)
+    
+    # Avatars stored before hashes were tracked get theirs on first request
+    if user.avatar and not user.avatar_sha256:
+        user.avatar_sha256 = hashlib.sha256(base64.b64decode(user.avatar.split(',', 1)[1])).hexdigest()
+        db.session.commit()
+    
+    version = avatar_version(user)
+    # Versioned URLs never change content; unversioned ones revalidate hourly
+    max_age = 365 * 24 * 3600 if request.args.get('v') == version else 3600
+    return send_file(get_avatar_variant(user, size), mimetype='image/png',
+                     etag=f'{user_id}-{size}-{version}', max_age=max_age)
+
 @app.route('/logout')
 @login_required
 def logout():
@@ -349,25 +1647,82 @@ def logout():
 @app.route('/browse')
 @login_required
 def browse():
-    books = Book.query.join(User).add_columns(
-        Book.id, Book.title, Book.description, Book.amazon_link,
-        User.username, User.id.label('author_id')
-    ).all()
+    books, next_cursor = get_book_page(request.args.get('cursor'))
+    return render_template('browse.html', books=books, next_cursor=next_cursor)
+
+@app.route('/api/books')
+@login_required
+def api_books():
+    limit = min(request.args.get('limit', app.config['BOOKS_PER_PAGE'], type=int), 100)
+    books, next_cursor = get_book_page(request.args.get('cursor'), max(limit, 1))
     
-    return render_template('browse.html', books=books)
+    return jsonify({
+        'books': [{
+            'id': book.id,
+            'title': book.title,
+            'description': book.description,
+            'amazon_link': book.amazon_link,
+            'author': book.username,
+            'author_id': book.author_id,
+            'created_at': book.created_at.isoformat(),
+            'review_count': book.review_count or 0,
+            'average_rating': book.rating_sum / book.review_count if book.review_count else None,
+            'url': url_for('view_book', book_id=book.id),
+            'add_to_library_url': url_for('add_to_library', book_id=book.id)
+        } for book in books],
+        'next_cursor': next_cursor
+    })
+
+@app.route('/search')
+@login_required
+def search():
+    query_text = request.args.get('q', '').strip()
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = app.config['BOOKS_PER_PAGE']
+    
+    results = []
+    has_more = False
+    page_results = []
+    if query_text:
+        hits = find_books(query_text, per_page + 1, (page - 1) * per_page)
+        has_more = len(hits) > per_page
+        hits = hits[:per_page]
+        
+        links = dict(db.session.query(Book.id, Book.amazon_link).
+                     filter(Book.id.in_([hit[0] for hit in hits])).all())
+        for book_id, title, snippet, author in hits:
+            results.append({
+                'id': book_id,
+                'title': highlight_matches(title),
+                'snippet': highlight_matches(snippet),
+                'author': highlight_matches(author),
+                'amazon_link': links.get(book_id)
+            })
+        
+        # Matches inside the books, shown with the first page of title matches
+        if page == 1:
+            page_hits = find_pages(query_text, app.config['CONTENT_RESULTS'])
+            titles = dict(db.session.query(Book.id, Book.title).
+                          filter(Book.id.in_({hit[0] for hit in page_hits})).all())
+            page_results = [{
+                'book_id': book_id,
+                'title': titles[book_id],
+                'page': page_number,
+                'snippet': highlight_matches(snippet)
+            } for book_id, page_number, snippet in page_hits if book_id in titles]
+    
+    return render_template('search.html', query=query_text, results=results,
+                           page_results=page_results, page=page, has_more=has_more)
 
 @app.route('/book/<int:book_id>')
 @login_required
 def view_book(book_id):
     book = Book.query.get_or_404(book_id)
-    author = User.query.get(book.author_id)
-    reviews = Review.query.filter_by(book_id=book_id).all()
-    
-    # Calculate average rating
-    avg_rating = 0
-    if reviews:
-        total = sum(review.rating for review in reviews)
-        avg_rating = total / len(reviews)
+    author = book.author
+    author_book_count = Book.query.filter_by(author_id=author.id).count()
+    stats = book.stats or BookStats(book_id=book_id)
+    reviews = Review.query.filter_by(book_id=book_id).\
+        order_by(Review.created_at.desc()).limit(app.config['RECENT_REVIEWS']).all()
     
     in_library = False
     if current_user.is_authenticated:
@@ -379,32 +1734,96 @@ def view_book(book_id):
     return render_template('book.html', 
                            book=book, 
                            author=author,
+                           author_book_count=author_book_count,
                            reviews=reviews,
-                           avg_rating=avg_rating,
+                           stats=stats,
+                           avg_rating=stats.average_rating,
                            in_library=in_library)
 
 @app.route('/book/<int:book_id>/read')
 @login_required
 def read_book(book_id):
     book = Book.query.get_or_404(book_id)
+    ensure_pdf_metadata(book)
     
     # Check if PDF data exists
-    if not book.pdf_data:
+    if not book.pdf_size:
         flash('No PDF data available for this book', 'error')
         return redirect(url_for('view_book', book_id=book_id))
     
-    # Generate a temporary file path for the PDF
-    pdf_path = f'/static/temp/{book_id}.pdf'
-    physical_path = os.path.join(app.root_path, 'static/temp', f'{book_id}.pdf')
-    
-    # Ensure the directory exists
-    os.makedirs(os.path.dirname(physical_path), exist_ok=True)
-    
-    # Write the PDF data to the file
-    with open(physical_path, 'wb') as f:
-        f.write(book.pdf_data)
-    
-    return render_template('read.html', book=book, pdf_path=pdf_path)
+    pdf_path = url_for('book_pdf', book_id=book_id)
+    paged = request.args.get('mode') != 'full'
+    return render_template('read.html', book=book, pdf_path=pdf_path, paged=paged,
+                           page=max(request.args.get('page', 1, type=int), 1),
+                           page_url_template=page_url(book, 0))
+
+@app.route('/book/<int:book_id>/pdf')
+@login_required
+def book_pdf(book_id):
+    book = Book.query.get_or_404(book_id)
+    ensure_pdf_metadata(book)
+    
+    if not book.pdf_size:
+        abort(404)
+    
+    response = app.response_class(mimetype=book.pdf_mimetype or 'application/pdf')
+    response.set_etag(book.pdf_sha256)
+    response.last_modified = book.pdf_updated_at
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    response.headers['Accept-Ranges'] = 'bytes'
+    response.headers['Content-Disposition'] = f'inline; filename="{book_id}.pdf"'
+    
+    # Answer revalidations before touching the blob at all
+    if not is_resource_modified(request.environ, etag=book.pdf_sha256,
+                                last_modified=book.pdf_updated_at):
+        return response.make_conditional(request)
+    
+    stream = open_book_pdf(book)
+    response.response = wrap_file(request.environ, stream, app.config['PDF_CHUNK_SIZE'])
+    response.direct_passthrough = True
+    response.content_length = book.pdf_size
+    try:
+        response = response.make_conditional(request, accept_ranges=True,
+                                             complete_length=book.pdf_size)
+    except Exception:
+        stream.close()
+        raise
+    if response.status_code in (200, 206):
+        pdf_bytes_served.inc(response.content_length or 0, route='pdf')
+    return response
+
+@app.route('/book/<int:book_id>/page/<int:first>', defaults={'last': None})
+@app.route('/book/<int:book_id>/pages/<int:first>-<int:last>')
+@login_required
+def book_page(book_id, first, last):
+    """Serve one page, or a short range of pages, as a standalone PDF"""
+    book = Book.query.get_or_404(book_id)
+    ensure_pdf_metadata(book)
+    
+    last = first if last is None else last
+    if not book.pdf_size or first < 1 or last < first or last - first >= app.config['PAGE_RANGE_MAX']:
+        abort(404)
+    if book.page_count is not None and last > book.page_count:
+        abort(404)
+    
+    path = get_page_range(book, first, last)
+    if path is None:
+        abort(404)
+    
+    # Versioned URLs never change content; unversioned ones always revalidate
+    versioned = request.args.get('v') == book.pdf_sha256[:16]
+    response = send_file(path, mimetype='application/pdf', etag=f'{book.pdf_sha256}-{first}-{last}',
+                         download_name=f'{book_id}-{first}-{last}.pdf',
+                         max_age=365 * 24 * 3600 if versioned else None)
+    response.cache_control.public = False
+    response.cache_control.private = True
+    response.cache_control.immutable = versioned or None
+    if book.page_count is not None:
+        response.headers['X-Page-Count'] = str(book.page_count)
+    if response.status_code in (200, 206):
+        pdf_bytes_served.inc(response.content_length or 0, route='page')
+    return response
 
 @app.route('/library')
 @login_required
@@ -412,14 +1831,19 @@ def library():
     library_books = UserLibrary.query.filter_by(user_id=current_user.id).all()
     books = []
     
+    # Fetch every book on the page in one query; authors are eager-joined onto books
+    book_loader = get_loader(Book)
+    book_loader.load_many([entry.book_id for entry in library_books])
+    
     for entry in library_books:
-        book = Book.query.get(entry.book_id)
-        author = User.query.get(book.author_id)
+        book = book_loader.load(entry.book_id)
+        if book is None:
+            continue
         books.append({
             'id': book.id,
             'title': book.title,
             'description': book.description,
-            'author': author.username,
+            'author': book.author.username,
             'added_at': entry.added_at
         })
     
@@ -440,6 +1864,7 @@ def add_to_library(book_id):
     else:
         library_entry = UserLibrary(user_id=current_user.id, book_id=book_id)
         db.session.add(library_entry)
+        update_book_stats(book_id, {'library_count': 1})
         db.session.commit()
         flash('Book added to your library', 'success')
     
@@ -453,6 +1878,7 @@ def remove_from_library(book_id):
     ).first_or_404()
     
     db.session.delete(library_entry)
+    update_book_stats(book_id, {'library_count': -1})
     db.session.commit()
     flash('Book removed from your library', 'success')
     
@@ -461,29 +1887,38 @@ def remove_from_library(book_id):
 @app.route('/discussions')
 @login_required
 def discussions():
-    # Get all discussions
-    discussions = Discussion.query.order_by(Discussion.created_at.desc()).all()
+    # Most recently active discussions
+    discussions, next_cursor = get_discussion_page(Discussion.query, request.args.get('cursor'))
     
-    # Get user's discussions
-    user_discussions = Discussion.query.filter_by(user_id=current_user.id).order_by(Discussion.created_at.desc()).all()
+    # User's discussions, paged independently
+    user_discussions, next_my_cursor = get_discussion_page(
+        Discussion.query.filter_by(user_id=current_user.id), request.args.get('my_cursor'))
     
-    return render_template('discussions.html', discussions=discussions, user_discussions=user_discussions)
+    return render_template('discussions.html', discussions=discussions, user_discussions=user_discussions,
+                           next_cursor=next_cursor, next_my_cursor=next_my_cursor)
 
 @app.route('/book/<int:book_id>/discussions')
 @login_required
 def book_discussions(book_id):
     book = Book.query.get_or_404(book_id)
-    discussions = Discussion.query.filter_by(book_id=book_id).order_by(Discussion.created_at.desc()).all()
+    stats = book.stats or BookStats(book_id=book_id)
+    discussions, next_cursor = get_discussion_page(Discussion.query.filter_by(book_id=book_id),
+                                                   request.args.get('cursor'))
     
-    return render_template('book_discussions.html', book=book, discussions=discussions)
+    return render_template('book_discussions.html', book=book, discussions=discussions,
+                           discussion_count=stats.discussion_count, next_cursor=next_cursor)
 
 @app.route('/discussion/<int:discussion_id>')
 @login_required
 def view_discussion(discussion_id):
     discussion = Discussion.query.get_or_404(discussion_id)
-    replies = DiscussionReply.query.filter_by(discussion_id=discussion_id).order_by(DiscussionReply.created_at).all()
+    replies, next_cursor = keyset_page(DiscussionReply.query.filter_by(discussion_id=discussion_id),
+                                       DiscussionReply.created_at, DiscussionReply.id,
+                                       request.args.get('cursor'), app.config['REPLIES_PER_PAGE'],
+                                       descending=False)
     
-    return render_template('discussion_detail.html', discussion=discussion, replies=replies)
+    return render_template('discussion_detail.html', discussion=discussion, replies=replies,
+                           next_cursor=next_cursor)
 
 @app.route('/book/<int:book_id>/new-discussion')
 @login_required
@@ -503,14 +1938,18 @@ def create_discussion(book_id):
         flash('Please fill out all fields', 'error')
         return redirect(url_for('new_discussion', book_id=book_id))
     
+    now = datetime.utcnow()
     discussion = Discussion(
         title=title,
         content=content,
         user_id=current_user.id,
-        book_id=book_id
+        book_id=book_id,
+        created_at=now,
+        last_activity_at=now
     )
     
     db.session.add(discussion)
+    update_book_stats(book_id, {'discussion_count': 1})
     db.session.commit()
     
     flash('Discussion created successfully', 'success')
@@ -527,13 +1966,20 @@ def add_reply(discussion_id):
         flash('Reply cannot be empty', 'error')
         return redirect(url_for('view_discussion', discussion_id=discussion_id))
     
+    now = datetime.utcnow()
     reply = DiscussionReply(
         content=content,
         user_id=current_user.id,
-        discussion_id=discussion_id
+        discussion_id=discussion_id,
+        created_at=now
     )
     
     db.session.add(reply)
+    Discussion.query.filter_by(id=discussion_id).update({
+        Discussion.reply_count: Discussion.reply_count + 1,
+        Discussion.last_reply_at: now,
+        Discussion.last_activity_at: now,
+    }, synchronize_session=False)
     db.session.commit()
     
     flash('Reply added successfully', 'success')
@@ -570,7 +2016,23 @@ def author_dashboard():
         return redirect(url_for('index'))
     
     books = Book.query.filter_by(author_id=current_user.id).all()
-    return render_template('author/dashboard.html', books=books)
+    jobs = get_book_job_statuses([book.id for book in books])
+    return render_template('author/dashboard.html', books=books, jobs=jobs)
+
+@app.route('/author/books/status')
+@login_required
+def author_book_status():
+    """Processing status of the current author's books, polled by the dashboard"""
+    book_ids = [book_id for book_id, in db.session.query(Book.id).filter_by(author_id=current_user.id)]
+    jobs = get_book_job_statuses(book_ids)
+    page_counts = dict(db.session.query(Book.id, Book.page_count).filter(Book.id.in_(book_ids)))
+    
+    return jsonify({'books': [{
+        'book_id': book_id,
+        'status': jobs[book_id].status,
+        'attempts': jobs[book_id].attempts,
+        'page_count': page_counts.get(book_id),
+    } for book_id in book_ids if book_id in jobs]})
 
 @app.route('/author/reviews')
 @login_required
@@ -579,17 +2041,22 @@ def author_reviews():
         flash('Access denied. Author privileges required.', 'error')
         return redirect(url_for('index'))
     
-    # Get all reviews for books by this author
-    reviews = Review.query.select_from(Review).\
+    # Reviews of this author's books, newest first, a page at a time
+    query = Review.query.select_from(Review).\
         join(Book, Book.id == Review.book_id).\
         join(User, User.id == Review.user_id).\
         filter(Book.author_id == current_user.id).\
         add_columns(
             Review.id, Review.rating, Review.comment, Review.created_at,
             User.username, Book.title, Book.id.label('book_id')
-        ).order_by(Review.created_at.desc()).all()
+        )
+    reviews, next_cursor = keyset_page(query, Review.created_at, Review.id, request.args.get('cursor'),
+                                       app.config['REVIEWS_PER_PAGE'])
+    review_count = db.session.query(db.func.coalesce(db.func.sum(BookStats.review_count), 0)).\
+        join(Book, Book.id == BookStats.book_id).filter(Book.author_id == current_user.id).scalar()
     
-    return render_template('author/reviews.html', reviews=reviews)
+    return render_template('author/reviews.html', reviews=reviews, review_count=review_count,
+                           next_cursor=next_cursor)
 
 @app.route('/author/discussions')
 @login_required
@@ -598,17 +2065,22 @@ def author_discussions():
         flash('Access denied. Author privileges required.', 'error')
         return redirect(url_for('index'))
     
-    # Get all discussions for books by this author
-    discussions = Discussion.query.select_from(Discussion).\
+    # Discussions of this author's books, newest first, a page at a time
+    query = Discussion.query.select_from(Discussion).\
         join(Book, Book.id == Discussion.book_id).\
         join(User, User.id == Discussion.user_id).\
         filter(Book.author_id == current_user.id).\
         add_columns(
             Discussion.id, Discussion.title, Discussion.content, Discussion.created_at,
             User.username, Book.title.label('book_title'), Book.id.label('book_id')
-        ).order_by(Discussion.created_at.desc()).all()
+        )
+    discussions, next_cursor = keyset_page(query, Discussion.created_at, Discussion.id, request.args.get('cursor'),
+                                           app.config['DISCUSSIONS_PER_PAGE'])
+    discussion_count = db.session.query(db.func.coalesce(db.func.sum(BookStats.discussion_count), 0)).\
+        join(Book, Book.id == BookStats.book_id).filter(Book.author_id == current_user.id).scalar()
     
-    return render_template('author/discussions.html', discussions=discussions)
+    return render_template('author/discussions.html', discussions=discussions,
+                           discussion_count=discussion_count, next_cursor=next_cursor)
 
 @app.route('/author/upload', methods=['GET', 'POST'])
 @login_required
@@ -631,20 +2103,21 @@ def upload_book():
             flash('No file selected', 'error')
             return redirect(url_for('upload_book'))
         
-        # Read PDF data
-        pdf_data = pdf_file.read()
-        
         # Create new book
         book = Book(
             title=title,
             description=description,
             author_id=current_user.id,
-            pdf_data=pdf_data,
-            amazon_link=amazon_link
+            amazon_link=amazon_link,
+            stats=BookStats()
         )
-        
-        db.session.add(book)
-        db.session.commit()
+        # Until the book is committed, nothing else references its file
+        with pdf_store.lock():
+            book.set_pdf(pdf_file.stream)
+            db.session.add(book)
+            enqueue_pdf_processing(book)
+            db.session.commit()
+        uploads_total.inc(method='form')
         
         flash('Book uploaded successfully', 'success')
         return redirect(url_for('author_dashboard'))
@@ -666,16 +2139,136 @@ def edit_book(book_id):
         book.description = request.form.get('description', book.description)
         book.amazon_link = request.form.get('amazon_link', book.amazon_link)
         
+        previous_sha256 = book.pdf_sha256
         pdf_file = request.files.get('pdf_file')
         if pdf_file and pdf_file.filename != '':
-            book.pdf_data = pdf_file.read()
-        
-        db.session.commit()
+            # Until the book is committed, nothing else references its file
+            with pdf_store.lock():
+                book.set_pdf(pdf_file.stream)
+                enqueue_pdf_processing(book)
+                db.session.commit()
+        else:
+            db.session.commit()
+        if previous_sha256 != book.pdf_sha256:
+            release_pdf(previous_sha256)
+        if pdf_file and pdf_file.filename != '':
+            uploads_total.inc(method='form')
         flash('Book updated successfully', 'success')
         return redirect(url_for('author_dashboard'))
     
     return render_template('author/edit_book.html', book=book)
 
+def get_own_upload(upload_id):
+    """Return the metadata of one of the current user's chunked uploads, aborting with 404 otherwise"""
+    try:
+        info = upload_staging.info(upload_id)
+    except KeyError:
+        abort(404)
+    if info.get('user_id') != current_user.id:
+        abort(404)
+    return info
+
+@app.route('/author/uploads', methods=['POST'])
+@login_required
+def start_upload():
+    """Begin a chunked PDF upload for a new book, or for an existing one if book_id is given"""
+    data = request.get_json(silent=True) or {}
+    book_id = data.get('book_id')
+    if book_id is not None:
+        book = Book.query.get_or_404(book_id)
+        if book.author_id != current_user.id and current_user.user_type != 'admin':
+            return jsonify({'error': 'You can only edit your own books'}), 403
+    elif current_user.user_type != 'author':
+        return jsonify({'error': 'Author privileges required'}), 403
+    
+    size = data.get('size')
+    if not isinstance(size, int) or size <= 0:
+        return jsonify({'error': 'size must be a positive number of bytes'}), 400
+    if size > app.config['PDF_MAX_UPLOAD_SIZE']:
+        return jsonify({'error': 'File is too large'}), 413
+    
+    upload_staging.prune(app.config['UPLOAD_SESSION_MAX_AGE'])
+    upload_id = upload_staging.start(user_id=current_user.id, book_id=book_id, size=size,
+                                     filename=secure_filename(data.get('filename') or 'book.pdf'))
+    return jsonify({
+        'upload_id': upload_id,
+        'offset': 0,
+        'chunk_size': app.config['UPLOAD_CHUNK_SIZE'],
+        'url': url_for('upload_chunk', upload_id=upload_id)
+    }), 201
+
+@app.route('/author/uploads/<upload_id>', methods=['GET', 'PUT', 'DELETE'])
+@login_required
+def upload_chunk(upload_id):
+    """Report (GET), extend (PUT ?offset=N with the chunk as the body) or cancel (DELETE) an upload"""
+    info = get_own_upload(upload_id)
+    
+    if request.method == 'DELETE':
+        upload_staging.discard(upload_id)
+        return '', 204
+    
+    current = upload_staging.offset(upload_id)
+    if request.method == 'PUT':
+        offset = request.args.get('offset', type=int)
+        if offset != current:
+            return jsonify({'error': 'Offset does not match the data received so far', 'offset': current}), 409
+        if request.content_length is None:
+            return jsonify({'error': 'Content-Length is required'}), 411
+        if current + request.content_length > info['size']:
+            return jsonify({'error': 'Chunk runs past the declared file size', 'offset': current}), 413
+        
+        try:
+            current = upload_staging.append(upload_id, offset, request.stream, limit=info['size'])
+        except ValueError as error:
+            return jsonify({'error': str(error), 'offset': upload_staging.offset(upload_id)}), 409
+    
+    return jsonify({'upload_id': upload_id, 'offset': current, 'size': info['size']})
+
+@app.route('/author/uploads/<upload_id>/finalize', methods=['POST'])
+@login_required
+def finalize_upload(upload_id):
+    """Commit a complete upload to the PDF store and create or update its book"""
+    info = get_own_upload(upload_id)
+    data = request.get_json(silent=True) or request.form
+    
+    offset = upload_staging.offset(upload_id)
+    if offset != info['size']:
+        return jsonify({'error': 'Upload is incomplete', 'offset': offset}), 409
+    
+    if info.get('book_id') is None:
+        if not data.get('title') or not data.get('description'):
+            return jsonify({'error': 'Please fill all required fields'}), 400
+        book = Book(
+            title=data['title'],
+            description=data['description'],
+            author_id=current_user.id,
+            amazon_link=data.get('amazon_link', ''),
+            stats=BookStats()
+        )
+        db.session.add(book)
+    else:
+        book = Book.query.get_or_404(info['book_id'])
+        if book.author_id != current_user.id and current_user.user_type != 'admin':
+            return jsonify({'error': 'You can only edit your own books'}), 403
+        book.title = data.get('title') or book.title
+        book.description = data.get('description') or book.description
+        book.amazon_link = data.get('amazon_link', book.amazon_link)
+    
+    previous_sha256 = book.pdf_sha256
+    # Hash the staged file first, so a re-hash from disk does not hold up other uploads
+    upload_staging.sha256(upload_id)
+    # Until the book is committed, nothing else references its file
+    with pdf_store.lock():
+        book.set_stored_pdf(*upload_staging.finish(upload_id))
+        enqueue_pdf_processing(book)
+        db.session.commit()
+    if previous_sha256 != book.pdf_sha256:
+        release_pdf(previous_sha256)
+    uploads_total.inc(method='chunked')
+    
+    flash('Book uploaded successfully' if info.get('book_id') is None else 'Book updated successfully', 'success')
+    return jsonify({'book_id': book.id, 'redirect': url_for('author_dashboard')})
+
 @app.route('/author/delete/<int:book_id>', methods=['POST'])
 @login_required
 def delete_book(book_id):
@@ -688,10 +2281,12 @@ def delete_book(book_id):
     
     # Get book title for the flash message
     book_title = book.title
+    pdf_sha256 = book.pdf_sha256
     
     # Delete the book
     db.session.delete(book)
     db.session.commit()
+    release_pdf(pdf_sha256)
     
     flash(f'Book "{book_title}" was successfully deleted', 'success')
     return redirect(url_for('author_dashboard'))
@@ -703,20 +2298,19 @@ def admin_dashboard():
         flash('Access denied. Admin privileges required.', 'error')
         return redirect(url_for('index'))
     
-    user_count = User.query.count()
-    book_count = Book.query.count()
-    review_count = Review.query.count()
-    discussion_count = Discussion.query.count()
+    counters = get_counters()
     
-    recent_users = User.query.order_by(User.created_at.desc()).limit(5).all()
-    recent_books = Book.query.order_by(Book.created_at.desc()).limit(5).all()
-    queries = SupportQuery.query.filter_by(status='open').all()
+    recent_users = get_recent('user')
+    recent_books = get_recent('book')
+    queries = SupportQuery.query.filter_by(status='open').\
+        order_by(SupportQuery.created_at.desc()).limit(app.config['DASHBOARD_OPEN_QUERIES']).all()
     
     return render_template('admin/dashboard.html', 
-                          user_count=user_count,
-                          book_count=book_count,
-                          review_count=review_count,
-                          discussion_count=discussion_count,
+                          user_count=counters.get('user_count', 0),
+                          book_count=counters.get('book_count', 0),
+                          review_count=counters.get('review_count', 0),
+                          discussion_count=counters.get('discussion_count', 0),
+                          open_query_count=counters.get('open_query_count', 0),
                           recent_users=recent_users,
                           recent_books=recent_books,
                           queries=queries)
@@ -728,15 +2322,18 @@ def admin_reviews():
         flash('Access denied. Admin privileges required.', 'error')
         return redirect(url_for('index'))
     
-    reviews = Review.query.select_from(Review).\
+    query = Review.query.select_from(Review).\
         join(User, User.id == Review.user_id).\
         join(Book, Book.id == Review.book_id).\
         add_columns(
             Review.id, Review.rating, Review.comment, Review.created_at,
             User.username, Book.title, Book.id.label('book_id')
-        ).order_by(Review.created_at.desc()).all()
+        )
+    reviews, next_cursor = keyset_page(query, Review.created_at, Review.id, request.args.get('cursor'),
+                                       app.config['REVIEWS_PER_PAGE'])
     
-    return render_template('admin/reviews.html', reviews=reviews)
+    return render_template('admin/reviews.html', reviews=reviews, review_count=get_counters().get('review_count', 0),
+                           next_cursor=next_cursor)
 
 @app.route('/admin/discussions')
 @login_required
@@ -745,15 +2342,18 @@ def admin_discussions():
         flash('Access denied. Admin privileges required.', 'error')
         return redirect(url_for('index'))
     
-    discussions = Discussion.query.select_from(Discussion).\
+    query = Discussion.query.select_from(Discussion).\
         join(User, User.id == Discussion.user_id).\
         join(Book, Book.id == Discussion.book_id).\
         add_columns(
             Discussion.id, Discussion.title, Discussion.content, Discussion.created_at,
             User.username, Book.title.label('book_title'), Book.id.label('book_id')
-        ).order_by(Discussion.created_at.desc()).all()
+        )
+    discussions, next_cursor = keyset_page(query, Discussion.created_at, Discussion.id, request.args.get('cursor'),
+                                           app.config['DISCUSSIONS_PER_PAGE'])
     
-    return render_template('admin/discussions.html', discussions=discussions)
+    return render_template('admin/discussions.html', discussions=discussions,
+                           discussion_count=get_counters().get('discussion_count', 0), next_cursor=next_cursor)
 
 @app.route('/admin/review/delete/<int:review_id>', methods=['POST'])
 @login_required
@@ -765,17 +2365,75 @@ def admin_delete_review(review_id):
     review = Review.query.get_or_404(review_id)
     
     # Store information for the flash message
-    book = Book.query.get(review.book_id)
-    book_title = book.title if book else "Unknown book"
-    username = User.query.get(review.user_id).username if review.user_id else "Unknown user"
+    book_title = review.book.title if review.book else "Unknown book"
+    username = review.user.username if review.user else "Unknown user"
     
     # Delete the review
     db.session.delete(review)
+    update_book_stats(review.book_id, review_stat_deltas(review.rating, -1))
     db.session.commit()
     
     flash(f'Review by {username} for "{book_title}" has been deleted', 'success')
     return redirect(url_for('admin_reviews'))
 
+@app.route('/metrics')
+def prometheus_metrics():
+    """Request and application metrics of every worker on this host, in Prometheus text format"""
+    token = app.config['METRICS_TOKEN']
+    if not token:
+        abort(404)
+    if request.headers.get('Authorization') != f'Bearer {token}':
+        abort(401)
+    return app.response_class(metrics_registry.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/admin/perf')
+@login_required
+def admin_perf():
+    if current_user.user_type != 'admin':
+        flash('Access denied. Admin privileges required.', 'error')
+        return redirect(url_for('index'))
+    
+    profiles = profiler.snapshot()
+    suspects_only = request.args.get('suspects') == '1'
+    if suspects_only:
+        profiles = [profile for profile in profiles if profile['suspect']]
+    
+    count = len(profiles) or 1
+    summary = {
+        'enabled': profiler.enabled,
+        'process': os.getpid(),
+        'requests': len(profiles),
+        'suspects': sum(1 for profile in profiles if profile['suspect']),
+        'avg_queries': round(sum(profile['query_count'] for profile in profiles) / count, 1),
+        'avg_sql_ms': round(sum(profile['sql_ms'] for profile in profiles) / count, 2),
+        'avg_overhead_ms': round(sum(profile['overhead_ms'] for profile in profiles) / count, 3),
+        'budgets': {'queries': profiler.max_queries, 'repeats': profiler.max_repeats,
+                    'sql_ms': profiler.max_sql_time * 1000},
+    }
+    
+    if request.args.get('format') == 'json':
+        return jsonify({'summary': summary, 'profiles': profiles})
+    
+    return render_template('admin/perf.html', summary=summary, profiles=profiles,
+                           suspects_only=suspects_only)
+
+@app.route('/admin/perf', methods=['POST'])
+@login_required
+def admin_perf_settings():
+    if current_user.user_type != 'admin':
+        flash('Access denied. Admin privileges required.', 'error')
+        return redirect(url_for('index'))
+    
+    action = request.form.get('action')
+    if action == 'clear':
+        profiler.clear()
+        flash('Request profiles cleared', 'success')
+    elif action in ('enable', 'disable'):
+        profiler.enabled = action == 'enable'
+        flash(f'SQL profiling {action}d for this worker process', 'success')
+    
+    return redirect(url_for('admin_perf'))
+
 @app.route('/admin/discussion/delete/<int:discussion_id>', methods=['POST'])
 @login_required
 def admin_delete_discussion(discussion_id):
@@ -786,15 +2444,15 @@ def admin_delete_discussion(discussion_id):
     discussion = Discussion.query.get_or_404(discussion_id)
     
     # Store information for the flash message
-    book = Book.query.get(discussion.book_id)
-    book_title = book.title if book else "Unknown book"
-    username = User.query.get(discussion.user_id).username if discussion.user_id else "Unknown user"
+    book_title = discussion.book.title if discussion.book else "Unknown book"
+    username = discussion.user.username if discussion.user else "Unknown user"
     
     # Delete associated replies first (to avoid foreign key constraint violations)
     DiscussionReply.query.filter_by(discussion_id=discussion_id).delete()
     
     # Delete the discussion
     db.session.delete(discussion)
+    update_book_stats(discussion.book_id, {'discussion_count': -1})
     db.session.commit()
     
     flash(f'Discussion "{discussion.title}" by {username} for "{book_title}" has been deleted', 'success')
@@ -812,6 +2470,14 @@ def submit_review(book_id):
         flash('Please provide a rating', 'error')
         return redirect(url_for('view_book', book_id=book_id))
     
+    try:
+        rating = int(rating)
+    except ValueError:
+        rating = 0
+    if not 1 <= rating <= 5:
+        flash('Rating must be between 1 and 5', 'error')
+        return redirect(url_for('view_book', book_id=book_id))
+    
     # Check if user already reviewed this book
     existing_review = Review.query.filter_by(
         user_id=current_user.id, book_id=book_id
@@ -819,20 +2485,26 @@ def submit_review(book_id):
     
     if existing_review:
         # Update existing review
+        deltas = review_stat_deltas(existing_review.rating, -1)
+        deltas.update(review_stat_deltas(rating))
         existing_review.rating = rating
         existing_review.comment = comment
+        update_book_stats(book_id, deltas)
         db.session.commit()
+        reviews_total.inc(action='updated')
         flash('Your review has been updated', 'success')
     else:
         # Create new review
         review = Review(
             book_id=book_id,
             user_id=current_user.id,
-            rating=int(rating),
+            rating=rating,
             comment=comment
         )
         db.session.add(review)
+        update_book_stats(book_id, review_stat_deltas(rating))
         db.session.commit()
+        reviews_total.inc(action='created')
         flash('Your review has been submitted', 'success')
     
     return redirect(url_for('view_book', book_id=book_id))
@@ -841,9 +2513,11 @@ def submit_review(book_id):
 @login_required
 def book_reviews(book_id):
     book = Book.query.get_or_404(book_id)
-    reviews = Review.query.filter_by(book_id=book_id).order_by(Review.created_at.desc()).all()
+    reviews, next_cursor = keyset_page(Review.query.filter_by(book_id=book_id), Review.created_at, Review.id,
+                                       request.args.get('cursor'), app.config['REVIEWS_PER_PAGE'])
     
-    return render_template('book_reviews.html', book=book, reviews=reviews)
+    return render_template('book_reviews.html', book=book, reviews=reviews,
+                           review_count=get_book_stats(book_id).review_count, next_cursor=next_cursor)
 
 @app.route('/tech_support/dashboard')
 @login_required
@@ -852,13 +2526,22 @@ def tech_support_dashboard():
         flash('Access denied. Tech support access required.', 'error')
         return redirect(url_for('index'))
     
-    # Get all support queries
-    open_queries = SupportQuery.query.filter_by(status='open').order_by(SupportQuery.created_at.desc()).all()
-    resolved_queries = SupportQuery.query.filter_by(status='resolved').order_by(SupportQuery.created_at.desc()).all()
+    # Open and resolved support queries, newest first, each paged independently
+    per_page = app.config['SUPPORT_QUERIES_PER_PAGE']
+    open_queries, next_open_cursor = keyset_page(SupportQuery.query.filter_by(status='open'),
+                                                 SupportQuery.created_at, SupportQuery.id,
+                                                 request.args.get('open_cursor'), per_page)
+    resolved_queries, next_resolved_cursor = keyset_page(SupportQuery.query.filter_by(status='resolved'),
+                                                         SupportQuery.created_at, SupportQuery.id,
+                                                         request.args.get('resolved_cursor'), per_page)
     
     return render_template('tech_support/dashboard.html', 
                           open_queries=open_queries, 
-                          resolved_queries=resolved_queries)
+                          resolved_queries=resolved_queries,
+                          open_count=get_counters().get('open_query_count', 0),
+                          resolved_count=SupportQuery.query.filter_by(status='resolved').count(),
+                          next_open_cursor=next_open_cursor,
+                          next_resolved_cursor=next_resolved_cursor)
 
 @app.route('/tech_support/respond/<int:query_id>', methods=['POST'])
 @login_required
@@ -884,6 +2567,6 @@ def respond_to_query(query_id):
 # Run the app
 if __name__ == '__main__':
     with app.app_context():
-        db.create_all()
+        migrate_database()
         add_sample_data()
     app.run(debug=True) 
\ No newline at end of file
@@ -0,0 +1,153 @@
+"""Pre-rendered copies of the desktop client's procedurally drawn images.
+
+The client draws its artwork with PIL at every launch, the 1024x768
+bookshelf most of all. AssetCache draws each image the first time a screen
+asks for it and saves it under the assets directory, so later launches only
+read a file, and images no screen has shown yet are not drawn at all. Files
+are named after the image, its size, the theme and a hash of the drawing
+code and arguments, so editing the drawing code makes the old file stale
+instead of showing it; stale files for the same image are deleted when the
+new one is written. The hash covers the drawing function and every function
+or method of its module that it calls, directly or through other helpers.
+
+Files are uncompressed TGA rather than PNG: decoding a 1024x768 RGBA PNG
+takes longer than drawing the bookshelf, while reading the TGA takes a
+fraction of it.
+"""
+import hashlib
+import os
+import time
+
+from PIL import Image, ImageTk
+
+
+def _hash_code(code, digest):
+    """Add a code object's bytecode, constants and names to ``digest``, including nested functions"""
+    digest.update(code.co_code)
+    digest.update(repr(code.co_names).encode('utf-8'))
+    for const in code.co_consts:
+        if hasattr(const, 'co_code'):
+            _hash_code(const, digest)
+        else:
+            digest.update(repr(const).encode('utf-8'))
+
+
+def _names(code):
+    """Every global and attribute name a code object or its nested functions use"""
+    yield from code.co_names
+    for const in code.co_consts:
+        if hasattr(const, 'co_code'):
+            yield from _names(const)
+
+
+def code_version(draw):
+    """Hash of a drawing function's code and of the functions of its module it calls.
+
+    ``draw`` may be a function or a bound method. Global names and attributes
+    (``self.helper(...)``) that resolve to a function or method defined in the
+    same module are followed, so editing a helper changes the version too.
+    """
+    owner = type(draw.__self__) if hasattr(draw, '__self__') else None
+    draw = getattr(draw, '__func__', draw)
+    digest = hashlib.sha1()
+    pending, seen = [draw], {draw}
+    while pending:
+        func = pending.pop()
+        _hash_code(func.__code__, digest)
+        for name in _names(func.__code__):
+            callee = func.__globals__.get(name)
+            if callee is None and owner is not None:
+                callee = getattr(owner, name, None)
+            callee = getattr(callee, '__func__', callee)
+            if (hasattr(callee, '__code__') and getattr(callee, '__module__', None) == draw.__module__
+                    and callee not in seen):
+                seen.add(callee)
+                pending.append(callee)
+    return digest.hexdigest()
+
+
+class AssetCache:
+    """Mapping of image name -> PhotoImage, rendered or loaded on first use.
+
+    Register an image with ``register(name, draw, width, height, *args)``;
+    ``draw(width, height, *args)`` must return a PIL image.
+    """
+    def __init__(self, directory, theme):
+        self.directory = directory
+        self.theme = theme
+        self._recipes = {}  # name -> (draw, width, height, args)
+        self._photos = {}
+        self.drawn = 0
+        self.loaded = 0
+        self.draw_seconds = 0.0
+        self.load_seconds = 0.0
+
+    def register(self, name, draw, width, height, *args):
+        self._recipes[name] = (draw, width, height, args)
+
+    def __getitem__(self, name):
+        photo = self._photos.get(name)
+        if photo is None:
+            photo = self._photos[name] = ImageTk.PhotoImage(self.render(name))
+        return photo
+
+    def __contains__(self, name):
+        return name in self._recipes
+
+    def prefix(self, name):
+        """File name prefix shared by every version of an image at its size and theme"""
+        draw, width, height, args = self._recipes[name]
+        return f'{name}-{width}x{height}-{self.theme}-'
+
+    def path(self, name):
+        draw, width, height, args = self._recipes[name]
+        version = hashlib.sha1(f'{code_version(draw)}{args!r}'.encode('utf-8')).hexdigest()[:12]
+        return os.path.join(self.directory, f'{self.prefix(name)}{version}.tga')
+
+    def render(self, name):
+        """Return the PIL image for ``name``, from its cached file if that is current"""
+        draw, width, height, args = self._recipes[name]
+        path = self.path(name)
+        started = time.perf_counter()
+        try:
+            image = Image.open(path)
+            image.load()
+        except (OSError, SyntaxError, ValueError):
+            # Missing, stale or damaged; draw it again below
+            pass
+        else:
+            self.loaded += 1
+            self.load_seconds += time.perf_counter() - started
+            return image
+
+        image = draw(width, height, *args)
+        self.drawn += 1
+        self.draw_seconds += time.perf_counter() - started
+        self._save(name, path, image)
+        return image
+
+    def _save(self, name, path, image):
+        prefix = self.prefix(name)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            # Written whole under another name first, so a crash never leaves half a file behind
+            image.save(f'{path}.tmp', format='TGA')
+            os.replace(f'{path}.tmp', path)
+            for other in os.listdir(self.directory):
+                if other.startswith(prefix) and other.endswith('.tga') and other != os.path.basename(path):
+                    os.remove(os.path.join(self.directory, other))
+        except OSError as e:
+            # A read-only assets directory only costs the time to draw it again next launch
+            print(f"Could not cache {name} image: {e}")
+
+    def stats(self):
+        return {
+            'drawn': self.drawn,
+            'loaded': self.loaded,
+            'draw_ms': round(self.draw_seconds * 1000, 1),
+            'load_ms': round(self.load_seconds * 1000, 1),
+        }
+
+    def __str__(self):
+        return (f"{self.drawn} drawn in {self.draw_seconds * 1000:.0f} ms, "
+                f"{self.loaded} loaded from {self.directory} in {self.load_seconds * 1000:.0f} ms")
@@ -6,6 +6,9 @@ import os
 import io
 import base64
 import threading
+import json
+import time
+from collections import OrderedDict
 from datetime import datetime
 from PIL import Image, ImageTk, ImageDraw, ImageFilter, ImageOps
 import PyPDF2
@@ -15,14 +18,31 @@ from ttkbootstrap.constants import *
 from ttkbootstrap.toast import ToastNotification
 import math
 import random
+import content_index
+import search_index
+import desktop_sql
+from virtual_grid import VirtualGrid
+from db_worker import DatabaseWorker
+from image_cache import ImageCache, content_digest
+from asset_cache import AssetCache
 
-# Create assets directory if it doesn't exist
+# Startup timings count from here, once the libraries are imported
+STARTED = time.perf_counter()
+
+# Create assets directory if it doesn't exist; drawn images are cached in it
 if not os.path.exists('assets'):
     os.makedirs('assets')
 
+# Set BOOKVERSE_STARTUP_TIMES=1 to print how long the login screen takes to
+# appear and keep the figures for the last STARTUP_LOG_LIMIT launches, one
+# JSON line each
+STARTUP_TIMES = os.environ.get('BOOKVERSE_STARTUP_TIMES', '') not in ('', '0')
+STARTUP_LOG = os.path.join('assets', 'startup_times.jsonl')
+STARTUP_LOG_LIMIT = 100
+
 class Database:
-    def __init__(self):
-        database_file = 'bookverse.db'
+    def __init__(self, database_file='bookverse.db'):
+        self.database_file = os.path.abspath(database_file)
         # Connect to the database
         self.conn = sqlite3.connect(database_file)
         self.cursor = self.conn.cursor()
@@ -30,10 +50,21 @@ class Database:
         # Initialize database tables
         self.initialize_db()
         self.migrate_db()
+        self.apply_schema_migrations()
+        self.initialize_search_index()
         
         # Add sample books if database is empty
         self.add_sample_books()
         
+    @classmethod
+    def connect(cls, database_file):
+        """Open another connection to an already initialised database, e.g. for the background worker"""
+        db = cls.__new__(cls)
+        db.database_file = os.path.abspath(database_file)
+        db.conn = sqlite3.connect(db.database_file)
+        db.cursor = db.conn.cursor()
+        return db
+        
     def migrate_db(self):
         """Handle database migrations for schema updates"""
         try:
@@ -173,6 +204,15 @@ class Database:
         ''')
         self.conn.commit()
 
+    def apply_schema_migrations(self):
+        """Apply the desktop_sql.SCHEMA_MIGRATIONS steps this database does not have yet"""
+        version = self.cursor.execute('PRAGMA user_version').fetchone()[0]
+        for number, statements in enumerate(desktop_sql.SCHEMA_MIGRATIONS[version:], start=version + 1):
+            for statement in statements:
+                self.cursor.execute(statement)
+            self.cursor.execute(f'PRAGMA user_version = {number}')
+            self.conn.commit()
+
     def initialize_db(self):
         # Users table
         self.cursor.execute('''
@@ -299,6 +339,103 @@ class Database:
         
         self.conn.commit()
 
+    def initialize_search_index(self):
+        """Create the FTS5 indexes over book titles, descriptions, author names and page text"""
+        search_index.create_search_index(self.conn, books='books', users='users',
+                                         author_key='author_email', user_key='email')
+        content_index.create_content_index(self.conn, books='books')
+
+    def index_book_contents(self, book_id):
+        """Extract a book's page text into the content index.
+
+        Uses its own connection so it can run on a background thread; run
+        ``python -m content_index`` to index books uploaded before this existed.
+        """
+        texts = content_index.extract_pages(('blob', self.database_file, 'books', 'pdf_data', book_id))
+        conn = sqlite3.connect(self.database_file)
+        try:
+            size = conn.execute(desktop_sql.BOOK_PDF_SIZE, (book_id,)).fetchone()[0]
+            content_index.index_book_pages(conn, book_id, f'size:{size}', texts)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def search_book_contents(self, search_term, limit=50):
+        """Return (title, page_number, snippet) rows for matches inside books, best first"""
+        hits = content_index.search_pages(self.conn, search_term, limit,
+                                          start_mark='\u00ab', end_mark='\u00bb')
+        if not hits:
+            return []
+        
+        book_ids = sorted({hit[0] for hit in hits})
+        placeholders = ','.join('?' * len(book_ids))
+        self.cursor.execute(f'SELECT id, title FROM books WHERE id IN ({placeholders})', book_ids)
+        titles = dict(self.cursor.fetchall())
+        return [(titles[book_id], page_number, snippet)
+                for book_id, page_number, snippet in hits if book_id in titles]
+
+    def search_books(self, search_term, limit=100):
+        """Return (title, description snippet, username, amazon_link, author email) rows ranked by relevance"""
+        hits = search_index.search_books(self.conn, search_term, limit,
+                                         start_mark='\u00ab', end_mark='\u00bb')
+        if not hits:
+            return []
+        
+        book_ids = [hit[0] for hit in hits]
+        placeholders = ','.join('?' * len(book_ids))
+        self.cursor.execute(f'''
+            SELECT b.id, b.title, u.username, b.amazon_link, u.email
+            FROM books b
+            JOIN users u ON b.author_email = u.email
+            WHERE b.id IN ({placeholders})
+        ''', book_ids)
+        books = {row[0]: row[1:] for row in self.cursor.fetchall()}
+        
+        results = []
+        for book_id, _title, snippet, _author in hits:
+            if book_id in books:
+                title, username, amazon_link, author_email = books[book_id]
+                results.append((title, snippet or '', username, amazon_link, author_email))
+        return results
+
+    def list_books(self):
+        """Return (title, description, username, amazon_link, author email) rows for every book"""
+        self.cursor.execute(desktop_sql.ALL_BOOKS)
+        return self.cursor.fetchall()
+
+    def list_library_books(self, user_email):
+        """Return a reader's library as book rows with last_read appended, most recently read first"""
+        self.cursor.execute(desktop_sql.LIBRARY_BOOKS, (user_email,))
+        return self.cursor.fetchall()
+
+    def load_avatars(self, emails):
+        """Return {email: (content digest, avatar bytes)} for those of the users who have an avatar"""
+        emails = sorted(set(emails))
+        avatars = {}
+        # A few hundred at a time keeps each statement under SQLite's bound parameter limit
+        for start in range(0, len(emails), 500):
+            chunk = emails[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            self.cursor.execute(f'''
+                SELECT email, avatar FROM users
+                WHERE email IN ({placeholders}) AND avatar IS NOT NULL
+            ''', chunk)
+            for email, avatar_data in self.cursor.fetchall():
+                avatars[email] = (content_digest(avatar_data), avatar_data)
+        return avatars
+
+    def export_book_pdf(self, title, directory):
+        """Write a book's PDF into directory and return (path, book id), or None if there is no such book"""
+        self.cursor.execute(desktop_sql.BOOK_PDF_BY_TITLE, (title,))
+        result = self.cursor.fetchone()
+        if not result:
+            return None
+        book_id, pdf_data = result
+        pdf_path = os.path.join(directory, f"{title}.pdf")
+        with open(pdf_path, 'wb') as pdf_file:
+            pdf_file.write(pdf_data)
+        return pdf_path, book_id
+
     def hash_password(self, password):
         salt = os.urandom(32)
         key = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, 100000)
@@ -325,7 +462,7 @@ class Database:
             return False
 
     def login_user(self, email, password):
-        self.cursor.execute('SELECT password, user_type FROM users WHERE email = ?', (email,))
+        self.cursor.execute(desktop_sql.LOGIN, (email,))
         result = self.cursor.fetchone()
         if result and self.verify_password(result[0], password):
             return result[1]  # Return user type
@@ -393,9 +530,23 @@ class bookverseApp:
         self.root = root
         self.root.title("BookVerse Reader")
         self.root.geometry("1024x768")
+        self.startup_marks = [("window", time.perf_counter())]
         
         # Initialize database
         self.db = Database()
+        self.startup_marks.append(("database", time.perf_counter()))
+        
+        # Queries, password hashing and PDF reads that would freeze the window run here
+        self.db_worker = DatabaseWorker(self.root, lambda: Database.connect(self.db.database_file))
+        
+        # Decoded, resized avatars shared by every card that shows the same author
+        self.avatar_cache = ImageCache()
+        # email -> (content digest, avatar bytes) for the authors of the books last listed,
+        # fetched and hashed on the worker so filling a card never touches the database
+        self.author_avatars = {}
+        
+        # Rendered background gradients by (width, height, color1, color2), least recently used first
+        self.gradients = OrderedDict()
         
         # Set up theme - using ttkbootstrap
         self.theme = 'bookverse'  # Custom theme name
@@ -438,6 +589,7 @@ class bookverseApp:
         
         # Configure styles
         self.configure_styles()
+        self.startup_marks.append(("styles", time.perf_counter()))
         
         # Create authentication frame
         self.auth_frame = ttk.Frame(self.root, style="Auth.TFrame")
@@ -445,48 +597,78 @@ class bookverseApp:
         
         # Show authentication screen
         self.show_auth_screen()
+        self.startup_marks.append(("auth screen", time.perf_counter()))
+        
+        # Idle callbacks run after the pending redraws, so this is once the screen is up
+        if STARTUP_TIMES:
+            self.root.after_idle(self.report_startup)
+        
+    def report_startup(self):
+        """Print how long the login screen took to appear and add it to the startup log"""
+        self.startup_marks.append(("first draw", time.perf_counter()))
+        phases = {}
+        previous = STARTED
+        for phase, moment in self.startup_marks:
+            phases[phase] = round((moment - previous) * 1000, 1)
+            previous = moment
+        total_ms = round((previous - STARTED) * 1000, 1)
+        
+        print(f"Login screen ready {total_ms:.0f} ms after start ("
+              + ", ".join(f"{phase} {ms:.0f} ms" for phase, ms in phases.items()) + ")")
+        print(f"Images: {self.images}")
+        entry = json.dumps({
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "total_ms": total_ms,
+            "phases": phases,
+            "images": self.images.stats(),
+        })
+        try:
+            try:
+                with open(STARTUP_LOG) as log:
+                    entries = log.read().splitlines()
+            except FileNotFoundError:
+                entries = []
+            # Only the most recent launches are kept, so the file stays small
+            entries = (entries + [entry])[-STARTUP_LOG_LIMIT:]
+            with open(f"{STARTUP_LOG}.tmp", 'w') as log:
+                log.write("\n".join(entries) + "\n")
+            os.replace(f"{STARTUP_LOG}.tmp", STARTUP_LOG)
+        except OSError as e:
+            print(f"Could not write startup log: {e}")
         
     def load_images(self):
-        """Load and initialize all images and icons used in the app"""
-        self.images = {}
-        
-        # Create coffee cup image for login screen
-        coffee_img = self.create_coffee_cup_image(180, 180)
-        self.images['coffee'] = ImageTk.PhotoImage(coffee_img)
-        
-        # Create book icon
-        book_img = self.create_book_icon(100, 100)
-        self.images['book'] = ImageTk.PhotoImage(book_img)
+        """Register all images and icons used in the app.
+
+        Each is drawn, or loaded from its copy in assets/ if an earlier launch
+        drew it with the same code, the first time a screen uses it.
+        """
+        self.images = AssetCache('assets', "dark" if self.dark_mode else "light")
         
-        # Create cat icon
-        cat_img = self.create_cat_icon(150, 150)
-        self.images['cat'] = ImageTk.PhotoImage(cat_img)
+        # Coffee cup image for login screen
+        self.images.register('coffee', self.create_coffee_cup_image, 180, 180)
         
-        # Create bookshelf background
-        bookshelf_img = self.create_bookshelf_image(1024, 768)
-        self.images['bookshelf'] = ImageTk.PhotoImage(bookshelf_img)
+        # Book icon
+        self.images.register('book', self.create_book_icon, 100, 100)
         
-        # Create user avatar placeholder
-        avatar_img = self.create_avatar_placeholder(100, 100, "UU")
-        self.images['avatar'] = ImageTk.PhotoImage(avatar_img)
+        # Cat icon
+        self.images.register('cat', self.create_cat_icon, 150, 150)
         
-        # Create home icon
-        home_img = self.create_home_icon(24, 24)
-        self.images['home'] = ImageTk.PhotoImage(home_img)
+        # Bookshelf background
+        self.images.register('bookshelf', self.create_bookshelf_image, 1024, 768)
         
-        # Create bookmark icon
-        bookmark_img = self.create_bookmark_icon(24, 24)
-        self.images['bookmark'] = ImageTk.PhotoImage(bookmark_img)
+        # User avatar placeholder
+        self.images.register('avatar', self.create_avatar_placeholder, 100, 100, "UU")
         
-        # Create badge icons
-        reader_badge_img = self.create_badge_icon(24, 24, "📚")
-        self.images['reader_badge'] = ImageTk.PhotoImage(reader_badge_img)
+        # Home icon
+        self.images.register('home', self.create_home_icon, 24, 24)
         
-        reviewer_badge_img = self.create_badge_icon(24, 24, "⭐")
-        self.images['reviewer_badge'] = ImageTk.PhotoImage(reviewer_badge_img)
+        # Bookmark icon
+        self.images.register('bookmark', self.create_bookmark_icon, 24, 24)
         
-        author_badge_img = self.create_badge_icon(24, 24, "✍️")
-        self.images['author_badge'] = ImageTk.PhotoImage(author_badge_img)
+        # Badge icons
+        self.images.register('reader_badge', self.create_badge_icon, 24, 24, "📚")
+        self.images.register('reviewer_badge', self.create_badge_icon, 24, 24, "⭐")
+        self.images.register('author_badge', self.create_badge_icon, 24, 24, "✍️")
     
     def create_coffee_cup_image(self, width, height):
         """Create a coffee cup image"""
@@ -1104,19 +1286,51 @@ class bookverseApp:
         theme_btn.pack(pady=10)
     
     def draw_gradient_background(self, canvas, width, height, color1, color2):
-        """Draw a gradient background on a canvas"""
-        for i in range(height):
-            # Calculate color for this line as a blend between color1 and color2
-            r1, g1, b1 = self.hex_to_rgb(color1)
-            r2, g2, b2 = self.hex_to_rgb(color2)
-            
-            ratio = i / height
-            r = int(r1 * (1 - ratio) + r2 * ratio)
-            g = int(g1 * (1 - ratio) + g2 * ratio)
-            b = int(b1 * (1 - ratio) + b2 * ratio)
-            
-            color = f'#{r:02x}{g:02x}{b:02x}'
-            canvas.create_line(0, i, width, i, fill=color)
+        """Draw a gradient background on a canvas as a single image item behind everything else.
+
+        The gradient is rendered again at the canvas's new size once a resize settles.
+        """
+        photo = self.gradient_image(width, height, color1, color2)
+        item = canvas.create_image(0, 0, anchor="nw", image=photo)
+        canvas.tag_lower(item)
+        canvas.gradient = photo  # Keep a reference in case the cache drops it
+        state = {"pending": None, "size": (width, height)}
+        
+        def render():
+            state["pending"] = None
+            if not canvas.winfo_exists():
+                return
+            size = (canvas.winfo_width(), canvas.winfo_height())
+            if size == state["size"] or min(size) <= 1:
+                return
+            state["size"] = size
+            canvas.gradient = self.gradient_image(size[0], size[1], color1, color2)
+            canvas.itemconfigure(item, image=canvas.gradient)
+        
+        def on_resize(event):
+            # Dragging a window edge sends a stream of events; render once they stop
+            if state["pending"] is not None:
+                canvas.after_cancel(state["pending"])
+            state["pending"] = canvas.after(150, render)
+        
+        canvas.bind("<Configure>", on_resize, add="+")
+    
+    def gradient_image(self, width, height, color1, color2):
+        """Return a width x height PhotoImage blending from color1 at the top to color2 at the bottom"""
+        key = (width, height, color1, color2)
+        photo = self.gradients.get(key)
+        if photo is not None:
+            self.gradients.move_to_end(key)
+            return photo
+        
+        # Blend one pixel column along a 0-255 ramp, then stretch it sideways
+        mask = Image.linear_gradient("L").resize((1, height))
+        column = Image.composite(Image.new("RGB", (1, height), color2), Image.new("RGB", (1, height), color1), mask)
+        gradient = column.resize((width, height), Image.NEAREST)
+        photo = self.gradients[key] = ImageTk.PhotoImage(gradient)
+        while len(self.gradients) > 8:
+            self.gradients.popitem(last=False)
+        return photo
     
     def hex_to_rgb(self, hex_color):
         """Convert hex color to RGB tuple"""
@@ -1256,8 +1470,8 @@ class bookverseApp:
         button_frame = ttk.Frame(card_frame, style="Card.TFrame")
         button_frame.pack(pady=20)
         
-        login_btn = self.create_rounded_button(button_frame, "Snuggle In", self.login, primary=True)
-        login_btn.pack()
+        self.login_btn = self.create_rounded_button(button_frame, "Snuggle In", self.login, primary=True)
+        self.login_btn.pack()
         
         # Back button
         back_btn = self.create_rounded_button(card_frame, "← Back", self.show_auth_screen, primary=False)
@@ -1421,8 +1635,8 @@ class bookverseApp:
         button_frame = ttk.Frame(card_frame, style="Card.TFrame")
         button_frame.pack(pady=20)
         
-        register_btn = self.create_rounded_button(button_frame, "Join the Bookshelf", self.register, primary=True)
-        register_btn.pack()
+        self.register_btn = self.create_rounded_button(button_frame, "Join the Bookshelf", self.register, primary=True)
+        self.register_btn.pack()
         
         # Back button
         back_btn = self.create_rounded_button(card_frame, "← Back", self.show_auth_screen, primary=False)
@@ -1467,15 +1681,31 @@ class bookverseApp:
             self.show_main_interface()
             return
         
-        user_type = self.db.login_user(email, password)
-        if user_type:
-            self.current_user = email
-            self.user_type = user_type
-            self.auth_frame.destroy()
-            self.show_main_interface()
-            self.show_toast(f"Welcome back!", "success")
-        else:
-            self.show_toast("Invalid email or password", "error")
+        # Checking the password hash takes a noticeable moment, so it runs on the worker
+        login_btn = self.login_btn
+        login_btn.config(state=tk.DISABLED, text="Signing in...")
+        
+        def logged_in(user_type):
+            if not login_btn.winfo_exists():
+                # The login form was left while the password was being checked
+                return
+            if user_type:
+                self.current_user = email
+                self.user_type = user_type
+                self.auth_frame.destroy()
+                self.show_main_interface()
+                self.show_toast(f"Welcome back!", "success")
+            else:
+                login_btn.config(state=tk.NORMAL, text="Snuggle In")
+                self.show_toast("Invalid email or password", "error")
+        
+        def login_failed(error):
+            if login_btn.winfo_exists():
+                login_btn.config(state=tk.NORMAL, text="Snuggle In")
+            self.show_toast(f"Login failed: {str(error)}", "error")
+        
+        self.db_worker.submit(Database.login_user, email, password,
+                              on_done=logged_in, on_error=login_failed, key="login")
             
     def register(self):
         """Handle user registration"""
@@ -1497,14 +1727,38 @@ class bookverseApp:
             self.show_toast("Please fill in all required fields", "error")
             return
             
-        try:
-            # Validate date format
-            if date_of_birth:
+        # Validate date format
+        if date_of_birth:
+            try:
                 datetime.strptime(date_of_birth, "%Y-%m-%d")
-            
-            # Hash the password using the Database class method
-            hashed_password = self.db.hash_password(password)
-            
+            except ValueError:
+                self.show_toast("Invalid date format. Please use YYYY-MM-DD", "error")
+                return
+        
+        # Hashing the password takes a noticeable moment, so it runs on the worker
+        register_btn = self.register_btn
+        register_btn.config(state=tk.DISABLED, text="Joining...")
+        
+        def hashed(hashed_password):
+            if not register_btn.winfo_exists():
+                # The registration form was left while the password was being hashed
+                return
+            register_btn.config(state=tk.NORMAL, text="Join the Bookshelf")
+            self.save_registration(email, username, hashed_password, full_name, user_type,
+                                   date_of_birth, gender, genre_preference)
+        
+        def hash_failed(error):
+            if register_btn.winfo_exists():
+                register_btn.config(state=tk.NORMAL, text="Join the Bookshelf")
+            self.show_toast(f"Registration failed: {str(error)}", "error")
+        
+        self.db_worker.submit(Database.hash_password, password,
+                              on_done=hashed, on_error=hash_failed, key="register")
+    
+    def save_registration(self, email, username, hashed_password, full_name, user_type,
+                          date_of_birth, gender, genre_preference):
+        """Store a new account once its password has been hashed"""
+        try:
             # Generate avatar
             avatar_img = self.generate_avatar_for_user(username, email)
             # Convert image to binary data
@@ -1524,8 +1778,6 @@ class bookverseApp:
             self.show_toast("Registration successful!", "success")
             self.show_auth_screen()
             
-        except ValueError:
-            self.show_toast("Invalid date format. Please use YYYY-MM-DD", "error")
         except sqlite3.IntegrityError:
             self.show_toast("Email already registered", "error")
         except Exception as e:
@@ -1572,7 +1824,7 @@ class bookverseApp:
             username = self.tech_support_username
         else:
             # Get user information from database
-            self.db.cursor.execute('SELECT username FROM users WHERE email = ?', (self.current_user,))
+            self.db.cursor.execute(desktop_sql.USERNAME, (self.current_user,))
             user_data = self.db.cursor.fetchone()
             
             if user_data is None:
@@ -1690,13 +1942,7 @@ class bookverseApp:
         title_label.pack(pady=10)
         
         # Get user's reviews
-        self.db.cursor.execute('''
-            SELECT r.book_id, r.rating, r.comment, r.review_date, b.title
-            FROM reviews r
-            JOIN books b ON r.book_id = b.id
-            WHERE r.user_email = ?
-            ORDER BY r.review_date DESC
-        ''', (self.current_user,))
+        self.db.cursor.execute(desktop_sql.USER_REVIEWS, (self.current_user,))
         
         reviews = self.db.cursor.fetchall()
         
@@ -1848,370 +2094,283 @@ class bookverseApp:
                                              lambda: self.search_books(self.content_frame))
         search_btn.pack(side=tk.LEFT, padx=5)
         
-        # Books display frame with scrollbar
-        books_container = ttk.Frame(main_content)
-        books_container.pack(fill="both", expand=True, padx=20, pady=10)
+        # Matches inside the books' text, filled in by search_books
+        self.page_hits_frame = ttk.Frame(main_content)
         
-        # Create scrollable frame for books
-        scrollbar = ttk.Scrollbar(books_container, orient="vertical", style="Custom.Vertical.TScrollbar")
-        scrollbar.pack(side=tk.RIGHT, fill="y")
+        # Only the cards in view are built; they are refilled as the grid scrolls
+        self.books_grid = VirtualGrid(main_content, self.create_book_card, self.fill_book_card,
+                                      row_height=370, background=self.colors["background"],
+                                      scrollbar_style="Custom.Vertical.TScrollbar",
+                                      empty_font=("Garamond", 14, "italic"), empty_color=self.colors["text"])
+        self.books_grid.pack(fill="both", expand=True, padx=20, pady=10)
         
-        books_canvas = tk.Canvas(books_container, 
-                              bg=self.colors["background"], 
-                              highlightthickness=0,
-                              height=500,  # Explicit height
-                              yscrollcommand=scrollbar.set)
-        books_canvas.pack(side=tk.LEFT, fill="both", expand=True)
+        # Display all books
+        self.display_all_books()
+
+    def create_book_card(self, parent, library=False):
+        """Build an empty book card for a VirtualGrid; fill_book_card shows a book on it"""
+        card = {}
+        card["frame"] = book_card = tk.Frame(parent, bg=self.colors["card_bg"],
+                                             highlightbackground=self.colors["card_shadow"],
+                                             highlightthickness=1)
+        book_card.pack_propagate(False)
         
-        scrollbar.config(command=books_canvas.yview)
+        # Book title
+        card["title"] = tk.Label(book_card,
+                                 font=("Garamond", 16, "bold"),
+                                 fg=self.colors["primary"],
+                                 bg=self.colors["card_bg"])
+        card["title"].pack(pady=(15, 5), padx=15)
+        
+        # Author with avatar
+        author_frame = tk.Frame(book_card, bg=self.colors["card_bg"])
+        author_frame.pack(pady=5, padx=15, fill="x")
+        card["avatar"] = tk.Label(author_frame, bg=self.colors["card_bg"])
+        card["author"] = tk.Label(author_frame,
+                                  font=("Garamond", 12, "italic"),
+                                  fg=self.colors["text"],
+                                  bg=self.colors["card_bg"])
+        card["author"].pack(side=tk.LEFT)
+        
+        # Last read date, on library cards
+        if library:
+            card["last_read"] = tk.Label(book_card,
+                                         font=("Quicksand", 10),
+                                         fg=self.colors["light_text"],
+                                         bg=self.colors["card_bg"])
+            card["last_read"].pack(pady=(2, 5), padx=15)
         
-        # Create a frame to hold all the books - use tk.Frame instead of ttk.Frame for background
-        self.books_frame = tk.Frame(books_canvas, bg=self.colors["background"])
+        card["description"] = tk.Label(book_card,
+                                       wraplength=250,
+                                       font=("Quicksand", 10),
+                                       fg=self.colors["text"],
+                                       bg=self.colors["card_bg"])
+        card["description"].pack(pady=10, padx=15, fill="x")
         
-        # Force the frame to have a minimum width that makes the books visible
-        canvas_width = books_canvas.winfo_width()
-        if canvas_width < 100:  # If canvas is not yet properly sized
-            canvas_width = 800  # Use a reasonable default width
+        # Buttons container; commands are set for each book by fill_book_card
+        btn_frame = tk.Frame(book_card, bg=self.colors["card_bg"])
+        btn_frame.pack(pady=10, padx=15, fill="x")
         
-        window_id = books_canvas.create_window((0, 0), window=self.books_frame, anchor="nw", width=canvas_width)
+        card["read"] = self.create_rounded_button(btn_frame, "Read", None)
+        card["read"].pack(side=tk.LEFT, padx=2)
         
-        # Configure the canvas for scrolling
-        def configure_books_canvas(event):
-            books_canvas.configure(scrollregion=books_canvas.bbox("all"))
-            # Update the width of the books_frame to match the canvas width
-            canvas_width = books_canvas.winfo_width()
-            if canvas_width > 100:  # Only update if we have a reasonable width
-                books_canvas.itemconfig(window_id, width=canvas_width)
-            
-        books_canvas.bind("<Configure>", configure_books_canvas)
-        self.books_frame.bind("<Configure>", configure_books_canvas)
+        # Add to library button, or remove from it on library cards
+        if library:
+            card["library"] = self.create_rounded_button(btn_frame, "Remove", None, primary=False)
+        else:
+            card["library"] = self.create_rounded_button(btn_frame, "Add", None, primary=False)
+        card["library"].pack(side=tk.LEFT, padx=2)
         
-        # Debug - check if we have any books in the database
-        self.db.cursor.execute("SELECT COUNT(*) FROM books")
-        book_count = self.db.cursor.fetchone()[0]
-        print(f"DEBUG: Found {book_count} books in database")
+        # Buy on Amazon button, shown when the book has a link
+        card["amazon"] = tk.Button(btn_frame,
+                                   text="Amazon",
+                                   bg="#FF9900",  # Amazon orange
+                                   fg="white",
+                                   font=("Quicksand", 10),
+                                   relief=tk.FLAT,
+                                   borderwidth=0,
+                                   padx=10,
+                                   pady=5,
+                                   cursor="hand2")
         
-        # Display all books
-        self.display_all_books()
+        # Second row of buttons
+        btn_frame2 = tk.Frame(book_card, bg=self.colors["card_bg"])
+        btn_frame2.pack(pady=(0, 10), padx=15, fill="x")
+        
+        card["reviews"] = self.create_rounded_button(btn_frame2, "Reviews", None, primary=False)
+        card["reviews"].pack(side=tk.LEFT, padx=2)
+        
+        card["discussions"] = self.create_rounded_button(btn_frame2, "Discussions", None, primary=False)
+        card["discussions"].pack(side=tk.LEFT, padx=2)
+        
+        card["library_card"] = library
+        return card
+    
+    def fill_book_card(self, card, book):
+        """Show a (title, description, author, amazon_link, author email[, last_read]) row on a book card"""
+        title, description, author, amazon_link, author_email = book[:5]
+        
+        card["title"].config(text=title)
+        card["author"].config(text=f"by {author}")
+        
+        # Author avatar
+        digest, avatar_data = self.author_avatars.get(author_email, (None, None))
+        avatar_photo = self.load_author_avatar(author_email, 24, avatar_data, digest) if avatar_data else None
+        card["avatar"].config(image=avatar_photo or "")
+        card["avatar"].image = avatar_photo  # Keep a reference to prevent garbage collection
+        if avatar_photo:
+            card["avatar"].pack(side=tk.LEFT, padx=(0, 5), before=card["author"])
+        else:
+            card["avatar"].pack_forget()
+        
+        if card["library_card"]:
+            last_read = book[5]
+            card["last_read"].config(text=f"Last read: {last_read}" if last_read else "")
+        
+        # Description - truncate if too long
+        description = description or ""
+        if len(description) > 100:
+            description = description[:100] + "..."
+        card["description"].config(text=description)
+        
+        card["read"].config(command=lambda t=title: self.view_book(t))
+        if card["library_card"]:
+            card["library"].config(command=lambda t=title: self.remove_from_library(t))
+        else:
+            card["library"].config(command=lambda t=title: self.add_to_library(t))
+        card["reviews"].config(command=lambda t=title: self.view_reviews(t))
+        card["discussions"].config(command=lambda t=title: self.view_book_discussions(t))
         
-        # Debug - check if books were displayed
-        books_added = len(self.books_frame.winfo_children())
-        print(f"DEBUG: Added {books_added} book widgets to the UI")
+        if amazon_link:
+            card["amazon"].config(command=lambda l=amazon_link: self.open_amazon_link(l))
+            card["amazon"].pack(side=tk.LEFT, padx=2)
+        else:
+            card["amazon"].pack_forget()
+    
+    def load_author_avatar(self, author_email, size, avatar_data, digest=None):
+        """Return a user's stored avatar as a size x size PhotoImage, or None if it cannot be decoded.
+
+        The image comes from self.avatar_cache, so it is only decoded again when the stored avatar changes.
+        """
+        try:
+            return self.avatar_cache.get(author_email, size, avatar_data, self.decode_avatar, digest)
+        except Exception as e:
+            print(f"Error displaying avatar for {author_email}: {e}")
+            return None
+
+    def decode_avatar(self, avatar_data, size):
+        avatar_img = Image.open(io.BytesIO(avatar_data)).resize((size, size))
+        return ImageTk.PhotoImage(avatar_img)
+
+    def remember_avatars(self, books, avatars):
+        """Keep the avatars a worker loaded for the authors of ``books`` for their cards"""
+        for book in books:
+            author_email = book[4]
+            if author_email in avatars:
+                self.author_avatars[author_email] = avatars[author_email]
+            else:
+                self.author_avatars.pop(author_email, None)
 
     def display_all_books(self):
-        # Clear existing books
-        for widget in self.books_frame.winfo_children():
-            widget.destroy()
+        self.page_hits_frame.pack_forget()
+        books_grid = self.books_grid
+        books_grid.set_items([], empty_text="Loading books...")
         
-        try:
-            # Get all books from database
-            self.db.cursor.execute('''
-                SELECT b.id, b.title, b.description, u.username, b.amazon_link, u.avatar
-                FROM books b
-                JOIN users u ON b.author_email = u.email
-            ''')
-            books = self.db.cursor.fetchall()
-            
-            print(f"DEBUG: SQL query returned {len(books)} books")
-            
-            # If no books found
-            if not books:
-                no_books_label = tk.Label(self.books_frame,
-                                      text="No books found.",
-                                      font=("Garamond", 14, "italic"),
-                                      fg=self.colors["text"],
-                                      bg=self.colors["background"])
-                no_books_label.pack(pady=20)
+        def list_books(database):
+            books = database.list_books()
+            return books, database.load_avatars(book[4] for book in books)
+        
+        def loaded(results):
+            if not books_grid.frame.winfo_exists():
                 return
-            
-            # Create a container for books - using grid layout
-            books_grid = tk.Frame(self.books_frame, bg=self.colors["background"])
-            books_grid.pack(fill="both", expand=True, padx=10, pady=10)
-            
-            # Configure the grid to have 3 columns of equal width
-            for i in range(3):
-                books_grid.columnconfigure(i, weight=1)
-            
-            # Display books in a grid with cards
-            book_count = 0
-            for i, (book_id, title, description, author, amazon_link, author_avatar) in enumerate(books):
-                try:
-                    # Create a card frame for each book
-                    book_card = tk.Frame(books_grid, bg=self.colors["card_bg"], 
-                                      highlightbackground=self.colors["card_shadow"],
-                                      highlightthickness=1,
-                                      width=300, height=350)
-                    book_card.grid(row=i//3, column=i%3, padx=10, pady=10, sticky="nsew")
-                    
-                    # Prevent widget from shrinking below minimum size
-                    book_card.grid_propagate(False)
-                    
-                    # Book title
-                    title_label = tk.Label(book_card,
-                                        text=title,
-                                        font=("Garamond", 16, "bold"),
-                                        fg=self.colors["primary"],
-                                        bg=self.colors["card_bg"])
-                    title_label.pack(pady=(15, 5), padx=15)
-                    
-                    # Author with avatar
-                    author_frame = tk.Frame(book_card, bg=self.colors["card_bg"])
-                    author_frame.pack(pady=5, padx=15, fill="x")
-                    
-                    # Author avatar
-                    if author_avatar:
-                        try:
-                            avatar_img = Image.open(io.BytesIO(author_avatar))
-                            avatar_img = avatar_img.resize((24, 24))
-                            avatar_photo = ImageTk.PhotoImage(avatar_img)
-                            avatar_label = tk.Label(author_frame, image=avatar_photo, bg=self.colors["card_bg"])
-                            avatar_label.image = avatar_photo  # Keep a reference to prevent garbage collection
-                            avatar_label.pack(side=tk.LEFT, padx=(0, 5))
-                        except Exception as e:
-                            print(f"Error displaying avatar for {title}: {e}")
-                            # Fall back to text if image loading fails
-                    
-                    author_label = tk.Label(author_frame,
-                                         text=f"by {author}",
-                                         font=("Garamond", 12, "italic"),
-                                         fg=self.colors["text"],
-                                         bg=self.colors["card_bg"])
-                    author_label.pack(side=tk.LEFT)
-                    
-                    # Description - truncate if too long
-                    short_desc = description
-                    if len(description) > 100:
-                        short_desc = description[:100] + "..."
-                        
-                    desc_label = tk.Label(book_card,
-                                       text=short_desc,
-                                       wraplength=250,
-                                       font=("Quicksand", 10),
-                                       fg=self.colors["text"],
-                                       bg=self.colors["card_bg"])
-                    desc_label.pack(pady=10, padx=15, fill="x")
-                    
-                    # Buttons container
-                    btn_frame = tk.Frame(book_card, bg=self.colors["card_bg"])
-                    btn_frame.pack(pady=10, padx=15, fill="x")
-                    
-                    # View/Read button
-                    view_btn = self.create_rounded_button(btn_frame, "Read", lambda t=title: self.view_book(t))
-                    view_btn.pack(side=tk.LEFT, padx=2)
-                    
-                    # Add to library button
-                    add_btn = self.create_rounded_button(btn_frame, "Add", lambda t=title: self.add_to_library(t), primary=False)
-                    add_btn.pack(side=tk.LEFT, padx=2)
-                    
-                    # Buy on Amazon button (if link available)
-                    if amazon_link:
-                        amazon_btn = tk.Button(btn_frame,
-                                            text="Amazon",
-                                            command=lambda l=amazon_link: self.open_amazon_link(l),
-                                            bg="#FF9900",  # Amazon orange
-                                            fg="white",
-                                            font=("Quicksand", 10),
-                                            relief=tk.FLAT,
-                                            borderwidth=0,
-                                            padx=10,
-                                            pady=5,
-                                            cursor="hand2")
-                        amazon_btn.pack(side=tk.LEFT, padx=2)
-                    
-                    # Second row of buttons
-                    btn_frame2 = tk.Frame(book_card, bg=self.colors["card_bg"])
-                    btn_frame2.pack(pady=(0, 10), padx=15, fill="x")
-                    
-                    # Review button
-                    review_btn = self.create_rounded_button(btn_frame2, "Reviews", 
-                                                         lambda t=title: self.view_reviews(t), primary=False)
-                    review_btn.pack(side=tk.LEFT, padx=2)
-                    
-                    # Discussion button
-                    discussion_btn = self.create_rounded_button(btn_frame2, "Discussions", 
-                                                             lambda t=title: self.view_book_discussions(t), primary=False)
-                    discussion_btn.pack(side=tk.LEFT, padx=2)
-                    
-                    book_count += 1
-                except Exception as e:
-                    print(f"Error creating book card for {title}: {e}")
-            
-            print(f"DEBUG: Successfully created {book_count} book cards")
-            
-            # Update the display after creating all books
-            self.books_frame.update_idletasks()
+            books, avatars = results
+            self.remember_avatars(books, avatars)
+            print(f"DEBUG: SQL query returned {len(books)} books")
+            books_grid.set_items(books, empty_text="No books found.")
+            print(f"DEBUG: Showing {len(books_grid.items)} books with {books_grid.card_count()} book cards")
         
-        except Exception as e:
-            print(f"ERROR in display_all_books: {e}")
-            import traceback
-            traceback.print_exc()
-            
-            error_label = tk.Label(self.books_frame,
-                                 text=f"Error loading books: {str(e)}",
-                                 font=("Garamond", 14, "italic"),
-                                 fg="red",
-                                 bg=self.colors["background"])
-            error_label.pack(pady=20)
+        def failed(error):
+            print(f"ERROR in display_all_books: {error}")
+            if books_grid.frame.winfo_exists():
+                books_grid.set_items([], empty_text=f"Error loading books: {str(error)}")
+        
+        # Get all books and their authors' avatars on the worker; avatars are decoded only for cards on screen.
+        # Shares the search's key, so whichever was asked for last is what gets shown
+        self.db_worker.submit(list_books, on_done=loaded, on_error=failed, key="books")
 
     def search_books(self, parent):
-        search_term = self.search_var.get().lower()
+        search_term = self.search_var.get().strip()
         
-        # Clear existing books
-        for widget in self.books_frame.winfo_children():
-            widget.destroy()
-        
-        # Get matching books from database
-        self.db.cursor.execute('''
-            SELECT b.title, b.description, u.username, b.amazon_link, u.avatar
-            FROM books b
-            JOIN users u ON b.author_email = u.email
-            WHERE LOWER(b.title) LIKE ? OR LOWER(b.description) LIKE ? OR LOWER(u.username) LIKE ?
-        ''', (f'%{search_term}%', f'%{search_term}%', f'%{search_term}%'))
+        # An empty search shows the whole catalogue again
+        if not search_term:
+            self.display_all_books()
+            return
         
-        books = self.db.cursor.fetchall()
+        def find(database, search_term):
+            # Matching books from the full-text index, best matches first, then matches inside them
+            books = database.search_books(search_term)
+            avatars = database.load_avatars(book[4] for book in books)
+            return books, avatars, database.search_book_contents(search_term)
         
-        # Show a message if no books found
-        if not books:
-            no_results = ttk.Label(self.books_frame, 
-                                 text=f"No books found matching '{search_term}'", 
-                                 font=("Garamond", 14, "italic"),
-                                 foreground=self.colors["text"])
-            no_results.pack(pady=20)
+        def found(results):
+            if not books_grid.frame.winfo_exists():
+                return
+            books, avatars, page_hits = results
+            self.remember_avatars(books, avatars)
+            self.show_page_hits(page_hits)
+            if not books and page_hits:
+                books_grid.set_items([])
+            else:
+                books_grid.set_items(books, empty_text=f"No books found matching '{search_term}'")
+        
+        def failed(error):
+            print(f"ERROR in search_books: {error}")
+            if books_grid.frame.winfo_exists():
+                books_grid.set_items([], empty_text=f"Search failed: {str(error)}")
+        
+        self.page_hits_frame.pack_forget()
+        books_grid = self.books_grid
+        books_grid.set_items([], empty_text=f"Searching for '{search_term}'...")
+        # A new search cancels the one still running
+        self.db_worker.submit(find, search_term, on_done=found, on_error=failed, key="books")
+
+    def show_page_hits(self, page_hits):
+        """List matches inside the books' text above the grid; double-click one to open its book"""
+        for widget in self.page_hits_frame.winfo_children():
+            widget.destroy()
+        if not page_hits:
+            self.page_hits_frame.pack_forget()
             return
         
-        # Create a container for books - using grid layout
-        books_grid = ttk.Frame(self.books_frame)
-        books_grid.pack(fill="both", expand=True, padx=10, pady=10)
+        ttk.Label(self.page_hits_frame,
+                  text="Found inside books",
+                  font=("Garamond", 16, "bold"),
+                  foreground=self.colors["primary"]).pack(anchor="w", pady=(0, 5))
+        
+        hits_list = tk.Listbox(self.page_hits_frame,
+                               height=min(len(page_hits), 5),
+                               font=("Quicksand", 10),
+                               fg=self.colors["text"],
+                               bg=self.colors["card_bg"],
+                               activestyle="none",
+                               cursor="hand2")
+        hits_list.pack(side=tk.LEFT, fill="x", expand=True)
+        if len(page_hits) > 5:
+            hits_scrollbar = ttk.Scrollbar(self.page_hits_frame, orient="vertical", command=hits_list.yview)
+            hits_scrollbar.pack(side=tk.RIGHT, fill="y")
+            hits_list.config(yscrollcommand=hits_scrollbar.set)
+        
+        for title, page_number, snippet in page_hits:
+            hits_list.insert(tk.END, f"{title}, page {page_number}: {snippet}")
         
-        # Configure the grid to have 3 columns of equal width
-        for i in range(3):
-            books_grid.columnconfigure(i, weight=1)
+        def open_hit(event):
+            selection = hits_list.curselection()
+            if selection:
+                self.view_book(page_hits[selection[0]][0])
         
-        # Display books in a grid with cards
-        for i, (title, description, author, amazon_link, author_avatar) in enumerate(books):
-            # Create a card frame for each book
-            book_card = ttk.Frame(books_grid, style="Card.TFrame")
-            book_card.grid(row=i//3, column=i%3, padx=10, pady=10, sticky="nsew")
-            
-            # Apply shadow effect
-            self.apply_shadow_effect(book_card)
-            
-            # Book title
-            title_label = ttk.Label(book_card,
-                                  text=title,
-                                  font=("Garamond", 16, "bold"),
-                                  foreground=self.colors["primary"],
-                                  background=self.colors["card_bg"])
-            title_label.pack(pady=(15, 5), padx=15)
-            
-            # Author with avatar
-            author_frame = ttk.Frame(book_card, style="Card.TFrame")
-            author_frame.pack(pady=5, padx=15, fill="x")
-            
-            # Author avatar
-            if author_avatar:
-                try:
-                    avatar_img = Image.open(io.BytesIO(author_avatar))
-                    avatar_img = avatar_img.resize((24, 24))
-                    avatar_photo = ImageTk.PhotoImage(avatar_img)
-                    avatar_label = ttk.Label(author_frame, image=avatar_photo, background=self.colors["card_bg"])
-                    avatar_label.image = avatar_photo  # Keep a reference to prevent garbage collection
-                    avatar_label.pack(side=tk.LEFT, padx=(0, 5))
-                except Exception:
-                    # Fall back to text if image loading fails
-                    pass
-            
-            author_label = ttk.Label(author_frame,
-                                   text=f"by {author}",
-                                   font=("Garamond", 12, "italic"),
-                                   foreground=self.colors["text"],
-                                   background=self.colors["card_bg"])
-            author_label.pack(side=tk.LEFT)
-            
-            # Description - truncate if too long
-            short_desc = description
-            if len(description) > 100:
-                short_desc = description[:100] + "..."
-                
-            desc_label = ttk.Label(book_card,
-                                 text=short_desc,
-                                 wraplength=250,
-                                 font=("Quicksand", 10),
-                                 foreground=self.colors["text"],
-                                 background=self.colors["card_bg"])
-            desc_label.pack(pady=10, padx=15, fill="x")
-            
-            # Buttons container
-            btn_frame = ttk.Frame(book_card, style="Card.TFrame")
-            btn_frame.pack(pady=10, padx=15, fill="x")
-            
-            # View/Read button
-            view_btn = self.create_rounded_button(btn_frame, "Read", lambda t=title: self.view_book(t))
-            view_btn.pack(side=tk.LEFT, padx=2)
-            
-            # Add to library button
-            add_btn = self.create_rounded_button(btn_frame, "Add", lambda t=title: self.add_to_library(t), primary=False)
-            add_btn.pack(side=tk.LEFT, padx=2)
-            
-            # Buy on Amazon button (if link available)
-            if amazon_link:
-                amazon_btn = tk.Button(btn_frame,
-                                     text="Amazon",
-                                     command=lambda l=amazon_link: self.open_amazon_link(l),
-                                     bg="#FF9900",  # Amazon orange
-                                     fg="white",
-                                     font=("Quicksand", 10),
-                                     relief=tk.FLAT,
-                                     borderwidth=0,
-                                     padx=10,
-                                     pady=5,
-                                     cursor="hand2")
-                amazon_btn.pack(side=tk.LEFT, padx=2)
-            
-            # Second row of buttons
-            btn_frame2 = ttk.Frame(book_card, style="Card.TFrame")
-            btn_frame2.pack(pady=(0, 10), padx=15, fill="x")
-            
-            # Review button
-            review_btn = self.create_rounded_button(btn_frame2, "Reviews", 
-                                                 lambda t=title: self.view_reviews(t), primary=False)
-            review_btn.pack(side=tk.LEFT, padx=2)
-            
-            # Discussion button
-            discussion_btn = self.create_rounded_button(btn_frame2, "Discussions", 
-                                                     lambda t=title: self.view_book_discussions(t), primary=False)
-            discussion_btn.pack(side=tk.LEFT, padx=2)
+        hits_list.bind("<Double-Button-1>", open_hit)
+        
+        self.page_hits_frame.pack(fill="x", padx=20, pady=(0, 10), before=self.books_grid.frame)
 
     def view_book(self, book_name):
-        # Get book information including PDF data
-        self.db.cursor.execute('''
-            SELECT b.pdf_data, b.description, u.username, b.id
-            FROM books b
-            JOIN users u ON b.author_email = u.email
-            WHERE b.title = ?
-        ''', (book_name,))
-        result = self.db.cursor.fetchone()
-        
-        if not result:
+        # Show loading indicator
+        self.show_toast(f"Opening {book_name}", "info")
+        
+        # Reading a large PDF out of the database and writing it to a temporary file runs on the worker
+        import tempfile
+        self.db_worker.submit(Database.export_book_pdf, book_name, tempfile.gettempdir(),
+                              on_done=lambda exported: self.open_exported_book(book_name, exported),
+                              on_error=lambda e: self.show_toast(f"Could not open PDF file: {str(e)}", "error"))
+    
+    def open_exported_book(self, book_name, exported):
+        """Open a book written out by Database.export_book_pdf and record the reading activity"""
+        if not exported:
             self.show_toast(f"Book not found: {book_name}", "error")
             return
             
-        pdf_data, description, author, book_id = result
+        temp_pdf_path, book_id = exported
         
         try:
-            # Show loading indicator
-            self.show_toast(f"Opening {book_name}", "info")
-            
-            # Create a temporary PDF file
-            import tempfile
-            import os
-            temp_dir = tempfile.gettempdir()
-            temp_pdf_path = os.path.join(temp_dir, f"{book_name}.pdf")
-            
-            # Write PDF data to temporary file
-            with open(temp_pdf_path, 'wb') as temp_file:
-                temp_file.write(pdf_data)
-            
             # Open PDF in default PDF viewer
             webbrowser.open(temp_pdf_path)
             
@@ -2224,10 +2383,7 @@ class bookverseApp:
                 ''', (self.current_user, book_id))
                 
                 # Increment books_read count if this is the first time reading
-                self.db.cursor.execute('''
-                    SELECT COUNT(*) FROM user_library 
-                    WHERE user_email = ? AND book_id = ? AND last_read IS NOT NULL
-                ''', (self.current_user, book_id))
+                self.db.cursor.execute(desktop_sql.BOOK_READ_BY_USER, (self.current_user, book_id))
                 
                 if self.db.cursor.fetchone()[0] <= 1:
                     self.db.cursor.execute('''
@@ -2239,10 +2395,7 @@ class bookverseApp:
                 # Update reading streak
                 current_date = datetime.now().strftime("%Y-%m-%d")
                 
-                self.db.cursor.execute('''
-                    SELECT MAX(last_read) FROM user_library
-                    WHERE user_email = ? AND last_read < ?
-                ''', (self.current_user, current_date))
+                self.db.cursor.execute(desktop_sql.PREVIOUS_READ_DATE, (self.current_user, current_date))
                 
                 last_activity = self.db.cursor.fetchone()[0]
                 
@@ -2279,11 +2432,7 @@ class bookverseApp:
         """Check and award badges based on user activity"""
         try:
             # Get current counts
-            self.db.cursor.execute('''
-                SELECT books_read, reading_streak
-                FROM users
-                WHERE email = ?
-            ''', (self.current_user,))
+            self.db.cursor.execute(desktop_sql.READING_STATS, (self.current_user,))
             
             books_read, reading_streak = self.db.cursor.fetchone()
             
@@ -2302,10 +2451,7 @@ class bookverseApp:
                 self.award_badge("reader", "Dedicated Reader", "7-day reading streak")
             
             # Check for review badges
-            self.db.cursor.execute('''
-                SELECT COUNT(*) FROM reviews
-                WHERE user_email = ?
-            ''', (self.current_user,))
+            self.db.cursor.execute(desktop_sql.USER_REVIEW_COUNT, (self.current_user,))
             
             review_count = self.db.cursor.fetchone()[0]
             
@@ -2320,10 +2466,7 @@ class bookverseApp:
     
     def has_badge(self, badge_type, badge_name):
         """Check if user already has a specific badge"""
-        self.db.cursor.execute('''
-            SELECT COUNT(*) FROM user_badges
-            WHERE user_email = ? AND badge_type = ? AND badge_name = ?
-        ''', (self.current_user, badge_type, badge_name))
+        self.db.cursor.execute(desktop_sql.BADGE_COUNT, (self.current_user, badge_type, badge_name))
         
         return self.db.cursor.fetchone()[0] > 0
     
@@ -2346,14 +2489,11 @@ class bookverseApp:
     def add_to_library(self, book_name):
         try:
             # Get book ID
-            self.db.cursor.execute('SELECT id FROM books WHERE title = ?', (book_name,))
+            self.db.cursor.execute(desktop_sql.BOOK_ID_BY_TITLE, (book_name,))
             book_id = self.db.cursor.fetchone()[0]
             
             # Check if already in library
-            self.db.cursor.execute('''
-                SELECT COUNT(*) FROM user_library
-                WHERE user_email = ? AND book_id = ?
-            ''', (self.current_user, book_id))
+            self.db.cursor.execute(desktop_sql.LIBRARY_ENTRY_COUNT, (self.current_user, book_id))
             
             count = self.db.cursor.fetchone()[0]
             
@@ -2425,208 +2565,41 @@ class bookverseApp:
         refresh_btn = self.create_rounded_button(title_frame, "Refresh", self.display_library_books)
         refresh_btn.pack(side=tk.RIGHT, padx=10)
         
-        # Books display frame with scrollbar
-        books_container = tk.Frame(main_content, bg=self.colors["background"])
-        books_container.pack(fill="both", expand=True, padx=20, pady=10)
-        
-        # Create scrollable frame for books
-        scrollbar = ttk.Scrollbar(books_container, orient="vertical", style="Custom.Vertical.TScrollbar")
-        scrollbar.pack(side=tk.RIGHT, fill="y")
-        
-        library_canvas = tk.Canvas(books_container, 
-                                bg=self.colors["background"], 
-                                highlightthickness=0,
-                                height=500,  # Explicit height
-                                yscrollcommand=scrollbar.set)
-        library_canvas.pack(side=tk.LEFT, fill="both", expand=True)
-        
-        scrollbar.config(command=library_canvas.yview)
-        
-        # Create a frame to hold all the books
-        self.library_books_frame = tk.Frame(library_canvas, bg=self.colors["background"])
-        
-        # Set reasonable default width
-        canvas_width = library_canvas.winfo_width()
-        if canvas_width < 100:
-            canvas_width = 800
-        
-        window_id = library_canvas.create_window((0, 0), window=self.library_books_frame, 
-                                              anchor="nw", width=canvas_width)
-        
-        # Configure the canvas for scrolling
-        def configure_library_canvas(event):
-            library_canvas.configure(scrollregion=library_canvas.bbox("all"))
-            canvas_width = library_canvas.winfo_width()
-            if canvas_width > 100:
-                library_canvas.itemconfig(window_id, width=canvas_width)
-            
-        library_canvas.bind("<Configure>", configure_library_canvas)
-        self.library_books_frame.bind("<Configure>", configure_library_canvas)
+        # Only the cards in view are built; they are refilled as the grid scrolls
+        self.library_grid = VirtualGrid(main_content, lambda parent: self.create_book_card(parent, library=True),
+                                        self.fill_book_card, row_height=420, background=self.colors["background"],
+                                        scrollbar_style="Custom.Vertical.TScrollbar",
+                                        empty_font=("Garamond", 14, "italic"), empty_color=self.colors["text"])
+        self.library_grid.pack(fill="both", expand=True, padx=20, pady=10)
         
         # Display user's library books
         self.display_library_books()
 
     def display_library_books(self):
-        # Clear existing books
-        for widget in self.library_books_frame.winfo_children():
-            widget.destroy()
+        library_grid = self.library_grid
+        library_grid.set_items([], empty_text="Loading your library...")
         
-        try:
-            # Get books from user's library
-            self.db.cursor.execute('''
-                SELECT b.id, b.title, b.description, u.username, b.amazon_link, u.avatar, ul.last_read
-                FROM user_library ul
-                JOIN books b ON ul.book_id = b.id
-                JOIN users u ON b.author_email = u.email
-                WHERE ul.user_email = ?
-                ORDER BY ul.last_read DESC
-            ''', (self.current_user,))
-            
-            books = self.db.cursor.fetchall()
-            
-            # If no books found
-            if not books:
-                no_books_label = tk.Label(self.library_books_frame,
-                                      text="Your library is empty. Add books from the Browse tab!",
-                                      font=("Garamond", 14, "italic"),
-                                      fg=self.colors["text"],
-                                      bg=self.colors["background"])
-                no_books_label.pack(pady=20)
-                return
-            
-            # Create a container for books - using grid layout
-            books_grid = tk.Frame(self.library_books_frame, bg=self.colors["background"])
-            books_grid.pack(fill="both", expand=True, padx=10, pady=10)
-            
-            # Configure the grid to have 3 columns of equal width
-            for i in range(3):
-                books_grid.columnconfigure(i, weight=1)
-            
-            # Display books in a grid with cards
-            book_count = 0
-            for i, (book_id, title, description, author, amazon_link, author_avatar, last_read) in enumerate(books):
-                try:
-                    # Create a card frame for each book
-                    book_card = tk.Frame(books_grid, bg=self.colors["card_bg"], 
-                                      highlightbackground=self.colors["card_shadow"],
-                                      highlightthickness=1,
-                                      width=300, height=400)
-                    book_card.grid(row=i//3, column=i%3, padx=10, pady=10, sticky="nsew")
-                    book_card.grid_propagate(False)
-                    
-                    # Book title
-                    title_label = tk.Label(book_card,
-                                        text=title,
-                                        font=("Garamond", 16, "bold"),
-                                        fg=self.colors["primary"],
-                                        bg=self.colors["card_bg"])
-                    title_label.pack(pady=(15, 5), padx=15)
-                    
-                    # Author with avatar
-                    author_frame = tk.Frame(book_card, bg=self.colors["card_bg"])
-                    author_frame.pack(pady=5, padx=15, fill="x")
-                    
-                    # Author avatar
-                    if author_avatar:
-                        try:
-                            avatar_img = Image.open(io.BytesIO(author_avatar))
-                            avatar_img = avatar_img.resize((24, 24))
-                            avatar_photo = ImageTk.PhotoImage(avatar_img)
-                            avatar_label = tk.Label(author_frame, image=avatar_photo, bg=self.colors["card_bg"])
-                            avatar_label.image = avatar_photo  # Keep a reference to prevent garbage collection
-                            avatar_label.pack(side=tk.LEFT, padx=(0, 5))
-                        except Exception:
-                            # Fall back to text if image loading fails
-                            pass
-                    
-                    author_label = tk.Label(author_frame,
-                                         text=f"by {author}",
-                                         font=("Garamond", 12, "italic"),
-                                         fg=self.colors["text"],
-                                         bg=self.colors["card_bg"])
-                    author_label.pack(side=tk.LEFT)
-                    
-                    # Last read date if available
-                    if last_read:
-                        last_read_label = tk.Label(book_card,
-                                               text=f"Last read: {last_read}",
-                                               font=("Quicksand", 10),
-                                               fg=self.colors["light_text"],
-                                               bg=self.colors["card_bg"])
-                        last_read_label.pack(pady=(2, 5), padx=15)
-                    
-                    # Description - truncate if too long
-                    short_desc = description
-                    if len(description) > 100:
-                        short_desc = description[:100] + "..."
-                        
-                    desc_label = tk.Label(book_card,
-                                       text=short_desc,
-                                       wraplength=250,
-                                       font=("Quicksand", 10),
-                                       fg=self.colors["text"],
-                                       bg=self.colors["card_bg"])
-                    desc_label.pack(pady=10, padx=15, fill="x")
-                    
-                    # Buttons container
-                    btn_frame = tk.Frame(book_card, bg=self.colors["card_bg"])
-                    btn_frame.pack(pady=10, padx=15, fill="x")
-                    
-                    # View/Read button
-                    view_btn = self.create_rounded_button(btn_frame, "Read", lambda t=title: self.view_book(t))
-                    view_btn.pack(side=tk.LEFT, padx=2)
-                    
-                    # Remove from library button
-                    remove_btn = self.create_rounded_button(btn_frame, "Remove", 
-                                                        lambda t=title: self.remove_from_library(t), 
-                                                        primary=False)
-                    remove_btn.pack(side=tk.LEFT, padx=2)
-                    
-                    # Buy on Amazon button (if link available)
-                    if amazon_link:
-                        amazon_btn = tk.Button(btn_frame,
-                                           text="Amazon",
-                                           command=lambda l=amazon_link: self.open_amazon_link(l),
-                                           bg="#FF9900",  # Amazon orange
-                                           fg="white",
-                                           font=("Quicksand", 10),
-                                           relief=tk.FLAT,
-                                           borderwidth=0,
-                                           padx=10,
-                                           pady=5,
-                                           cursor="hand2")
-                        amazon_btn.pack(side=tk.LEFT, padx=2)
-                    
-                    # Second row of buttons
-                    btn_frame2 = tk.Frame(book_card, bg=self.colors["card_bg"])
-                    btn_frame2.pack(pady=(0, 10), padx=15, fill="x")
-                    
-                    # Review button
-                    review_btn = self.create_rounded_button(btn_frame2, "Reviews", 
-                                                         lambda t=title: self.view_reviews(t), 
-                                                         primary=False)
-                    review_btn.pack(side=tk.LEFT, padx=2)
-                    
-                    # Discussion button
-                    discussion_btn = self.create_rounded_button(btn_frame2, "Discussions", 
-                                                             lambda t=title: self.view_book_discussions(t), 
-                                                             primary=False)
-                    discussion_btn.pack(side=tk.LEFT, padx=2)
-                    
-                    book_count += 1
-                except Exception as e:
-                    print(f"Error displaying library book {title}: {e}")
-            
-            print(f"DEBUG: Successfully displayed {book_count} library books")
+        def list_library_books(database, user_email):
+            books = database.list_library_books(user_email)
+            return books, database.load_avatars(book[4] for book in books)
         
-        except Exception as e:
-            print(f"ERROR in display_library_books: {e}")
-            error_label = tk.Label(self.library_books_frame,
-                                text=f"Error loading library: {str(e)}",
-                                font=("Garamond", 14, "italic"),
-                                fg="red",
-                                bg=self.colors["background"])
-            error_label.pack(pady=20)
+        def loaded(results):
+            if not library_grid.frame.winfo_exists():
+                return
+            books, avatars = results
+            self.remember_avatars(books, avatars)
+            library_grid.set_items(books, empty_text="Your library is empty. Add books from the Browse tab!")
+            print(f"DEBUG: Successfully displayed {len(books)} library books")
+        
+        def failed(error):
+            print(f"ERROR in display_library_books: {error}")
+            if library_grid.frame.winfo_exists():
+                library_grid.set_items([], empty_text=f"Error loading library: {str(error)}")
+        
+        # Get the library's books and their authors' avatars on the worker; avatars are decoded only
+        # for the cards on screen
+        self.db_worker.submit(list_library_books, self.current_user,
+                              on_done=loaded, on_error=failed, key="library")
 
     def remove_from_library(self, book_name):
         self.db.cursor.execute('''
@@ -2665,13 +2638,7 @@ class bookverseApp:
         canvas.create_window((0, 0), window=discussions_list, anchor="nw")
         
         # Get all discussions
-        self.db.cursor.execute('''
-            SELECT d.id, b.title, d.title, d.content, u.username, d.created_at
-            FROM discussions d
-            JOIN books b ON d.book_id = b.id
-            JOIN users u ON d.user_email = u.email
-            ORDER BY d.created_at DESC
-        ''')
+        self.db.cursor.execute(desktop_sql.RECENT_DISCUSSIONS)
         
         discussions = self.db.cursor.fetchall()
         
@@ -2749,11 +2716,7 @@ class bookverseApp:
                                    self.colors["background_gradient"][1])
         
         # Get user information
-        self.db.cursor.execute('''
-            SELECT username, full_name, email, avatar, reading_streak, books_read
-            FROM users
-            WHERE email = ?
-        ''', (self.current_user,))
+        self.db.cursor.execute(desktop_sql.PROFILE, (self.current_user,))
         user_info = self.db.cursor.fetchone()
         
         if not user_info:
@@ -2779,28 +2742,14 @@ class bookverseApp:
         avatar_frame = ttk.Frame(header_frame, style="Card.TFrame")
         avatar_frame.pack(pady=10)
         
-        if avatar_data:
-            try:
-                avatar_img = Image.open(io.BytesIO(avatar_data))
-                avatar_img = avatar_img.resize((120, 120))
-                avatar_photo = ImageTk.PhotoImage(avatar_img)
-                avatar_label = ttk.Label(avatar_frame, image=avatar_photo, background=self.colors["card_bg"])
-                avatar_label.image = avatar_photo  # Keep a reference
-                avatar_label.pack()
-            except Exception:
-                # Fall back to placeholder avatar
-                avatar_img = self.create_avatar_placeholder(120, 120, username[0].upper() if username else "U")
-                avatar_photo = ImageTk.PhotoImage(avatar_img)
-                avatar_label = ttk.Label(avatar_frame, image=avatar_photo, background=self.colors["card_bg"])
-                avatar_label.image = avatar_photo
-                avatar_label.pack()
-        else:
+        avatar_photo = self.load_author_avatar(email, 120, avatar_data) if avatar_data else None
+        if not avatar_photo:
             # Create placeholder avatar
             avatar_img = self.create_avatar_placeholder(120, 120, username[0].upper() if username else "U")
             avatar_photo = ImageTk.PhotoImage(avatar_img)
-            avatar_label = ttk.Label(avatar_frame, image=avatar_photo, background=self.colors["card_bg"])
-            avatar_label.image = avatar_photo
-            avatar_label.pack()
+        avatar_label = ttk.Label(avatar_frame, image=avatar_photo, background=self.colors["card_bg"])
+        avatar_label.image = avatar_photo  # Keep a reference
+        avatar_label.pack()
         
         # Username and full name
         name_frame = ttk.Frame(header_frame, style="Card.TFrame")
@@ -2892,11 +2841,7 @@ class bookverseApp:
         back_button.pack(anchor="w", padx=10, pady=5)
         
         # Get current user information
-        self.db.cursor.execute('''
-            SELECT username, full_name
-            FROM users
-            WHERE email = ?
-        ''', (self.current_user,))
+        self.db.cursor.execute(desktop_sql.USER_NAMES, (self.current_user,))
         username, full_name = self.db.cursor.fetchone()
         
         # Create title
@@ -2951,6 +2896,9 @@ class bookverseApp:
         self.setup_reader_profile_tab()
 
     def logout(self):
+        # Results still on their way belong to the old session
+        self.db_worker.cancel_all()
+        
         # Destroy the main frame
         self.main_frame.destroy()
         
@@ -3160,12 +3108,7 @@ class bookverseApp:
             user_email = self.current_user["email"]
         
         # Get user's support queries
-        self.db.cursor.execute('''
-            SELECT sq.id, sq.subject, sq.content, sq.status, sq.created_at
-            FROM support_queries sq
-            WHERE sq.user_email = ?
-            ORDER BY sq.created_at DESC
-        ''', (user_email,))
+        self.db.cursor.execute(desktop_sql.USER_SUPPORT_QUERIES, (user_email,))
         
         queries = self.db.cursor.fetchall()
         
@@ -3216,13 +3159,7 @@ class bookverseApp:
                 
                 # Get responses for this query
                 try:
-                    self.db.cursor.execute('''
-                        SELECT sr.content, u.username, sr.created_at
-                        FROM support_responses sr
-                        LEFT JOIN users u ON sr.tech_support_email = u.email
-                        WHERE sr.query_id = ?
-                        ORDER BY sr.created_at
-                    ''', (query_id,))
+                    self.db.cursor.execute(desktop_sql.SUPPORT_RESPONSES, (query_id,))
                     
                     responses = self.db.cursor.fetchall()
                     print(f"Found {len(responses)} responses")
@@ -3332,12 +3269,7 @@ class bookverseApp:
         title_label.pack(pady=10)
         
         # Get all books published by this author
-        self.db.cursor.execute('''
-            SELECT id, title
-            FROM books
-            WHERE author_email = ?
-            ORDER BY title
-        ''', (self.current_user,))
+        self.db.cursor.execute(desktop_sql.AUTHOR_BOOK_TITLES, (self.current_user,))
         
         books = self.db.cursor.fetchall()
         
@@ -3372,13 +3304,7 @@ class bookverseApp:
         
         for book_id, book_title in books:
             # Get reviews for this book
-            self.db.cursor.execute('''
-                SELECT r.rating, r.comment, u.username, r.review_date
-                FROM reviews r
-                JOIN users u ON r.user_email = u.email
-                WHERE r.book_id = ?
-                ORDER BY r.review_date DESC
-            ''', (book_id,))
+            self.db.cursor.execute(desktop_sql.BOOK_REVIEWS, (book_id,))
             
             book_reviews = self.db.cursor.fetchall()
             
@@ -3487,12 +3413,7 @@ class bookverseApp:
             widget.destroy()
         
         # Get author's books
-        self.db.cursor.execute('''
-            SELECT id, title, description, upload_date, amazon_link
-            FROM books
-            WHERE author_email = ?
-            ORDER BY upload_date DESC
-        ''', (self.current_user,))
+        self.db.cursor.execute(desktop_sql.AUTHOR_BOOKS, (self.current_user,))
         
         books = self.db.cursor.fetchall()
         
@@ -3588,11 +3509,7 @@ class bookverseApp:
         back_button.pack(anchor="w", padx=10, pady=5)
         
         # Get book information
-        self.db.cursor.execute('''
-            SELECT title, description, amazon_link
-            FROM books
-            WHERE id = ?
-        ''', (book_id,))
+        self.db.cursor.execute(desktop_sql.BOOK_DETAILS, (book_id,))
         title, description, amazon_link = self.db.cursor.fetchone()
         
         # Create title
@@ -3787,6 +3704,10 @@ class bookverseApp:
             ''', (title, self.current_user, description, pdf_data, amazon_link))
             self.db.conn.commit()
             
+            # Index the book's text for content search without blocking the UI
+            threading.Thread(target=self.db.index_book_contents,
+                             args=(self.db.cursor.lastrowid,), daemon=True).start()
+            
             # Clear form
             self.upload_title.delete(0, tk.END)
             self.upload_description.delete("1.0", tk.END)
@@ -3805,14 +3726,7 @@ class bookverseApp:
             widget.destroy()
         
         # Get discussions on author's books
-        self.db.cursor.execute('''
-            SELECT d.id, b.title, d.title, d.content, u.username, d.created_at, b.author_email
-            FROM discussions d
-            JOIN users u ON d.user_email = u.email
-            JOIN books b ON d.book_id = b.id
-            WHERE b.author_email = ?
-            ORDER BY d.created_at DESC
-        ''', (self.current_user,))
+        self.db.cursor.execute(desktop_sql.AUTHOR_DISCUSSIONS, (self.current_user,))
         
         discussions = self.db.cursor.fetchall()
         
@@ -3871,11 +3785,7 @@ class bookverseApp:
         profile_frame.pack(pady=20)
         
         # Get user information
-        self.db.cursor.execute('''
-            SELECT username, full_name
-            FROM users
-            WHERE email = ?
-        ''', (self.current_user,))
+        self.db.cursor.execute(desktop_sql.USER_NAMES, (self.current_user,))
         username, full_name = self.db.cursor.fetchone()
         
         # Profile information
@@ -3972,11 +3882,7 @@ class bookverseApp:
         back_button.pack(anchor="w", padx=10, pady=5)
         
         # Get current user information
-        self.db.cursor.execute('''
-            SELECT username, full_name, date_of_birth, gender, book_genre_preference
-            FROM users
-            WHERE email = ?
-        ''', (self.current_user,))
+        self.db.cursor.execute(desktop_sql.PROFILE_DETAILS, (self.current_user,))
         username, full_name, date_of_birth, gender, genre_preference = self.db.cursor.fetchone()
         
         # Create title
@@ -4094,14 +4000,7 @@ class bookverseApp:
         title_label.pack(pady=10)
         
         # Get book discussions
-        self.db.cursor.execute('''
-            SELECT d.id, d.title, d.content, u.username, d.created_at, b.author_email, d.user_email
-            FROM discussions d
-            JOIN users u ON d.user_email = u.email
-            JOIN books b ON d.book_id = b.id
-            WHERE b.title = ?
-            ORDER BY d.created_at DESC
-        ''', (book_title,))
+        self.db.cursor.execute(desktop_sql.BOOK_DISCUSSIONS, (book_title,))
         
         discussions = self.db.cursor.fetchall()
         
@@ -4212,13 +4111,7 @@ class bookverseApp:
         back_button.pack(anchor="w", padx=10, pady=5)
         
         # Get discussion details
-        self.db.cursor.execute('''
-            SELECT d.title, d.content, u.username, d.created_at, b.author_email, d.user_email
-            FROM discussions d
-            JOIN users u ON d.user_email = u.email
-            JOIN books b ON d.book_id = b.id
-            WHERE d.id = ?
-        ''', (discussion_id,))
+        self.db.cursor.execute(desktop_sql.DISCUSSION, (discussion_id,))
         
         discussion = self.db.cursor.fetchone()
         
@@ -4276,15 +4169,7 @@ class bookverseApp:
         content_scrollbar.config(command=content_text.yview)
         
         # Get comments/replies
-        self.db.cursor.execute('''
-            SELECT r.content, u.username, r.created_at, b.author_email, r.user_email
-            FROM discussion_replies r
-            JOIN users u ON r.user_email = u.email
-            JOIN discussions d ON r.discussion_id = d.id
-            JOIN books b ON d.book_id = b.id
-            WHERE r.discussion_id = ?
-            ORDER BY r.created_at ASC
-        ''', (discussion_id,))
+        self.db.cursor.execute(desktop_sql.DISCUSSION_THREAD_REPLIES, (discussion_id,))
         
         replies = self.db.cursor.fetchall()
         
@@ -4386,12 +4271,7 @@ class bookverseApp:
             self.view_discussion(self.current_book_title, discussion_id)
         else:
             # Retrieve book title from discussion id
-            self.db.cursor.execute('''
-                SELECT b.title 
-                FROM discussions d
-                JOIN books b ON d.book_id = b.id
-                WHERE d.id = ?
-            ''', (discussion_id,))
+            self.db.cursor.execute(desktop_sql.DISCUSSION_BOOK_TITLE, (discussion_id,))
             result = self.db.cursor.fetchone()
             if result:
                 book_title = result[0]
@@ -4448,7 +4328,7 @@ class bookverseApp:
             return
         
         # Get book ID
-        self.db.cursor.execute('SELECT id FROM books WHERE title = ?', (book_title,))
+        self.db.cursor.execute(desktop_sql.BOOK_ID_BY_TITLE, (book_title,))
         book_id = self.db.cursor.fetchone()[0]
         
         # Add discussion
@@ -4480,12 +4360,7 @@ class bookverseApp:
         back_button.pack(anchor="w", padx=10, pady=5)
         
         # Get discussion details
-        self.db.cursor.execute('''
-            SELECT d.title, d.content, u.username, d.created_at, d.book_id, d.user_email
-            FROM discussions d
-            JOIN users u ON d.user_email = u.email
-            WHERE d.id = ?
-        ''', (discussion_id,))
+        self.db.cursor.execute(desktop_sql.DISCUSSION_DETAILS, (discussion_id,))
         
         discussion = self.db.cursor.fetchone()
         
@@ -4543,13 +4418,7 @@ class bookverseApp:
         content_scrollbar.config(command=content_text.yview)
         
         # Get comments for this discussion
-        self.db.cursor.execute('''
-            SELECT r.content, u.username, r.created_at
-            FROM discussion_replies r
-            JOIN users u ON r.user_email = u.email
-            WHERE r.discussion_id = ?
-            ORDER BY r.created_at
-        ''', (discussion_id,))
+        self.db.cursor.execute(desktop_sql.DISCUSSION_REPLIES, (discussion_id,))
         
         comments = self.db.cursor.fetchall()
         
@@ -4689,7 +4558,7 @@ class bookverseApp:
             return
         
         # Get book ID
-        self.db.cursor.execute('SELECT id FROM books WHERE title = ?', (book_title,))
+        self.db.cursor.execute(desktop_sql.BOOK_ID_BY_TITLE, (book_title,))
         book_id = self.db.cursor.fetchone()[0]
         
         # Add discussion
@@ -4719,14 +4588,7 @@ class bookverseApp:
         back_button.pack(anchor="w", padx=10, pady=5)
         
         # Get book reviews
-        self.db.cursor.execute('''
-            SELECT r.rating, r.comment, u.username, r.review_date
-            FROM reviews r
-            JOIN users u ON r.user_email = u.email
-            JOIN books b ON r.book_id = b.id
-            WHERE b.title = ?
-            ORDER BY r.review_date DESC
-        ''', (book_title,))
+        self.db.cursor.execute(desktop_sql.BOOK_REVIEWS_BY_TITLE, (book_title,))
         
         reviews = self.db.cursor.fetchall()
         
@@ -4823,7 +4685,7 @@ class bookverseApp:
         
         try:
             # Get book ID
-            self.db.cursor.execute('SELECT id FROM books WHERE title = ?', (book_title,))
+            self.db.cursor.execute(desktop_sql.BOOK_ID_BY_TITLE, (book_title,))
             book_id = self.db.cursor.fetchone()[0]
             
             # Add review to database
@@ -5012,12 +4874,7 @@ class bookverseApp:
         canvas.create_window((0, 0), window=books_frame, anchor="nw")
         
         # Get all books
-        self.db.cursor.execute('''
-            SELECT b.id, b.title, b.description, u.username, u.email
-            FROM books b
-            JOIN users u ON b.author_email = u.email
-            ORDER BY b.title
-        ''')
+        self.db.cursor.execute(desktop_sql.ADMIN_BOOKS)
         
         books = self.db.cursor.fetchall()
         
@@ -5093,13 +4950,7 @@ class bookverseApp:
         canvas.create_window((0, 0), window=reviews_frame, anchor="nw")
         
         # Get all reviews
-        self.db.cursor.execute('''
-            SELECT r.id, b.title, r.rating, r.comment, u.username, u.email, r.review_date
-            FROM reviews r
-            JOIN books b ON r.book_id = b.id
-            JOIN users u ON r.user_email = u.email
-            ORDER BY r.review_date DESC
-        ''')
+        self.db.cursor.execute(desktop_sql.ADMIN_REVIEWS)
         
         reviews = self.db.cursor.fetchall()
         
@@ -5184,13 +5035,7 @@ class bookverseApp:
         canvas.create_window((0, 0), window=discussions_frame, anchor="nw")
         
         # Get all discussions
-        self.db.cursor.execute('''
-            SELECT d.id, b.title, d.title, d.content, u.username, u.email, d.created_at
-            FROM discussions d
-            JOIN books b ON d.book_id = b.id
-            JOIN users u ON d.user_email = u.email
-            ORDER BY d.created_at DESC
-        ''')
+        self.db.cursor.execute(desktop_sql.ADMIN_DISCUSSIONS)
         
         discussions = self.db.cursor.fetchall()
         
@@ -5233,9 +5078,7 @@ class bookverseApp:
                 content_label.pack(pady=5, anchor="w")
                 
                 # Get number of replies
-                self.db.cursor.execute('''
-                    SELECT COUNT(*) FROM discussion_replies WHERE discussion_id = ?
-                ''', (disc_id,))
+                self.db.cursor.execute(desktop_sql.REPLY_COUNT, (disc_id,))
                 
                 reply_count = self.db.cursor.fetchone()[0]
                 replies_label = ttk.Label(disc_frame,
@@ -5281,9 +5124,7 @@ class bookverseApp:
             
         try:
             # Delete associated discussions and replies
-            self.db.cursor.execute('''
-                SELECT id FROM discussions WHERE book_id = ?
-            ''', (book_id,))
+            self.db.cursor.execute(desktop_sql.BOOK_DISCUSSION_IDS, (book_id,))
             
             discussion_ids = self.db.cursor.fetchall()
             
@@ -5406,21 +5247,9 @@ class bookverseApp:
         
         # Get queries based on current view
         if self.current_view == "active":
-            self.db.cursor.execute('''
-                SELECT sq.id, sq.user_email, u.username, sq.subject, sq.content, sq.status, sq.created_at
-                FROM support_queries sq
-                JOIN users u ON sq.user_email = u.email
-                WHERE sq.status != 'Resolved'
-                ORDER BY sq.created_at DESC
-            ''')
+            self.db.cursor.execute(desktop_sql.OPEN_SUPPORT_QUERIES)
         else:
-            self.db.cursor.execute('''
-                SELECT sq.id, sq.user_email, u.username, sq.subject, sq.content, sq.status, sq.created_at
-                FROM support_queries sq
-                JOIN users u ON sq.user_email = u.email
-                WHERE sq.status = 'Resolved'
-                ORDER BY sq.created_at DESC
-            ''')
+            self.db.cursor.execute(desktop_sql.RESOLVED_SUPPORT_QUERIES)
         
         queries = self.db.cursor.fetchall()
         
@@ -5465,13 +5294,7 @@ class bookverseApp:
                 user_label.pack(anchor="w")
                 
                 # Show existing responses
-                self.db.cursor.execute('''
-                    SELECT sr.content, u.username, sr.created_at
-                    FROM support_responses sr
-                    LEFT JOIN users u ON sr.tech_support_email = u.email
-                    WHERE sr.query_id = ?
-                    ORDER BY sr.created_at
-                ''', (query_id,))
+                self.db.cursor.execute(desktop_sql.SUPPORT_RESPONSES, (query_id,))
                 
                 responses = self.db.cursor.fetchall()
                 
@@ -5546,11 +5369,7 @@ class bookverseApp:
         response_window.configure(bg=self.colors["background"])
         
         # Get query details
-        self.db.cursor.execute('''
-            SELECT subject, content
-            FROM support_queries
-            WHERE id = ?
-        ''', (query_id,))
+        self.db.cursor.execute(desktop_sql.SUPPORT_QUERY, (query_id,))
         
         subject, content = self.db.cursor.fetchone()
         
@@ -5653,11 +5472,7 @@ class bookverseApp:
         """Check and award badges based on user activity"""
         try:
             # Get current counts
-            self.db.cursor.execute('''
-                SELECT books_read, reading_streak
-                FROM users
-                WHERE email = ?
-            ''', (self.current_user,))
+            self.db.cursor.execute(desktop_sql.READING_STATS, (self.current_user,))
             
             books_read, reading_streak = self.db.cursor.fetchone()
             
@@ -5676,10 +5491,7 @@ class bookverseApp:
                 self.award_badge("reader", "Dedicated Reader", "7-day reading streak")
             
             # Check for review badges
-            self.db.cursor.execute('''
-                SELECT COUNT(*) FROM reviews
-                WHERE user_email = ?
-            ''', (self.current_user,))
+            self.db.cursor.execute(desktop_sql.USER_REVIEW_COUNT, (self.current_user,))
             
             review_count = self.db.cursor.fetchone()[0]
             
@@ -5694,10 +5506,7 @@ class bookverseApp:
     
     def has_badge(self, badge_type, badge_name):
         """Check if user already has a specific badge"""
-        self.db.cursor.execute('''
-            SELECT COUNT(*) FROM user_badges
-            WHERE user_email = ? AND badge_type = ? AND badge_name = ?
-        ''', (self.current_user, badge_type, badge_name))
+        self.db.cursor.execute(desktop_sql.BADGE_COUNT, (self.current_user, badge_type, badge_name))
         
         return self.db.cursor.fetchone()[0] > 0
     
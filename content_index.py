@@ -0,0 +1,192 @@
+"""SQLite FTS5 index over the text of every page of every book PDF.
+
+Like search_index, this is shared by the Flask app and the desktop client,
+so the books table name is passed in. Each indexed page is one FTS row whose
+rowid encodes (book_id, page_number), which lets a book's pages be replaced
+or removed with a rowid range instead of a full scan of the index.
+
+Text extraction is CPU bound, so ``reindex`` spreads it over a process pool
+and commits each book as soon as its text arrives; books whose fingerprint
+is already recorded in ``page_search_books`` are skipped, so an interrupted
+reindex resumes where it stopped.
+
+Run ``python -m content_index [database]`` to reindex the desktop database.
+"""
+import argparse
+import io
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from PyPDF2 import PdfReader
+
+from search_index import MATCH_START, MATCH_END, build_match_query, split_statements
+
+# Pages per book addressable by the rowid encoding
+PAGES_PER_BOOK = 1000000
+
+INDEX_DDL = '''
+CREATE VIRTUAL TABLE IF NOT EXISTS page_search USING fts5(
+    text, book_id UNINDEXED, page_number UNINDEXED,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+
+CREATE TABLE IF NOT EXISTS page_search_books (
+    book_id INTEGER PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    page_count INTEGER NOT NULL
+);
+
+CREATE TRIGGER IF NOT EXISTS page_search_book_delete AFTER DELETE ON {books}
+BEGIN
+    DELETE FROM page_search WHERE rowid BETWEEN old.id * {pages} AND old.id * {pages} + {pages} - 1;
+    DELETE FROM page_search_books WHERE book_id = old.id;
+END;
+'''
+
+SEARCH_SQL = '''
+SELECT book_id, page_number,
+       snippet(page_search, 0, ?, ?, '...', 24),
+       bm25(page_search) AS rank
+FROM page_search
+WHERE page_search MATCH ?
+ORDER BY rank
+LIMIT ? OFFSET ?
+'''
+
+
+def index_statements(books):
+    """Return the statements that create the page index, as ``create_content_index`` runs them"""
+    return split_statements(INDEX_DDL.format(books=books, pages=PAGES_PER_BOOK))
+
+
+def create_content_index(connection, books):
+    """Create the page index, its bookkeeping table and the trigger that drops deleted books"""
+    connection.executescript(INDEX_DDL.format(books=books, pages=PAGES_PER_BOOK))
+
+
+def extract_pages(source):
+    """Return the text of every page of a PDF as a list of strings.
+
+    ``source`` is ``('file', path)`` or ``('blob', database, table, column,
+    rowid)``; it is a plain tuple so it can be sent to pool processes, which
+    open the PDF themselves instead of receiving its bytes.
+    """
+    if source[0] == 'file':
+        pdf_file = open(source[1], 'rb')
+    else:
+        _kind, database, table, column, rowid = source
+        connection = sqlite3.connect(database)
+        try:
+            data = connection.execute(f'SELECT {column} FROM {table} WHERE rowid = ?', (rowid,)).fetchone()[0]
+        finally:
+            connection.close()
+        pdf_file = io.BytesIO(data or b'')
+
+    with pdf_file:
+        reader = PdfReader(pdf_file)
+        if reader.is_encrypted:
+            reader.decrypt('')
+        texts = []
+        for page in reader.pages:
+            try:
+                texts.append(page.extract_text() or '')
+            except Exception:
+                texts.append('')
+        return texts
+
+
+def remove_book_pages(connection, book_id):
+    """Drop a book's pages from the index; does not commit"""
+    first = book_id * PAGES_PER_BOOK
+    connection.execute('DELETE FROM page_search WHERE rowid BETWEEN ? AND ?',
+                       (first, first + PAGES_PER_BOOK - 1))
+    connection.execute('DELETE FROM page_search_books WHERE book_id = ?', (book_id,))
+
+
+def index_book_pages(connection, book_id, fingerprint, texts):
+    """Replace a book's pages in the index with ``texts`` (page 1 first); does not commit"""
+    remove_book_pages(connection, book_id)
+    connection.executemany(
+        'INSERT INTO page_search (rowid, text, book_id, page_number) VALUES (?, ?, ?, ?)',
+        ((book_id * PAGES_PER_BOOK + page_number, text, book_id, page_number)
+         for page_number, text in enumerate(texts, start=1) if text.strip())
+    )
+    connection.execute(
+        'INSERT OR REPLACE INTO page_search_books (book_id, fingerprint, page_count) VALUES (?, ?, ?)',
+        (book_id, fingerprint, len(texts))
+    )
+
+
+def reindex(connection, books, processes=None, full=False, progress=None):
+    """Extract and index every book in ``books`` that is not already up to date.
+
+    ``books`` yields (book_id, fingerprint, source) tuples; ``source`` is as
+    for extract_pages. ``full`` reindexes books even if their fingerprint is
+    unchanged. ``progress`` is called with (book_id, error) as each book
+    finishes. Returns the number of books indexed.
+    """
+    indexed = dict(connection.execute('SELECT book_id, fingerprint FROM page_search_books'))
+    pending = {book_id: (fingerprint, source) for book_id, fingerprint, source in books
+               if full or indexed.get(book_id) != fingerprint}
+    if not pending:
+        return 0
+
+    done = 0
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = {pool.submit(extract_pages, source): book_id
+                   for book_id, (_fingerprint, source) in pending.items()}
+        for future in as_completed(futures):
+            book_id = futures[future]
+            try:
+                texts = future.result()
+            except Exception as error:
+                # Left unrecorded, so the next run tries this book again
+                if progress:
+                    progress(book_id, error)
+                continue
+            index_book_pages(connection, book_id, pending[book_id][0], texts)
+            connection.commit()
+            done += 1
+            if progress:
+                progress(book_id, None)
+    return done
+
+
+def search_pages(connection, text, limit=20, offset=0,
+                 start_mark=MATCH_START, end_mark=MATCH_END):
+    """Return ranked page matches as (book_id, page_number, snippet) tuples"""
+    query = build_match_query(text)
+    if not query:
+        return []
+
+    rows = connection.execute(SEARCH_SQL, (start_mark, end_mark, query, limit, offset)).fetchall()
+    return [(book_id, page_number, snippet) for book_id, page_number, snippet, _rank in rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Index the text of every book in the desktop database.')
+    parser.add_argument('database', nargs='?', default='bookverse.db')
+    parser.add_argument('--processes', type=int, default=None,
+                        help='number of extraction processes (default: one per CPU)')
+    parser.add_argument('--full', action='store_true', help='reindex books that are already indexed')
+    args = parser.parse_args()
+
+    connection = sqlite3.connect(args.database)
+    create_content_index(connection, books='books')
+    database = os.path.abspath(args.database)
+    # Desktop books are never edited in place, so the blob size identifies its content
+    books = [(book_id, f'size:{size}', ('blob', database, 'books', 'pdf_data', book_id))
+             for book_id, size in connection.execute(
+                 'SELECT id, length(pdf_data) FROM books WHERE pdf_data IS NOT NULL')]
+
+    def report(book_id, error):
+        print(f'book {book_id}: {error}' if error else f'book {book_id}: indexed')
+
+    count = reindex(connection, books, args.processes, args.full, report)
+    print(f'Indexed {count} of {len(books)} books')
+    connection.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""Runs the desktop client's slow database work off the Tk main thread.
+
+Tk only redraws between event handlers, so a query, a PBKDF2 password check
+or a large PDF read run by a handler freezes the window until it finishes.
+DatabaseWorker runs submitted calls one at a time on a background thread
+that has its own connection, and hands each result back to the Tk thread
+through a queue it drains with ``after()``; callbacks therefore run on the
+Tk thread and may update widgets.
+
+A request submitted under a key supersedes the previous request with that
+key: a new search cancels the one still queued or running, and a cancelled
+request's callbacks never run. A running query is stopped with SQLite's
+``interrupt``.
+"""
+import queue
+import threading
+import traceback
+
+
+class DatabaseRequest:
+    """One call submitted to a DatabaseWorker"""
+    def __init__(self, function, args, on_done, on_error, key):
+        self.function = function
+        self.args = args
+        self.on_done = on_done
+        self.on_error = on_error
+        self.key = key
+        self.cancelled = False
+        self.result = None
+        self.error = None
+
+
+class DatabaseWorker:
+    """Background thread that runs ``function(database, *args)`` calls for a Tk app.
+
+    ``open_database()`` is called on the worker thread to open the
+    connection it uses; the returned object needs a ``conn`` attribute
+    holding its sqlite3 connection.
+    """
+    def __init__(self, widget, open_database, poll_interval=25):
+        self.widget = widget
+        self.poll_interval = poll_interval
+        self._open_database = open_database
+        self._database = None
+        self._requests = queue.Queue()
+        self._finished = queue.Queue()
+        self._pending = set()  # submitted requests the Tk thread has not collected yet
+        self._latest = {}  # key -> newest request submitted under it
+        self._poll_id = None
+        self._current = None  # request running on the worker thread
+        self._lock = threading.Lock()  # guards _current, so only its own query is interrupted
+        self._thread = threading.Thread(target=self._run, name='database-worker', daemon=True)
+        self._thread.start()
+
+    def submit(self, function, *args, on_done=None, on_error=None, key=None):
+        """Run ``function(database, *args)`` on the worker thread.
+
+        ``on_done(result)`` or ``on_error(exception)`` is then called on the
+        Tk thread, unless the request was cancelled first.
+        """
+        if key is not None and key in self._latest:
+            self.cancel(self._latest[key])
+        request = DatabaseRequest(function, args, on_done, on_error, key)
+        if key is not None:
+            self._latest[key] = request
+        self._pending.add(request)
+        self._requests.put(request)
+        if self._poll_id is None:
+            self._poll_id = self.widget.after(self.poll_interval, self._poll)
+        return request
+
+    def cancel(self, request):
+        """Drop a request's result, interrupting its query if it is running"""
+        request.cancelled = True
+        with self._lock:
+            if self._current is request:
+                self._database.conn.interrupt()
+
+    def cancel_all(self):
+        for request in list(self._pending):
+            self.cancel(request)
+
+    def close(self):
+        """Cancel everything outstanding and stop the worker thread once it is idle"""
+        self.cancel_all()
+        if self._poll_id is not None:
+            self.widget.after_cancel(self._poll_id)
+            self._poll_id = None
+        self._requests.put(None)
+
+    def _run(self):
+        self._database = self._open_database()
+        try:
+            while True:
+                request = self._requests.get()
+                if request is None:
+                    break
+                if not request.cancelled:
+                    with self._lock:
+                        self._current = request
+                    try:
+                        request.result = request.function(self._database, *request.args)
+                    except Exception as error:
+                        request.error = error
+                    finally:
+                        with self._lock:
+                            self._current = None
+                self._finished.put(request)
+        finally:
+            self._database.conn.close()
+
+    def _poll(self):
+        self._poll_id = None
+        while True:
+            try:
+                request = self._finished.get_nowait()
+            except queue.Empty:
+                break
+            self._pending.discard(request)
+            if self._latest.get(request.key) is request:
+                del self._latest[request.key]
+            if request.cancelled:
+                continue
+            if request.error is not None:
+                if request.on_error:
+                    request.on_error(request.error)
+                else:
+                    print(f"ERROR in database request {request.function.__name__}:")
+                    traceback.print_exception(request.error)
+            elif request.on_done:
+                request.on_done(request.result)
+        # Only keep polling while something is in flight
+        if self._pending:
+            self._poll_id = self.widget.after(self.poll_interval, self._poll)
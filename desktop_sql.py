@@ -0,0 +1,289 @@
+"""SQL the desktop client runs, shared with the query plan checks.
+
+bookverse.py executes these statements and query_plans.py explains the same
+strings against a migrated database, so the checks cannot drift from what the
+screens send. Statements built at run time (the ``IN (...)`` lookups after a
+full-text search) stay in bookverse.py.
+"""
+
+# Schema changes applied after the tables exist; the database's PRAGMA
+# user_version counts how many of these steps it already has. Append new
+# steps, never edit old ones. Run ``python -m query_plans`` to check that the
+# screens' queries still use these indexes.
+SCHEMA_MIGRATIONS = [
+    # 1: indexes for the lookups and sorted lists behind each screen
+    [
+        'CREATE INDEX IF NOT EXISTS ix_books_title ON books (title)',
+        'CREATE INDEX IF NOT EXISTS ix_books_author_email_title ON books (author_email, title)',
+        'CREATE INDEX IF NOT EXISTS ix_books_author_email_upload_date ON books (author_email, upload_date)',
+        'CREATE INDEX IF NOT EXISTS ix_reviews_book_id_review_date ON reviews (book_id, review_date)',
+        'CREATE INDEX IF NOT EXISTS ix_reviews_user_email_review_date ON reviews (user_email, review_date)',
+        'CREATE INDEX IF NOT EXISTS ix_discussions_book_id_created_at ON discussions (book_id, created_at)',
+        'CREATE INDEX IF NOT EXISTS ix_discussions_created_at ON discussions (created_at)',
+        'CREATE INDEX IF NOT EXISTS ix_discussions_user_email ON discussions (user_email)',
+        'CREATE INDEX IF NOT EXISTS ix_discussion_replies_discussion_id_created_at '
+        'ON discussion_replies (discussion_id, created_at)',
+        'CREATE INDEX IF NOT EXISTS ix_user_library_book_id ON user_library (book_id)',
+        'CREATE INDEX IF NOT EXISTS ix_user_library_user_email_last_read ON user_library (user_email, last_read)',
+        'CREATE INDEX IF NOT EXISTS ix_user_badges_user_email_badge '
+        'ON user_badges (user_email, badge_type, badge_name)',
+        'CREATE INDEX IF NOT EXISTS ix_support_queries_user_email_created_at '
+        'ON support_queries (user_email, created_at)',
+        'CREATE INDEX IF NOT EXISTS ix_support_queries_status_created_at ON support_queries (status, created_at)',
+        'CREATE INDEX IF NOT EXISTS ix_support_responses_query_id_created_at '
+        'ON support_responses (query_id, created_at)',
+    ],
+    # 2: the admin review list, newest first
+    [
+        'CREATE INDEX IF NOT EXISTS ix_reviews_review_date ON reviews (review_date)',
+    ],
+]
+
+BOOK_PDF_SIZE = 'SELECT length(pdf_data) FROM books WHERE id = ?'
+
+ALL_BOOKS = '''
+    SELECT b.title, b.description, u.username, b.amazon_link, u.email
+    FROM books b
+    JOIN users u ON b.author_email = u.email
+'''
+
+LIBRARY_BOOKS = '''
+    SELECT b.title, b.description, u.username, b.amazon_link, u.email, ul.last_read
+    FROM user_library ul
+    JOIN books b ON ul.book_id = b.id
+    JOIN users u ON b.author_email = u.email
+    WHERE ul.user_email = ?
+    ORDER BY ul.last_read DESC
+'''
+
+BOOK_PDF_BY_TITLE = 'SELECT id, pdf_data FROM books WHERE title = ?'
+
+LOGIN = 'SELECT password, user_type FROM users WHERE email = ?'
+
+USERNAME = 'SELECT username FROM users WHERE email = ?'
+
+USER_REVIEWS = '''
+    SELECT r.book_id, r.rating, r.comment, r.review_date, b.title
+    FROM reviews r
+    JOIN books b ON r.book_id = b.id
+    WHERE r.user_email = ?
+    ORDER BY r.review_date DESC
+'''
+
+BOOK_READ_BY_USER = '''
+    SELECT COUNT(*) FROM user_library
+    WHERE user_email = ? AND book_id = ? AND last_read IS NOT NULL
+'''
+
+PREVIOUS_READ_DATE = '''
+    SELECT MAX(last_read) FROM user_library
+    WHERE user_email = ? AND last_read < ?
+'''
+
+READING_STATS = '''
+    SELECT books_read, reading_streak
+    FROM users
+    WHERE email = ?
+'''
+
+USER_REVIEW_COUNT = '''
+    SELECT COUNT(*) FROM reviews
+    WHERE user_email = ?
+'''
+
+BADGE_COUNT = '''
+    SELECT COUNT(*) FROM user_badges
+    WHERE user_email = ? AND badge_type = ? AND badge_name = ?
+'''
+
+BOOK_ID_BY_TITLE = 'SELECT id FROM books WHERE title = ?'
+
+LIBRARY_ENTRY_COUNT = '''
+    SELECT COUNT(*) FROM user_library
+    WHERE user_email = ? AND book_id = ?
+'''
+
+RECENT_DISCUSSIONS = '''
+    SELECT d.id, b.title, d.title, d.content, u.username, d.created_at
+    FROM discussions d
+    JOIN books b ON d.book_id = b.id
+    JOIN users u ON d.user_email = u.email
+    ORDER BY d.created_at DESC
+'''
+
+PROFILE = '''
+    SELECT username, full_name, email, avatar, reading_streak, books_read
+    FROM users
+    WHERE email = ?
+'''
+
+USER_NAMES = '''
+    SELECT username, full_name
+    FROM users
+    WHERE email = ?
+'''
+
+USER_SUPPORT_QUERIES = '''
+    SELECT sq.id, sq.subject, sq.content, sq.status, sq.created_at
+    FROM support_queries sq
+    WHERE sq.user_email = ?
+    ORDER BY sq.created_at DESC
+'''
+
+SUPPORT_RESPONSES = '''
+    SELECT sr.content, u.username, sr.created_at
+    FROM support_responses sr
+    LEFT JOIN users u ON sr.tech_support_email = u.email
+    WHERE sr.query_id = ?
+    ORDER BY sr.created_at
+'''
+
+AUTHOR_BOOK_TITLES = '''
+    SELECT id, title
+    FROM books
+    WHERE author_email = ?
+    ORDER BY title
+'''
+
+BOOK_REVIEWS = '''
+    SELECT r.rating, r.comment, u.username, r.review_date
+    FROM reviews r
+    JOIN users u ON r.user_email = u.email
+    WHERE r.book_id = ?
+    ORDER BY r.review_date DESC
+'''
+
+AUTHOR_BOOKS = '''
+    SELECT id, title, description, upload_date, amazon_link
+    FROM books
+    WHERE author_email = ?
+    ORDER BY upload_date DESC
+'''
+
+BOOK_DETAILS = '''
+    SELECT title, description, amazon_link
+    FROM books
+    WHERE id = ?
+'''
+
+AUTHOR_DISCUSSIONS = '''
+    SELECT d.id, b.title, d.title, d.content, u.username, d.created_at, b.author_email
+    FROM discussions d
+    JOIN users u ON d.user_email = u.email
+    JOIN books b ON d.book_id = b.id
+    WHERE b.author_email = ?
+    ORDER BY d.created_at DESC
+'''
+
+PROFILE_DETAILS = '''
+    SELECT username, full_name, date_of_birth, gender, book_genre_preference
+    FROM users
+    WHERE email = ?
+'''
+
+BOOK_DISCUSSIONS = '''
+    SELECT d.id, d.title, d.content, u.username, d.created_at, b.author_email, d.user_email
+    FROM discussions d
+    JOIN users u ON d.user_email = u.email
+    JOIN books b ON d.book_id = b.id
+    WHERE b.title = ?
+    ORDER BY d.created_at DESC
+'''
+
+DISCUSSION = '''
+    SELECT d.title, d.content, u.username, d.created_at, b.author_email, d.user_email
+    FROM discussions d
+    JOIN users u ON d.user_email = u.email
+    JOIN books b ON d.book_id = b.id
+    WHERE d.id = ?
+'''
+
+DISCUSSION_THREAD_REPLIES = '''
+    SELECT r.content, u.username, r.created_at, b.author_email, r.user_email
+    FROM discussion_replies r
+    JOIN users u ON r.user_email = u.email
+    JOIN discussions d ON r.discussion_id = d.id
+    JOIN books b ON d.book_id = b.id
+    WHERE r.discussion_id = ?
+    ORDER BY r.created_at ASC
+'''
+
+DISCUSSION_BOOK_TITLE = '''
+    SELECT b.title
+    FROM discussions d
+    JOIN books b ON d.book_id = b.id
+    WHERE d.id = ?
+'''
+
+DISCUSSION_DETAILS = '''
+    SELECT d.title, d.content, u.username, d.created_at, d.book_id, d.user_email
+    FROM discussions d
+    JOIN users u ON d.user_email = u.email
+    WHERE d.id = ?
+'''
+
+DISCUSSION_REPLIES = '''
+    SELECT r.content, u.username, r.created_at
+    FROM discussion_replies r
+    JOIN users u ON r.user_email = u.email
+    WHERE r.discussion_id = ?
+    ORDER BY r.created_at
+'''
+
+BOOK_REVIEWS_BY_TITLE = '''
+    SELECT r.rating, r.comment, u.username, r.review_date
+    FROM reviews r
+    JOIN users u ON r.user_email = u.email
+    JOIN books b ON r.book_id = b.id
+    WHERE b.title = ?
+    ORDER BY r.review_date DESC
+'''
+
+ADMIN_BOOKS = '''
+    SELECT b.id, b.title, b.description, u.username, u.email
+    FROM books b
+    JOIN users u ON b.author_email = u.email
+    ORDER BY b.title
+'''
+
+ADMIN_REVIEWS = '''
+    SELECT r.id, b.title, r.rating, r.comment, u.username, u.email, r.review_date
+    FROM reviews r
+    JOIN books b ON r.book_id = b.id
+    JOIN users u ON r.user_email = u.email
+    ORDER BY r.review_date DESC
+'''
+
+ADMIN_DISCUSSIONS = '''
+    SELECT d.id, b.title, d.title, d.content, u.username, u.email, d.created_at
+    FROM discussions d
+    JOIN books b ON d.book_id = b.id
+    JOIN users u ON d.user_email = u.email
+    ORDER BY d.created_at DESC
+'''
+
+REPLY_COUNT = 'SELECT COUNT(*) FROM discussion_replies WHERE discussion_id = ?'
+
+BOOK_DISCUSSION_IDS = 'SELECT id FROM discussions WHERE book_id = ?'
+
+OPEN_SUPPORT_QUERIES = '''
+    SELECT sq.id, sq.user_email, u.username, sq.subject, sq.content, sq.status, sq.created_at
+    FROM support_queries sq
+    JOIN users u ON sq.user_email = u.email
+    WHERE sq.status IN ('Open', 'In Progress')
+    ORDER BY sq.created_at DESC
+'''
+
+RESOLVED_SUPPORT_QUERIES = '''
+    SELECT sq.id, sq.user_email, u.username, sq.subject, sq.content, sq.status, sq.created_at
+    FROM support_queries sq
+    JOIN users u ON sq.user_email = u.email
+    WHERE sq.status = 'Resolved'
+    ORDER BY sq.created_at DESC
+'''
+
+SUPPORT_QUERY = '''
+    SELECT subject, content
+    FROM support_queries
+    WHERE id = ?
+'''
@@ -0,0 +1,90 @@
+"""A bounded cache of decoded, resized images for the desktop client.
+
+Decoding an avatar PNG, resizing it and turning it into a Tk PhotoImage
+costs far more than the query that fetches it, and the grids show the same
+few authors on many cards. ImageCache keeps the converted images keyed by
+(owner, size, hash of the stored bytes), so each distinct image is
+converted once per size however many cards show it. Because the key
+includes the content hash, a changed avatar is a miss, and the entry for
+the old picture is dropped as soon as the new one is seen.
+
+Hashing a blob is not free either, so callers that fetch images off the Tk
+thread hash them there with ``content_digest`` and pass the digest in.
+"""
+import hashlib
+from collections import OrderedDict
+
+
+def content_digest(data):
+    """Hash of an image's stored bytes, as ImageCache keys it"""
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+class ImageCache:
+    """Least-recently-used cache of at most ``max_entries`` converted images"""
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # (owner, size, digest) -> image, least recently used first
+        self._digests = {}  # (owner, size) -> digest of the image cached for it
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, owner, size, data, convert, digest=None):
+        """Return ``convert(data, size)``, reusing the result for identical data.
+
+        ``digest`` is ``content_digest(data)``, computed here if not given.
+        """
+        if digest is None:
+            digest = content_digest(data)
+        key = (owner, size, digest)
+        image = self._entries.get(key)
+        if image is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return image
+
+        self.misses += 1
+        image = convert(data, size)
+        # The owner's picture changed; the old one will not be asked for again
+        stale = self._digests.get((owner, size))
+        if stale is not None and stale != digest:
+            self._drop((owner, size, stale))
+        self._entries[key] = image
+        self._digests[(owner, size)] = digest
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+        return image
+
+    def invalidate(self, owner):
+        """Forget every size of an owner's image"""
+        for key in [key for key in self._entries if key[0] == owner]:
+            self._drop(key)
+
+    def clear(self):
+        self._entries.clear()
+        self._digests.clear()
+
+    def _drop(self, key):
+        owner, size, digest = key
+        if self._entries.pop(key, None) is not None:
+            self.evictions += 1
+        if self._digests.get((owner, size)) == digest:
+            del self._digests[(owner, size)]
+
+    def stats(self):
+        """Return hit, miss and eviction counts, the entry count and the hit rate"""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': len(self._entries),
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+    def __str__(self):
+        stats = self.stats()
+        return (f"{stats['entries']} images, {stats['hits']} hits, {stats['misses']} misses "
+                f"({stats['hit_rate']:.0%} hit rate), {stats['evictions']} evicted")
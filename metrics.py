@@ -0,0 +1,257 @@
+"""Prometheus metrics shared by every worker process on a host.
+
+Each process adds to its own in-memory samples and a background thread
+writes the changed ones to an SQLite file every ``flush_interval`` seconds,
+one row per (process, sample). ``render`` sums the rows of all processes,
+so any worker can answer a scrape for the whole server. Counters and
+histograms of processes that have exited are folded into a single
+``retired`` process so totals never go backwards; gauges only count live
+processes.
+
+Histogram buckets are stored cumulatively (an observation increments every
+bucket whose bound it fits under), so merging processes is a plain sum.
+"""
+import atexit
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS sample (
+    process TEXT NOT NULL,
+    name TEXT NOT NULL,
+    labels TEXT NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (process, name, labels)
+);
+CREATE TABLE IF NOT EXISTS process (
+    process TEXT PRIMARY KEY,
+    pid INTEGER NOT NULL
+);
+'''
+
+RETIRED = 'retired'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000, 100000000)
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class Metric:
+    """One named metric; samples are recorded through its registry"""
+    def __init__(self, registry, name, kind, help, labelnames, buckets=None):
+        self.registry = registry
+        self.name = name
+        self.kind = kind
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets or ()) + (math.inf,) if kind == 'histogram' else None
+
+    def _labels(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f'{self.name} takes labels {self.labelnames}, got {tuple(labels)}')
+        return tuple((name, str(labels[name])) for name in self.labelnames)
+
+    def inc(self, amount=1, **labels):
+        """Add to a counter or gauge"""
+        self.registry._add(self.name, self._labels(labels), amount)
+
+    def dec(self, amount=1, **labels):
+        """Subtract from a gauge"""
+        self.registry._add(self.name, self._labels(labels), -amount)
+
+    def observe(self, value, **labels):
+        """Record one observation in a histogram"""
+        key = self._labels(labels)
+        for bound in self.buckets:
+            if value <= bound:
+                self.registry._add(f'{self.name}_bucket', key + (('le', _format_value(bound)),), 1)
+        self.registry._add(f'{self.name}_sum', key, value)
+        self.registry._add(f'{self.name}_count', key, 1)
+
+
+class MetricsRegistry:
+    """Defines metrics and aggregates their samples across processes through an SQLite file"""
+    def __init__(self, path, flush_interval=1.0):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.metrics = {}
+        self._lock = threading.Lock()  # guards the in-memory samples
+        self._io_lock = threading.Lock()  # guards the SQLite connection
+        self._pid = None
+        self._reset()
+
+    def _reset(self):
+        # Forked children must not flush the samples they inherited from their parent
+        self._pid = os.getpid()
+        self._process = f'{self._pid}-{time.time():.6f}'
+        self._values = {}
+        self._dirty = set()
+        self._connection = None
+        self._flusher = None
+
+    def counter(self, name, help, labelnames=()):
+        return self._define(name, 'counter', help, labelnames)
+
+    def gauge(self, name, help, labelnames=()):
+        return self._define(name, 'gauge', help, labelnames)
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._define(name, 'histogram', help, labelnames, buckets)
+
+    def _define(self, name, kind, help, labelnames, buckets=None):
+        metric = Metric(self, name, kind, help, labelnames, buckets)
+        self.metrics[name] = metric
+        return metric
+
+    def _add(self, name, labels, amount):
+        with self._lock:
+            if os.getpid() != self._pid:
+                self._reset()
+            key = (name, labels)
+            self._values[key] = self._values.get(key, 0) + amount
+            self._dirty.add(key)
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True)
+                self._flusher.start()
+
+    def _connect(self):
+        if self._connection is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self._connection = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            self._connection.execute('PRAGMA journal_mode = WAL')
+            self._connection.execute('PRAGMA synchronous = OFF')
+            self._connection.executescript(SCHEMA)
+        return self._connection
+
+    def _flush_loop(self):
+        pid = os.getpid()
+        while os.getpid() == pid:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except sqlite3.Error:
+                # Kept dirty, so the next flush writes them
+                pass
+
+    def flush(self):
+        """Write this process's changed samples to the shared file"""
+        with self._lock:
+            if os.getpid() != self._pid or not self._dirty:
+                return
+            keys = self._dirty
+            self._dirty = set()
+            process, pid = self._process, self._pid
+            rows = [(process, name, json.dumps(labels), self._values[(name, labels)]) for name, labels in keys]
+
+        # Recording carries on while the rows are written
+        with self._io_lock:
+            try:
+                connection = self._connect()
+                with connection:
+                    connection.execute('INSERT OR IGNORE INTO process (process, pid) VALUES (?, ?)',
+                                       (process, pid))
+                    connection.executemany(
+                        'INSERT OR REPLACE INTO sample (process, name, labels, value) VALUES (?, ?, ?, ?)', rows)
+            except sqlite3.Error:
+                with self._lock:
+                    if process == self._process:
+                        self._dirty.update(keys)
+                raise
+
+    def _retire_dead_processes(self, connection):
+        """Fold the samples of exited processes into the retired totals"""
+        dead = [process for process, pid in connection.execute('SELECT process, pid FROM process')
+                if not _pid_alive(pid)]
+        if not dead:
+            return
+        gauges = [name for name, metric in self.metrics.items() if metric.kind == 'gauge']
+        with connection:
+            for process in dead:
+                connection.execute(
+                    f'''INSERT INTO sample (process, name, labels, value)
+                        SELECT ?, name, labels, value FROM sample
+                        WHERE process = ? AND name NOT IN ({', '.join('?' * len(gauges))})
+                        ON CONFLICT (process, name, labels) DO UPDATE SET value = value + excluded.value''',
+                    (RETIRED, process, *gauges))
+                connection.execute('DELETE FROM sample WHERE process = ?', (process,))
+                connection.execute('DELETE FROM process WHERE process = ?', (process,))
+
+    def collect(self):
+        """Return {sample name: {labels: value}} summed over all processes"""
+        self.flush()
+        with self._io_lock:
+            connection = self._connect()
+            self._retire_dead_processes(connection)
+            rows = connection.execute('SELECT name, labels, SUM(value) FROM sample GROUP BY name, labels').fetchall()
+        samples = {}
+        for name, labels, value in rows:
+            samples.setdefault(name, {})[tuple(tuple(pair) for pair in json.loads(labels))] = value
+        return samples
+
+    def render(self):
+        """Return every metric in the Prometheus text exposition format"""
+        samples = self.collect()
+        lines = []
+        for name, metric in sorted(self.metrics.items()):
+            lines.append(f'# HELP {name} {metric.help}')
+            lines.append(f'# TYPE {name} {metric.kind}')
+            if metric.kind != 'histogram':
+                for labels, value in sorted(samples.get(name, {}).items()):
+                    lines.append(self._sample_line(name, labels, value))
+                continue
+
+            buckets = samples.get(f'{name}_bucket', {})
+            sums = samples.get(f'{name}_sum', {})
+            for labels, count in sorted(samples.get(f'{name}_count', {}).items()):
+                # Buckets no observation fitted under were never stored
+                for bound in metric.buckets:
+                    bucket = labels + (('le', _format_value(bound)),)
+                    lines.append(self._sample_line(f'{name}_bucket', bucket, buckets.get(bucket, 0)))
+                lines.append(self._sample_line(f'{name}_sum', labels, sums.get(labels, 0)))
+                lines.append(self._sample_line(f'{name}_count', labels, count))
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _sample_line(name, labels, value):
+        if not labels:
+            return f'{name} {_format_value(value)}'
+        label_text = ','.join(f'{label}="{_escape(label_value)}"' for label, label_value in labels)
+        return f'{name}{{{label_text}}} {_format_value(value)}'
+
+    def close(self):
+        try:
+            self.flush()
+        except sqlite3.Error:
+            pass
+
+
+def create_registry(path, flush_interval=1.0):
+    """Create a registry whose pending samples are also written when the process exits"""
+    registry = MetricsRegistry(path, flush_interval)
+    atexit.register(registry.close)
+    return registry
@@ -0,0 +1,46 @@
+"""Search indexes
+
+Revision ID: c41d9e2b7a05
+Revises: 7f7be886b207
+Create Date: 2026-10-18 16:42:13.518204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+import content_index
+import search_index
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41d9e2b7a05'
+down_revision = '7f7be886b207'
+branch_labels = None
+depends_on = None
+
+SEARCH_TRIGGERS = ['book_search_book_insert', 'book_search_book_update', 'book_search_book_delete',
+                   'book_search_user_insert', 'book_search_user_update', 'book_search_user_delete']
+
+
+def upgrade():
+    # The book and page search indexes are SQLite FTS5 tables kept in sync by triggers
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    # Databases that created the indexes before this migration keep their page index;
+    # the book index is refilled from the books as they are now
+    for statement in search_index.index_statements(books='book', users='"user"',
+                                                   author_key='author_id', user_key='id'):
+        op.execute(statement)
+    for statement in content_index.index_statements(books='book'):
+        op.execute(statement)
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    op.execute('DROP TRIGGER IF EXISTS page_search_book_delete')
+    op.execute('DROP TABLE IF EXISTS page_search_books')
+    op.execute('DROP TABLE IF EXISTS page_search')
+    for trigger in SEARCH_TRIGGERS:
+        op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+    op.execute('DROP TABLE IF EXISTS book_search')
@@ -0,0 +1,255 @@
+import contextlib
+import hashlib
+import json
+import os
+import tempfile
+import time
+import uuid
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+@contextlib.contextmanager
+def locked(open_file):
+    """Hold an exclusive lock on an open file, waiting for other threads and processes to release it"""
+    if fcntl:
+        fcntl.flock(open_file, fcntl.LOCK_EX)
+    else:
+        open_file.seek(0)
+        msvcrt.locking(open_file.fileno(), msvcrt.LK_LOCK, 1)
+    try:
+        yield open_file
+    finally:
+        if fcntl:
+            fcntl.flock(open_file, fcntl.LOCK_UN)
+        else:
+            open_file.seek(0)
+            msvcrt.locking(open_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class PDFStore:
+    """Content-addressed file store for book PDFs.
+
+    Every file is named by the SHA-256 of its bytes, so identical uploads share
+    a single file on disk and a stored file never changes once written.
+
+    Because files are shared, adding a reference and deleting an unreferenced
+    file must not interleave: an upload could find the file already present
+    just before another request deletes it as unused. Both therefore happen
+    under ``lock()``, which every process using the same root shares.
+    """
+    def __init__(self, root, chunk_size=64 * 1024):
+        self.root = root
+        self.chunk_size = chunk_size
+        os.makedirs(self.root, exist_ok=True)
+
+    def path_for(self, sha256):
+        """Return the on-disk path for a content hash"""
+        return os.path.join(self.root, sha256[:2], f'{sha256}.pdf')
+
+    @contextlib.contextmanager
+    def lock(self):
+        """Hold the store's exclusive lock, waiting for other processes to release it.
+
+        Hold it from putting a file until the row that references it is
+        committed, and while checking that a file is unreferenced and deleting it.
+        """
+        with open(os.path.join(self.root, '.lock'), 'a+b') as lock_file, locked(lock_file):
+            yield
+
+    def exists(self, sha256):
+        return os.path.exists(self.path_for(sha256))
+
+    def put(self, stream):
+        """Copy a readable stream into the store and return (sha256, size).
+
+        The bytes are hashed while they are written to a temporary file, which
+        is then moved into place; if the content is already stored the
+        temporary copy is simply discarded.
+        """
+        digest = hashlib.sha256()
+        size = 0
+        fd, temp_path = tempfile.mkstemp(dir=self.root, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as temp_file:
+                for chunk in iter(lambda: stream.read(self.chunk_size), b''):
+                    digest.update(chunk)
+                    temp_file.write(chunk)
+                    size += len(chunk)
+            return self.commit(temp_path, digest.hexdigest()), size
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def commit(self, temp_path, sha256):
+        """Move an already-hashed file into the store under its content hash"""
+        final_path = self.path_for(sha256)
+        if os.path.exists(final_path):
+            os.remove(temp_path)
+        else:
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            os.replace(temp_path, final_path)
+        return sha256
+
+    def open(self, sha256):
+        return open(self.path_for(sha256), 'rb')
+
+    def delete(self, sha256):
+        """Remove a stored file; callers must check it is unreferenced while holding ``lock()``"""
+        try:
+            os.remove(self.path_for(sha256))
+        except FileNotFoundError:
+            pass
+
+
+class UploadStaging:
+    """Resumable chunked uploads staged on disk until they are committed to a PDFStore.
+
+    Each upload is a ``<id>.part`` data file plus a ``<id>.json`` file holding
+    the metadata given when it was started. The size of the data file is the
+    acknowledged offset, so an interrupted client resumes by asking for it and
+    sending the rest. Chunks are hashed as they are written; the running hash
+    lives in memory, and if another process served the previous chunk (or the
+    server restarted) the staged bytes are re-hashed from disk.
+
+    Appending and finishing hold a lock on the data file, so a chunk sent
+    twice at once is written once: the second request finds the offset has
+    moved on and is refused, and the client resumes from the new offset.
+    """
+    UPLOAD_ID_LENGTH = 32
+
+    def __init__(self, store, root=None):
+        self.store = store
+        # Staged files must be on the store's filesystem so committing is a rename
+        self.root = root or os.path.join(store.root, 'staging')
+        self.chunk_size = store.chunk_size
+        self._hashes = {}
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, upload_id, suffix):
+        if len(upload_id) != self.UPLOAD_ID_LENGTH or not all(c in '0123456789abcdef' for c in upload_id):
+            raise KeyError(upload_id)
+        return os.path.join(self.root, upload_id + suffix)
+
+    def start(self, **info):
+        """Begin a new upload and return its id; ``info`` is stored alongside it"""
+        upload_id = uuid.uuid4().hex
+        with open(self._path(upload_id, '.part'), 'xb'):
+            pass
+        info['started_at'] = time.time()
+        with open(self._path(upload_id, '.json'), 'w') as info_file:
+            json.dump(info, info_file)
+        self._hashes[upload_id] = (0, hashlib.sha256())
+        return upload_id
+
+    def info(self, upload_id):
+        """Return the stored metadata of an upload, raising KeyError if it does not exist"""
+        try:
+            with open(self._path(upload_id, '.json')) as info_file:
+                return json.load(info_file)
+        except FileNotFoundError:
+            raise KeyError(upload_id) from None
+
+    def _open(self, upload_id):
+        """Open an upload's data file for writing, raising KeyError if it does not exist"""
+        try:
+            return open(self._path(upload_id, '.part'), 'r+b')
+        except FileNotFoundError:
+            raise KeyError(upload_id) from None
+
+    def offset(self, upload_id):
+        """Return the number of bytes received so far"""
+        try:
+            return os.path.getsize(self._path(upload_id, '.part'))
+        except FileNotFoundError:
+            raise KeyError(upload_id) from None
+
+    def _hash_to(self, upload_id, offset):
+        cached = self._hashes.get(upload_id)
+        if cached and cached[0] == offset:
+            return cached[1]
+
+        digest = hashlib.sha256()
+        with open(self._path(upload_id, '.part'), 'rb') as part:
+            remaining = offset
+            while remaining:
+                chunk = part.read(min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                digest.update(chunk)
+                remaining -= len(chunk)
+        return digest
+
+    def append(self, upload_id, offset, stream, limit=None):
+        """Write ``stream`` at ``offset`` and return the new offset.
+
+        Raises ValueError if ``offset`` is not the current end of the upload,
+        or if the upload would grow past ``limit`` bytes.
+        """
+        with self._open(upload_id) as part, locked(part):
+            current = self.offset(upload_id)
+            if offset != current:
+                raise ValueError(f'expected offset {current}')
+
+            digest = self._hash_to(upload_id, current)
+            self._hashes.pop(upload_id, None)
+            part.seek(current)
+            try:
+                for chunk in iter(lambda: stream.read(self.chunk_size), b''):
+                    if limit is not None and current + len(chunk) > limit:
+                        raise ValueError(f'upload exceeds {limit} bytes')
+                    part.write(chunk)
+                    digest.update(chunk)
+                    current += len(chunk)
+            finally:
+                # Keep only what was fully written so a failed chunk can be retried
+                part.truncate(current)
+                self._hashes[upload_id] = (current, digest)
+        return current
+
+    def sha256(self, upload_id):
+        """Return the SHA-256 of the bytes received so far, re-hashing them from disk only if needed"""
+        offset = self.offset(upload_id)
+        digest = self._hash_to(upload_id, offset)
+        self._hashes[upload_id] = (offset, digest)
+        return digest.hexdigest()
+
+    def finish(self, upload_id):
+        """Move a complete upload into the store and return (sha256, size)"""
+        with self._open(upload_id) as part, locked(part):
+            size = self.offset(upload_id)
+            sha256 = self.sha256(upload_id)
+            self.store.commit(self._path(upload_id, '.part'), sha256)
+        self.discard(upload_id)
+        return sha256, size
+
+    def discard(self, upload_id):
+        """Delete an upload and everything staged for it"""
+        self._hashes.pop(upload_id, None)
+        for suffix in ('.part', '.json'):
+            try:
+                os.remove(self._path(upload_id, suffix))
+            except FileNotFoundError:
+                pass
+
+    def prune(self, max_age):
+        """Discard uploads started more than ``max_age`` seconds ago and return how many there were"""
+        cutoff = time.time() - max_age
+        pruned = 0
+        for name in os.listdir(self.root):
+            upload_id, suffix = os.path.splitext(name)
+            if suffix != '.json':
+                continue
+            try:
+                started_at = self.info(upload_id).get('started_at', 0)
+            except (KeyError, ValueError):
+                continue
+            if started_at < cutoff:
+                self.discard(upload_id)
+                pruned += 1
+        return pruned
@@ -0,0 +1,103 @@
+"""EXPLAIN QUERY PLAN checks that keep hot queries on their indexes.
+
+SQLite reports a table read without an index as ``SCAN <table>`` and a sort
+it cannot take from an index as ``USE TEMP B-TREE FOR ORDER BY``; either one
+on a large table means a query's cost grows with the table. The Flask app
+runs its routes through ``flask check-query-plans``; the desktop client's
+statements live in desktop_sql.py and are checked with
+``python -m query_plans [database]``. tests/test_query_plans.py runs both
+checks against freshly migrated databases.
+"""
+import argparse
+import os
+import re
+import sqlite3
+import sys
+
+import desktop_sql
+
+# Tables that are small by design, so reading them whole is fine
+SMALL_TABLES = {'site_counter', 'recent_activity', 'alembic_version', 'sqlite_master'}
+
+# Statements that read every row on purpose: the browse grid lists every book
+DESKTOP_FULL_READS = {'ALL_BOOKS'}
+
+# Statements that sort rows gathered from one index search per matching row
+# of another table: the author's books, the books with a title, or the two
+# unresolved support query statuses
+DESKTOP_SORTED_QUERIES = {'AUTHOR_DISCUSSIONS', 'BOOK_DISCUSSIONS', 'BOOK_REVIEWS_BY_TITLE', 'OPEN_SUPPORT_QUERIES'}
+
+
+def desktop_queries():
+    """Return (name, sql) for every statement in desktop_sql, the strings bookverse.py executes"""
+    return [(name, value) for name, value in vars(desktop_sql).items()
+            if name.isupper() and isinstance(value, str)]
+
+
+def explain(connection, sql, params=()):
+    """Return the detail lines of SQLite's plan for a statement"""
+    return [row[-1] for row in connection.execute('EXPLAIN QUERY PLAN ' + sql, params)]
+
+
+def find_problems(plan, small_tables=SMALL_TABLES, allow_sort=False, allow_scan=False):
+    """Return the plan lines that read a whole table or sort without an index"""
+    problems = []
+    for detail in plan:
+        if detail.startswith('USE TEMP B-TREE FOR ORDER BY'):
+            if allow_sort:
+                continue
+            problems.append(detail)
+        elif detail.startswith('SCAN ') and not allow_scan and ' USING ' not in detail and 'VIRTUAL TABLE' not in detail:
+            # Eager loads alias tables as <table>_1, <table>_2, ...
+            table = re.sub(r'_\d+$', '', detail.split()[1].strip('"'))
+            # Materialized subqueries and SELECTs without FROM have no table to index
+            if table not in small_tables and table != 'CONSTANT' and not table.startswith('('):
+                problems.append(detail)
+    return problems
+
+
+def check_desktop_queries(connection):
+    """Explain every desktop statement; return {name: problems} for those that scan or sort without an index"""
+    failures = {}
+    for name, sql in desktop_queries():
+        # The plan does not depend on the values, only on how many there are
+        plan = explain(connection, sql, (None,) * sql.count('?'))
+        problems = find_problems(plan, allow_sort=name in DESKTOP_SORTED_QUERIES,
+                                 allow_scan=name in DESKTOP_FULL_READS)
+        if problems:
+            failures[name] = problems
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the desktop database's hot queries for full scans.")
+    parser.add_argument('database', nargs='?', default='bookverse.db')
+    parser.add_argument('--migrate', action='store_true',
+                        help='create missing tables and apply pending schema migrations first')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.database):
+        sys.exit(f'{args.database} does not exist')
+    if args.migrate:
+        # The desktop client sets its schema up when it opens a database
+        from bookverse import Database
+        Database(args.database).conn.close()
+
+    connection = sqlite3.connect(args.database)
+    version = connection.execute('PRAGMA user_version').fetchone()[0]
+    if version < len(desktop_sql.SCHEMA_MIGRATIONS):
+        connection.close()
+        sys.exit(f'{args.database} has {version} of {len(desktop_sql.SCHEMA_MIGRATIONS)} schema migrations; '
+                 'open it in the desktop app or run again with --migrate')
+
+    failures = check_desktop_queries(connection)
+    connection.close()
+    for name, problems in failures.items():
+        print(f'{name}: ' + '; '.join(problems))
+    total = len(desktop_queries())
+    print(f'{total - len(failures)} of {total} queries use indexes')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,376 @@
+"""Route benchmarks for the Flask app, with reports to compare against a baseline.
+
+Each route is requested repeatedly while signed in as a user of the role
+that can see it, recording latency percentiles, SQL queries per request and
+the server's peak resident memory. Routes are requested for the busiest
+subjects: the most reviewed book, the discussion with the most replies, the
+reader with the largest library and the author with the most books.
+
+``flask bench-routes`` benchmarks the configured database through the test
+client. ``python -m route_bench`` generates a synthetic database for each
+dataset size and benchmarks it, through the test client or a local gunicorn
+server. Either one writes a JSON report; given a baseline report, it lists
+the routes that got slower by more than the threshold, or run more queries,
+and exits non-zero if there are any.
+"""
+import argparse
+import http.cookiejar
+import json
+import math
+import os
+import platform
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+import synthetic_data
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Routes requested per role; None is a signed-out visitor
+BENCH_ROUTES = {
+    None: ['/', '/login'],
+    'reader': ['/browse', '/api/books', '/search?q=river', '/book/{book}', '/book/{book}/reviews',
+               '/book/{book}/discussions', '/book/{book}/read', '/book/{book}/pdf', '/book/{book}/page/1',
+               '/discussions', '/discussion/{discussion}', '/library', '/profile'],
+    'author': ['/author/dashboard', '/author/books/status', '/author/reviews', '/author/discussions'],
+    'admin': ['/admin/dashboard', '/admin/reviews', '/admin/discussions'],
+    'tech_support': ['/tech_support/dashboard'],
+}
+
+SUBJECT_QUERIES = {
+    'book': '''SELECT b.id FROM book b LEFT JOIN book_stats s ON s.book_id = b.id
+               ORDER BY COALESCE(s.review_count, 0) DESC, b.id LIMIT 1''',
+    'discussion': 'SELECT id FROM discussion ORDER BY reply_count DESC, id LIMIT 1',
+}
+
+USER_QUERIES = {
+    'reader': '''SELECT u.id, u.email FROM "user" u LEFT JOIN user_library l ON l.user_id = u.id
+                 WHERE u.user_type = 'reader' GROUP BY u.id ORDER BY COUNT(l.id) DESC, u.id LIMIT 1''',
+    'author': '''SELECT u.id, u.email FROM "user" u LEFT JOIN book b ON b.author_id = u.id
+                 WHERE u.user_type = 'author' GROUP BY u.id ORDER BY COUNT(b.id) DESC, u.id LIMIT 1''',
+    'admin': '''SELECT id, email FROM "user" WHERE user_type = 'admin' ORDER BY id LIMIT 1''',
+    'tech_support': '''SELECT id, email FROM "user" WHERE user_type = 'tech_support' ORDER BY id LIMIT 1''',
+}
+
+# Volumes passed to "flask generate-data" for each dataset size
+DATASETS = {
+    'small': {'users': 200, 'books': 50, 'reviews': 2000, 'library': 1000, 'discussions': 100, 'replies': 1000},
+    'medium': {'users': 5000, 'books': 1000, 'reviews': 50000, 'library': 25000, 'discussions': 2000,
+               'replies': 20000},
+    'large': {'users': 100000, 'books': 10000, 'reviews': 1000000, 'library': 500000, 'discussions': 20000,
+              'replies': 400000},
+}
+
+# Latency figures compared against the baseline; p99 of a few dozen requests is mostly noise
+COMPARED_METRICS = ('p50_ms', 'p95_ms')
+MIN_REGRESSION_MS = 2.0  # smaller slowdowns are ignored whatever the threshold
+
+
+def route_key(role, path):
+    return f'{role or "anonymous"} {path}'
+
+
+def find_subjects(execute):
+    """Return the ids routes are formatted with and {role: (user id, email)}.
+
+    ``execute(sql)`` runs a query and returns its rows.
+    """
+    subjects = {}
+    for name, sql in SUBJECT_QUERIES.items():
+        rows = execute(sql)
+        if not rows:
+            raise ValueError(f'The database needs at least one {name}')
+        subjects[name] = rows[0][0]
+    users = {}
+    for role, sql in USER_QUERIES.items():
+        rows = execute(sql)
+        if rows:
+            users[role] = tuple(rows[0])
+    return subjects, users
+
+
+def percentile(sorted_values, percent):
+    """Nearest-rank percentile of an already sorted list"""
+    rank = max(math.ceil(percent / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies, statuses, queries=None):
+    """Summarize one route's timed requests; latencies are in seconds"""
+    latencies = sorted(latency * 1000 for latency in latencies)
+    return {
+        'requests': len(latencies),
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'mean_ms': round(sum(latencies) / len(latencies), 3),
+        'queries': round(sum(queries) / len(queries), 2) if queries else None,
+        'statuses': sorted(set(statuses)),
+    }
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process so far, or None where it cannot be read"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def new_report(mode, requests, warmup, **settings):
+    return {
+        'created_at': datetime.utcnow().isoformat(timespec='seconds'),
+        'environment': {
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+        },
+        'settings': dict(settings, mode=mode, requests=requests, warmup=warmup),
+        'datasets': {},
+    }
+
+
+def compare(report, baseline, threshold=0.2):
+    """Return a description of every regression in ``report`` against ``baseline``.
+
+    Latency regresses when it exceeds the baseline by more than ``threshold``
+    (a fraction) and by at least MIN_REGRESSION_MS; any increase in queries
+    per request is a regression, as is peak memory over the threshold.
+    """
+    if report['settings']['mode'] != baseline['settings']['mode']:
+        raise ValueError(f'Cannot compare a {report["settings"]["mode"]} report with a '
+                         f'{baseline["settings"]["mode"]} baseline')
+    regressions = []
+    for dataset, results in report['datasets'].items():
+        previous_results = baseline['datasets'].get(dataset)
+        if previous_results is None:
+            continue
+        for route, current in results['routes'].items():
+            previous = previous_results['routes'].get(route)
+            if previous is None:
+                continue
+            for metric in COMPARED_METRICS:
+                if (current[metric] > previous[metric] * (1 + threshold)
+                        and current[metric] - previous[metric] >= MIN_REGRESSION_MS):
+                    regressions.append(f'{dataset}: {route} {metric} {previous[metric]:.1f}ms -> '
+                                       f'{current[metric]:.1f}ms')
+            if current['queries'] is not None and previous['queries'] is not None \
+                    and current['queries'] > previous['queries']:
+                regressions.append(f'{dataset}: {route} queries {previous["queries"]:g} -> {current["queries"]:g}')
+
+        current_rss, previous_rss = results.get('peak_rss_mb'), previous_results.get('peak_rss_mb')
+        if current_rss and previous_rss and current_rss > previous_rss * (1 + threshold):
+            regressions.append(f'{dataset}: peak RSS {previous_rss:.0f}MB -> {current_rss:.0f}MB')
+    return regressions
+
+
+def format_results(results):
+    lines = [f'{"route":<44} {"p50":>8} {"p95":>8} {"p99":>8} {"queries":>8}  status']
+    for route, result in results['routes'].items():
+        queries = '-' if result['queries'] is None else f'{result["queries"]:g}'
+        lines.append(f'{route:<44} {result["p50_ms"]:>6.1f}ms {result["p95_ms"]:>6.1f}ms '
+                     f'{result["p99_ms"]:>6.1f}ms {queries:>8}  {",".join(map(str, result["statuses"]))}')
+    if results.get('peak_rss_mb') is not None:
+        lines.append(f'peak RSS {results["peak_rss_mb"]:.0f}MB')
+    return '\n'.join(lines)
+
+
+def write_report(report, path):
+    with open(path, 'w') as report_file:
+        json.dump(report, report_file, indent=2)
+        report_file.write('\n')
+
+
+def load_report(path):
+    with open(path) as report_file:
+        return json.load(report_file)
+
+
+# Benchmarks over HTTP against a local gunicorn server
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    # Report redirects as they are, like the test client, instead of timing the page they lead to
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+def _request(opener, url, data=None):
+    try:
+        with opener.open(url, data) as response:
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as error:
+        error.read()
+        return error.code
+
+
+def bench_server(base_url, subjects, users, requests, warmup):
+    """Time every route over HTTP, signing in with each role's synthetic user password"""
+    routes = {}
+    for role, paths in BENCH_ROUTES.items():
+        if role and role not in users:
+            continue
+        opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect())
+        if role:
+            form = urllib.parse.urlencode({'email': users[role][1], 'password': synthetic_data.PASSWORD})
+            _request(opener, f'{base_url}/login', form.encode())
+        for path in paths:
+            url = base_url + path.format(**subjects)
+            latencies, statuses = [], []
+            for number in range(warmup + requests):
+                started = time.perf_counter()
+                status = _request(opener, url)
+                if number >= warmup:
+                    latencies.append(time.perf_counter() - started)
+                    statuses.append(status)
+            routes[route_key(role, path)] = summarize(latencies, statuses)
+    return routes
+
+
+def _proc_peak_rss_mb(pid):
+    try:
+        with open(f'/proc/{pid}/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def _child_pids(parent):
+    children = []
+    for name in os.listdir('/proc') if os.path.isdir('/proc') else ():
+        if name.isdigit():
+            try:
+                with open(f'/proc/{name}/stat') as stat:
+                    # The parent pid follows the parenthesised command name
+                    if int(stat.read().rsplit(')', 1)[1].split()[1]) == parent:
+                        children.append(int(name))
+            except (OSError, IndexError, ValueError):
+                pass
+    return children
+
+
+def _free_port():
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+
+def run_gunicorn(env, database, workers, requests, warmup):
+    """Benchmark the app under a local gunicorn; peak RSS is the largest worker's"""
+    connection = sqlite3.connect(database)
+    subjects, users = find_subjects(lambda sql: connection.execute(sql).fetchall())
+    connection.close()
+
+    port = _free_port()
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '--workers', str(workers),
+                               '--bind', f'127.0.0.1:{port}', '--log-level', 'warning', 'app:app'],
+                              cwd=APP_DIR, env=env)
+    try:
+        deadline = time.monotonic() + 60
+        while True:
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                break
+            except OSError:
+                if server.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError('gunicorn did not start')
+                time.sleep(0.2)
+        routes = bench_server(f'http://127.0.0.1:{port}', subjects, users, requests, warmup)
+        peaks = [peak for peak in map(_proc_peak_rss_mb, _child_pids(server.pid)) if peak is not None]
+        return {'routes': routes, 'peak_rss_mb': round(max(peaks), 1) if peaks else None}
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def prepare_dataset(name, directory, seed):
+    """Create and fill the dataset's database unless an earlier run left it in ``directory``"""
+    database = os.path.join(directory, 'bench.db')
+    env = dict(os.environ,
+               DATABASE_URL=f'sqlite:///{database}',
+               PDF_STORE_ROOT=os.path.join(directory, 'pdfs'),
+               METRICS_DB=os.path.join(directory, 'metrics.db'),
+               ARTWORK_FOLDER=os.path.join(directory, 'artwork'),
+               AVATAR_CACHE_FOLDER=os.path.join(directory, 'avatars'),
+               PAGE_CACHE_FOLDER=os.path.join(directory, 'pages'))
+    if not os.path.exists(database):
+        flask = [sys.executable, '-m', 'flask', '--app', 'app']
+        volumes = [f'--{option}={value}' for option, value in DATASETS[name].items()]
+        subprocess.run(flask + ['db', 'upgrade'], cwd=APP_DIR, env=env, check=True, capture_output=True)
+        subprocess.run(flask + ['generate-data', f'--seed={seed}'] + volumes, cwd=APP_DIR, env=env, check=True)
+    return database, env
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the web routes on synthetic datasets.')
+    parser.add_argument('--datasets', default='small,medium', help=f'comma-separated, from {", ".join(DATASETS)}')
+    parser.add_argument('--requests', type=int, default=50, help='timed requests per route')
+    parser.add_argument('--warmup', type=int, default=5, help='untimed requests per route first')
+    parser.add_argument('--gunicorn', action='store_true', help='benchmark over HTTP against a local gunicorn')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--data-dir', help='keep the generated databases here and reuse them on later runs')
+    parser.add_argument('--output', default='bench-report.json')
+    parser.add_argument('--baseline', help='report to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed slowdown as a fraction (0.2 = 20%%)')
+    args = parser.parse_args()
+
+    names = args.datasets.split(',')
+    unknown = [name for name in names if name not in DATASETS]
+    if unknown:
+        parser.error(f'unknown datasets: {", ".join(unknown)}')
+
+    mode = 'gunicorn' if args.gunicorn else 'test-client'
+    settings = {'workers': args.workers} if args.gunicorn else {}
+    report = new_report(mode, args.requests, args.warmup, seed=args.seed, **settings)
+    with tempfile.TemporaryDirectory() as scratch:
+        for name in names:
+            directory = os.path.join(args.data_dir or scratch, name)
+            os.makedirs(directory, exist_ok=True)
+            database, env = prepare_dataset(name, directory, args.seed)
+            if args.gunicorn:
+                results = run_gunicorn(env, database, args.workers, args.requests, args.warmup)
+            else:
+                # A process per dataset, so each peak RSS is its own
+                output = os.path.join(scratch, f'{name}.json')
+                subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', 'bench-routes',
+                                f'--requests={args.requests}', f'--warmup={args.warmup}', f'--output={output}'],
+                               cwd=APP_DIR, env=env, check=True, stdout=subprocess.DEVNULL)
+                results = next(iter(load_report(output)['datasets'].values()))
+            results['volumes'] = DATASETS[name]
+            report['datasets'][name] = results
+            print(f'{name} dataset ({mode})')
+            print(format_results(results))
+
+    write_report(report, args.output)
+    print(f'Report written to {args.output}')
+    if args.baseline:
+        regressions = compare(report, load_report(args.baseline), args.threshold)
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        if regressions:
+            sys.exit(1)
+        print(f'No regressions against {args.baseline}')
+
+
+if __name__ == '__main__':
+    main()
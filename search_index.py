@@ -0,0 +1,152 @@
+"""SQLite FTS5 search index over book titles, descriptions and author names.
+
+The index is shared by the Flask app and the desktop client. Both schemas keep
+books and users in separate tables, so the table and key names are passed in
+and the index is kept in sync by triggers on both tables.
+
+The web app creates the index in a migration, so ``index_statements`` yields
+the DDL one statement at a time; the desktop client runs it as one script.
+"""
+import sqlite3
+
+# Private-use characters mark matches so callers can escape the text first
+MATCH_START = '\ue000'
+MATCH_END = '\ue001'
+
+INDEX_DDL = '''
+CREATE VIRTUAL TABLE IF NOT EXISTS book_search USING fts5(
+    title, description, author,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+);
+
+CREATE TRIGGER IF NOT EXISTS book_search_book_insert AFTER INSERT ON {books}
+BEGIN
+    INSERT INTO book_search (rowid, title, description, author)
+    VALUES (new.id, new.title, new.description,
+            (SELECT username FROM {users} WHERE {user_key} = new.{author_key}));
+END;
+
+CREATE TRIGGER IF NOT EXISTS book_search_book_update
+AFTER UPDATE OF id, title, description, {author_key} ON {books}
+BEGIN
+    DELETE FROM book_search WHERE rowid = old.id;
+    INSERT INTO book_search (rowid, title, description, author)
+    VALUES (new.id, new.title, new.description,
+            (SELECT username FROM {users} WHERE {user_key} = new.{author_key}));
+END;
+
+CREATE TRIGGER IF NOT EXISTS book_search_book_delete AFTER DELETE ON {books}
+BEGIN
+    DELETE FROM book_search WHERE rowid = old.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS book_search_user_insert AFTER INSERT ON {users}
+BEGIN
+    UPDATE book_search SET author = new.username
+    WHERE rowid IN (SELECT id FROM {books} WHERE {author_key} = new.{user_key});
+END;
+
+CREATE TRIGGER IF NOT EXISTS book_search_user_update
+AFTER UPDATE OF {user_key}, username ON {users}
+BEGIN
+    UPDATE book_search SET author = NULL
+    WHERE rowid IN (SELECT id FROM {books} WHERE {author_key} = old.{user_key});
+    UPDATE book_search SET author = new.username
+    WHERE rowid IN (SELECT id FROM {books} WHERE {author_key} = new.{user_key});
+END;
+
+CREATE TRIGGER IF NOT EXISTS book_search_user_delete AFTER DELETE ON {users}
+BEGIN
+    UPDATE book_search SET author = NULL
+    WHERE rowid IN (SELECT id FROM {books} WHERE {author_key} = old.{user_key});
+END;
+'''
+
+REBUILD_SQL = '''
+INSERT INTO book_search (rowid, title, description, author)
+SELECT b.id, b.title, b.description, u.username
+FROM {books} b
+LEFT JOIN {users} u ON u.{user_key} = b.{author_key}
+'''
+
+SEARCH_SQL = '''
+SELECT rowid,
+       highlight(book_search, 0, ?, ?),
+       snippet(book_search, 1, ?, ?, '...', 24),
+       highlight(book_search, 2, ?, ?),
+       bm25(book_search, 10.0, 1.0, 5.0) AS rank
+FROM book_search
+WHERE book_search MATCH ?
+ORDER BY rank
+LIMIT ? OFFSET ?
+'''
+
+
+def split_statements(script):
+    """Split an SQL script into statements, keeping trigger bodies whole"""
+    statements = []
+    statement = ''
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            statements.append(statement.strip())
+            statement = ''
+    return statements
+
+
+def index_statements(books, users, author_key, user_key):
+    """Return the statements that create the index and its triggers, then fill it from scratch"""
+    names = dict(books=books, users=users, author_key=author_key, user_key=user_key)
+    return [*split_statements(INDEX_DDL.format(**names)), 'DELETE FROM book_search', REBUILD_SQL.format(**names).strip()]
+
+
+def create_search_index(connection, books, users, author_key, user_key):
+    """Create the index and its triggers, populating it if it is new.
+
+    ``connection`` is a sqlite3 connection; ``books``/``users`` are the (quoted)
+    table names and ``author_key``/``user_key`` the columns joining them.
+    """
+    names = dict(books=books, users=users, author_key=author_key, user_key=user_key)
+    connection.executescript(INDEX_DDL.format(**names))
+
+    indexed = connection.execute('SELECT COUNT(*) FROM book_search').fetchone()[0]
+    if not indexed:
+        rebuild_search_index(connection, books, users, author_key, user_key)
+
+
+def rebuild_search_index(connection, books, users, author_key, user_key):
+    """Repopulate the index from scratch"""
+    names = dict(books=books, users=users, author_key=author_key, user_key=user_key)
+    connection.execute('DELETE FROM book_search')
+    connection.execute(REBUILD_SQL.format(**names))
+    connection.commit()
+
+
+def build_match_query(text):
+    """Turn free text into an FTS5 query matching every word as a prefix.
+
+    Each word is quoted so punctuation and FTS5 operators typed by users are
+    treated as plain text.
+    """
+    terms = []
+    for word in text.split():
+        word = word.replace('"', '""')
+        terms.append(f'"{word}"*')
+    return ' '.join(terms)
+
+
+def search_books(connection, text, limit=20, offset=0,
+                 start_mark=MATCH_START, end_mark=MATCH_END):
+    """Return ranked matches as (book_id, title, snippet, author) tuples.
+
+    Matched words in the returned text are wrapped in ``start_mark`` and
+    ``end_mark``; results are ordered by BM25 with title hits weighted highest.
+    """
+    query = build_match_query(text)
+    if not query:
+        return []
+
+    marks = (start_mark, end_mark) * 3
+    rows = connection.execute(SEARCH_SQL, (*marks, query, limit, offset)).fetchall()
+    return [(book_id, title, snippet, author) for book_id, title, snippet, author, _rank in rows]
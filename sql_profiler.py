@@ -0,0 +1,166 @@
+"""Per-request SQL profiling with an N+1 query detector.
+
+SQLAlchemy cursor events count every statement a request runs and time it;
+statements are grouped by fingerprint (the SQL with literals and IN lists
+collapsed) so a loop issuing the same query per row shows up as one
+fingerprint with a high count. A request that runs more statements than the
+budget, or repeats one fingerprint too often, is flagged as an N+1 suspect.
+
+The last ``capacity`` request profiles are kept in memory per process. The
+time spent in the profiler's own hooks is recorded with each profile, so its
+overhead can be read off the profiles themselves. While profiling is
+disabled the cursor events are not listened to at all, so it costs nothing.
+"""
+import collections
+import re
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import event
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r'\bIN\s*\((?:\s*\?\s*,)*\s*\?\s*\)', re.IGNORECASE)
+_SPACE = re.compile(r'\s+')
+
+
+def fingerprint(statement):
+    """Return ``statement`` with literals, IN lists and whitespace normalized"""
+    statement = _LITERALS.sub('?', statement)
+    statement = _IN_LISTS.sub('IN (...)', statement)
+    return _SPACE.sub(' ', statement).strip()
+
+
+class SQLProfiler:
+    """Collects per-request SQL statistics from one or more engines"""
+    def __init__(self, capacity=100, max_queries=30, max_repeats=5, max_sql_time=0.5, enabled=False):
+        self.max_queries = max_queries
+        self.max_repeats = max_repeats
+        self.max_sql_time = max_sql_time
+        self.profiles = collections.deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._next_id = 1
+        self._engines = []
+        self._enabled = enabled
+
+    def install(self, engine):
+        """Profile the statements run on ``engine`` whenever profiling is enabled"""
+        self._engines.append(engine)
+        if self._enabled:
+            self._listen(engine)
+
+    def _listen(self, engine):
+        event.listen(engine, 'before_cursor_execute', self._before_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_execute)
+
+    def _ignore(self, engine):
+        event.remove(engine, 'before_cursor_execute', self._before_execute)
+        event.remove(engine, 'after_cursor_execute', self._after_execute)
+
+    @property
+    def enabled(self):
+        return self._enabled
+
+    @enabled.setter
+    def enabled(self, enabled):
+        """Hook or unhook the cursor events of every installed engine"""
+        with self._lock:
+            if enabled == self._enabled:
+                return
+            self._enabled = enabled
+            for engine in self._engines:
+                if enabled:
+                    self._listen(engine)
+                else:
+                    self._ignore(engine)
+
+    def _before_execute(self, connection, cursor, statement, parameters, context, executemany):
+        profile = getattr(self._local, 'profile', None)
+        if profile is not None:
+            profile['query_started'] = time.perf_counter()
+
+    def _after_execute(self, connection, cursor, statement, parameters, context, executemany):
+        profile = getattr(self._local, 'profile', None)
+        if profile is None or profile['query_started'] is None:
+            return
+        finished = time.perf_counter()
+        elapsed = finished - profile['query_started']
+        profile['query_started'] = None
+
+        entry = profile['statements'].get(statement)
+        if entry is None:
+            entry = profile['statements'][statement] = [0, 0.0]
+        entry[0] += 1
+        entry[1] += elapsed
+        profile['sql_time'] += elapsed
+        profile['overhead'] += time.perf_counter() - finished
+
+    def start(self, method, path):
+        """Begin profiling the current thread's request"""
+        if not self.enabled:
+            self._local.profile = None
+            return
+        started = time.perf_counter()
+        self._local.profile = {
+            'method': method, 'path': path, 'started': started, 'started_at': datetime.utcnow(),
+            'statements': {}, 'sql_time': 0.0, 'query_started': None, 'overhead': 0.0,
+        }
+        self._local.profile['overhead'] = time.perf_counter() - started
+
+    def finish(self, endpoint=None, status=None):
+        """Stop profiling the current thread's request and store its profile"""
+        profile = getattr(self._local, 'profile', None)
+        self._local.profile = None
+        if profile is None:
+            return None
+        finished = time.perf_counter()
+
+        # Statements differing only in literals or IN list length are the same query
+        grouped = {}
+        for statement, (count, elapsed) in profile['statements'].items():
+            key = fingerprint(statement)
+            entry = grouped.setdefault(key, {'fingerprint': key, 'count': 0, 'time_ms': 0.0})
+            entry['count'] += count
+            entry['time_ms'] += elapsed * 1000
+        statements = sorted(grouped.values(), key=lambda entry: (-entry['count'], -entry['time_ms']))
+
+        query_count = sum(entry['count'] for entry in statements)
+        reasons = []
+        if query_count > self.max_queries:
+            reasons.append(f'{query_count} queries (budget {self.max_queries})')
+        for entry in statements:
+            if entry['count'] > self.max_repeats:
+                reasons.append(f'statement repeated {entry["count"]} times (budget {self.max_repeats})')
+                break
+        if profile['sql_time'] > self.max_sql_time:
+            reasons.append(f'{profile["sql_time"] * 1000:.0f}ms in SQL (budget {self.max_sql_time * 1000:.0f}ms)')
+
+        record = {
+            'method': profile['method'],
+            'path': profile['path'],
+            'endpoint': endpoint,
+            'status': status,
+            'started_at': profile['started_at'].isoformat(timespec='seconds'),
+            'duration_ms': round((finished - profile['started']) * 1000, 2),
+            'query_count': query_count,
+            'sql_ms': round(profile['sql_time'] * 1000, 2),
+            'suspect': bool(reasons),
+            'reasons': reasons,
+            'statements': [dict(entry, time_ms=round(entry['time_ms'], 2)) for entry in statements],
+        }
+        record['overhead_ms'] = round((profile['overhead'] + time.perf_counter() - finished) * 1000, 3)
+        with self._lock:
+            record['id'] = self._next_id
+            self._next_id += 1
+            self.profiles.append(record)
+        return record
+
+    def snapshot(self):
+        """Return the stored profiles, newest first"""
+        with self._lock:
+            return list(reversed(self.profiles))
+
+    def clear(self):
+        with self._lock:
+            self.profiles.clear()
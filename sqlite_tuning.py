@@ -0,0 +1,201 @@
+"""SQLite settings for serving the app from several gunicorn workers at once.
+
+In the default rollback-journal mode a writer locks the whole database file,
+so a review being saved or a PDF's pages being written stalls every reader
+in the other workers and long writes end in ``database is locked``. WAL lets
+readers keep reading the last committed state while one writer appends, and
+the other pragmas trade a little durability on power loss (synchronous
+NORMAL) and some memory for fewer syscalls and disk reads.
+
+Every pragma except journal_mode applies only to the connection that sets
+it, so ``configure_engine`` sets them on each new pooled connection.
+
+Run ``python -m sqlite_tuning`` to compare read throughput while uploads
+are written, with and without these settings.
+"""
+import argparse
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import time
+
+from sqlalchemy import event
+
+PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,  # milliseconds a connection waits for a lock before failing
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64000,  # negative values are KiB, so 64MB per connection
+    'temp_store': 'MEMORY',
+}
+
+# SQLite's own defaults, used as the benchmark baseline
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'DELETE',
+    'synchronous': 'FULL',
+    'busy_timeout': 5000,
+    'mmap_size': 0,
+    'cache_size': -2000,
+    'temp_store': 'DEFAULT',
+}
+
+
+def apply_pragmas(connection, pragmas):
+    """Set each pragma on a DB-API connection"""
+    cursor = connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+    finally:
+        cursor.close()
+
+
+def engine_options(database_uri, pool_size=5, max_overflow=10):
+    """Return SQLALCHEMY_ENGINE_OPTIONS suited to the database in ``database_uri``.
+
+    Each gunicorn worker has its own pool, so ``pool_size`` only needs to
+    cover the threads of one worker.
+    """
+    if database_uri.startswith('sqlite'):
+        if database_uri in ('sqlite://', 'sqlite:///:memory:'):
+            # SQLAlchemy keeps in-memory databases on a single shared connection
+            return {}
+        return {'pool_size': pool_size, 'max_overflow': max_overflow, 'pool_timeout': 30}
+    # Server databases drop idle connections, so check and recycle them
+    return {'pool_size': pool_size, 'max_overflow': max_overflow,
+            'pool_pre_ping': True, 'pool_recycle': 1800}
+
+
+def configure_engine(engine, pragmas=PRAGMAS):
+    """Apply ``pragmas`` to every connection ``engine`` opens to an SQLite file"""
+    if engine.dialect.name != 'sqlite' or engine.url.database in (None, '', ':memory:'):
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        apply_pragmas(dbapi_connection, pragmas)
+
+
+# Benchmark
+
+BENCH_SCHEMA = '''
+CREATE TABLE book (id INTEGER PRIMARY KEY, title TEXT, description TEXT, created_at REAL);
+CREATE INDEX ix_book_created_at ON book (created_at);
+CREATE TABLE review (id INTEGER PRIMARY KEY, book_id INTEGER, rating INTEGER, comment TEXT);
+CREATE INDEX ix_review_book_id ON review (book_id);
+CREATE TABLE upload (id INTEGER PRIMARY KEY, book_id INTEGER, data BLOB);
+'''
+
+BENCH_READ = '''
+SELECT b.id, b.title, COUNT(r.id), AVG(r.rating)
+FROM (SELECT * FROM book ORDER BY created_at DESC LIMIT 24 OFFSET ?) b
+LEFT JOIN review r ON r.book_id = b.id
+GROUP BY b.id
+'''
+
+
+def create_bench_database(path, pragmas, books=2000):
+    connection = sqlite3.connect(path)
+    apply_pragmas(connection, pragmas)
+    connection.executescript(BENCH_SCHEMA)
+    connection.executemany('INSERT INTO book (id, title, description, created_at) VALUES (?, ?, ?, ?)',
+                           ((i, f'Book {i}', 'x' * 500, i) for i in range(books)))
+    connection.executemany('INSERT INTO review (book_id, rating, comment) VALUES (?, ?, ?)',
+                           ((i % books, i % 5 + 1, 'y' * 200) for i in range(books * 5)))
+    connection.commit()
+    connection.close()
+
+
+def bench_reader(path, pragmas, seconds, results):
+    """Run the browse query in a loop, recording each read's latency"""
+    connection = sqlite3.connect(path, timeout=pragmas['busy_timeout'] / 1000)
+    apply_pragmas(connection, pragmas)
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + seconds
+    offset = 0
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            connection.execute(BENCH_READ, (offset,)).fetchall()
+            latencies.append(time.perf_counter() - started)
+        except sqlite3.OperationalError:
+            errors += 1
+        offset = (offset + 24) % 1000
+    connection.close()
+    results.put((latencies, errors))
+
+
+def bench_uploader(path, pragmas, blob_size, stop):
+    """Write upload-sized blobs plus a burst of small rows per transaction until stopped"""
+    connection = sqlite3.connect(path, timeout=pragmas['busy_timeout'] / 1000)
+    apply_pragmas(connection, pragmas)
+    blob = os.urandom(blob_size)
+    while not stop.is_set():
+        try:
+            with connection:
+                connection.execute('INSERT INTO upload (book_id, data) VALUES (1, ?)', (blob,))
+                connection.executemany('INSERT INTO review (book_id, rating, comment) VALUES (?, ?, ?)',
+                                       ((i, 5, 'z' * 200) for i in range(500)))
+            connection.execute('DELETE FROM upload')
+            connection.commit()
+        except sqlite3.OperationalError:
+            pass
+    connection.close()
+
+
+def run_readers(path, pragmas, readers, seconds, uploaders=0, blob_size=0):
+    """Return (reads per second, 99th percentile latency, errors) for one run"""
+    results = multiprocessing.Queue()
+    stop = multiprocessing.Event()
+    writers = [multiprocessing.Process(target=bench_uploader, args=(path, pragmas, blob_size, stop))
+               for _ in range(uploaders)]
+    for writer in writers:
+        writer.start()
+    processes = [multiprocessing.Process(target=bench_reader, args=(path, pragmas, seconds, results))
+                 for _ in range(readers)]
+    for process in processes:
+        process.start()
+
+    latencies, errors = [], 0
+    for _ in processes:
+        reader_latencies, reader_errors = results.get()
+        latencies.extend(reader_latencies)
+        errors += reader_errors
+    for process in processes:
+        process.join()
+    stop.set()
+    for writer in writers:
+        writer.join()
+
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99)] if latencies else float('inf')
+    return len(latencies) / seconds, p99, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark SQLite read throughput while uploads are written.')
+    parser.add_argument('--readers', type=int, default=4, help='reader processes (like gunicorn workers)')
+    parser.add_argument('--uploaders', type=int, default=1, help='processes writing uploads')
+    parser.add_argument('--seconds', type=float, default=5.0, help='length of each run')
+    parser.add_argument('--blob-mb', type=float, default=8.0, help='size of each uploaded file in MB')
+    args = parser.parse_args()
+
+    print(f'{args.readers} readers, {args.uploaders} uploaders writing {args.blob_mb:g}MB files, '
+          f'{args.seconds:g}s per run')
+    print(f'{"settings":<10} {"idle reads/s":>13} {"busy reads/s":>13} {"held":>6} '
+          f'{"idle p99":>9} {"busy p99":>9} {"errors":>7}')
+    with tempfile.TemporaryDirectory() as directory:
+        for label, pragmas in (('default', DEFAULT_PRAGMAS), ('tuned', PRAGMAS)):
+            path = os.path.join(directory, f'{label}.db')
+            create_bench_database(path, pragmas)
+            idle, idle_p99, idle_errors = run_readers(path, pragmas, args.readers, args.seconds)
+            busy, busy_p99, busy_errors = run_readers(path, pragmas, args.readers, args.seconds,
+                                                      args.uploaders, int(args.blob_mb * 1024 * 1024))
+            print(f'{label:<10} {idle:>13.0f} {busy:>13.0f} {busy / idle:>6.0%} '
+                  f'{idle_p99 * 1000:>7.1f}ms {busy_p99 * 1000:>7.1f}ms {idle_errors + busy_errors:>7}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+// Sends the PDF of a book form in chunks so large files survive dropped
+// connections. Forms opt in with data-chunked-upload="<start url>"; without
+// JavaScript (or without a file selected) the form is submitted as usual.
+(function() {
+    const MAX_RETRIES = 5;
+
+    function resumeKey(file) {
+        return 'bookverse-upload:' + [file.name, file.size, file.lastModified].join(':');
+    }
+
+    async function request(url, options) {
+        const response = await fetch(url, Object.assign({credentials: 'same-origin'}, options));
+        const body = response.status === 204 ? {} : await response.json();
+        return {response, body};
+    }
+
+    async function startOrResume(form, file) {
+        const key = resumeKey(file);
+        const saved = JSON.parse(localStorage.getItem(key) || 'null');
+        if (saved) {
+            const {response, body} = await request(saved.url);
+            if (response.ok) {
+                return Object.assign(saved, {offset: body.offset});
+            }
+            localStorage.removeItem(key);
+        }
+
+        const payload = {filename: file.name, size: file.size};
+        if (form.dataset.bookId) {
+            payload.book_id = parseInt(form.dataset.bookId, 10);
+        }
+        const {response, body} = await request(form.dataset.chunkedUpload, {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify(payload)
+        });
+        if (!response.ok) {
+            throw new Error(body.error || 'Could not start the upload');
+        }
+        const upload = {id: body.upload_id, url: body.url, chunkSize: body.chunk_size, offset: 0};
+        localStorage.setItem(key, JSON.stringify(upload));
+        return upload;
+    }
+
+    async function sendChunks(upload, file, onProgress) {
+        let retries = 0;
+        while (upload.offset < file.size) {
+            const chunk = file.slice(upload.offset, upload.offset + upload.chunkSize);
+            try {
+                const {response, body} = await request(upload.url + '?offset=' + upload.offset, {
+                    method: 'PUT',
+                    body: chunk
+                });
+                if (!response.ok && body.offset === undefined) {
+                    throw new Error(body.error || 'Upload failed');
+                }
+                // A 409 carries the server's offset, so either way continue from there
+                upload.offset = body.offset;
+                retries = 0;
+            } catch (error) {
+                if (++retries > MAX_RETRIES) {
+                    throw error;
+                }
+                await new Promise(resolve => setTimeout(resolve, 1000 * retries));
+                const {response, body} = await request(upload.url);
+                if (response.ok) {
+                    upload.offset = body.offset;
+                }
+            }
+            onProgress(upload.offset / file.size);
+        }
+    }
+
+    function showProgress(form) {
+        let bar = form.querySelector('.chunked-upload-progress');
+        if (!bar) {
+            bar = document.createElement('div');
+            bar.className = 'progress mb-3 chunked-upload-progress';
+            bar.innerHTML = '<div class="progress-bar" role="progressbar" style="width: 0%">0%</div>';
+            form.querySelector('input[type=file]').closest('.mb-3, .mb-4').appendChild(bar);
+        }
+        return function(fraction) {
+            const percent = Math.floor(fraction * 100) + '%';
+            bar.firstElementChild.style.width = percent;
+            bar.firstElementChild.textContent = percent;
+        };
+    }
+
+    async function submitChunked(form, file) {
+        const button = form.querySelector('button[type=submit]');
+        button.disabled = true;
+        try {
+            const upload = await startOrResume(form, file);
+            await sendChunks(upload, file, showProgress(form));
+
+            // The file itself has already been sent; finalize only needs the other fields
+            const fields = new FormData(form);
+            fields.delete(form.querySelector('input[type=file]').name);
+            const {response, body} = await request(upload.url + '/finalize', {
+                method: 'POST',
+                body: fields
+            });
+            if (!response.ok) {
+                throw new Error(body.error || 'Could not save the book');
+            }
+            localStorage.removeItem(resumeKey(file));
+            window.location = body.redirect;
+        } catch (error) {
+            alert(error.message + '. Submit the form again to resume the upload.');
+            button.disabled = false;
+        }
+    }
+
+    document.addEventListener('DOMContentLoaded', function() {
+        if (!window.fetch || !window.localStorage || !window.Blob || !Blob.prototype.slice) {
+            return;
+        }
+        document.querySelectorAll('form[data-chunked-upload]').forEach(form => {
+            form.addEventListener('submit', function(event) {
+                const file = form.querySelector('input[type=file]').files[0];
+                if (!file) {
+                    return;
+                }
+                event.preventDefault();
+                submitChunked(form, file);
+            });
+        });
+    });
+})();
@@ -0,0 +1,451 @@
+"""Deterministic synthetic data for scale testing either BookVerse schema.
+
+Users, books (with real multi-page PDFs), reviews, library entries,
+discussions and replies are generated from a seed, so the same options
+always produce the same rows. Popularity is skewed the way real catalogues
+are: a few books collect most reviews, readers and discussions, and a few
+discussions collect most replies, following Zipf-like weights.
+
+Rows are written with ``executemany`` in large transactions while the
+loaded tables' secondary indexes are dropped; the indexes are rebuilt once
+at the end, which is far cheaper than maintaining them row by row.
+
+The Flask app's database is filled with ``flask generate-data``; run
+``python -m synthetic_data [database]`` for the desktop database.
+"""
+import argparse
+import contextlib
+import hashlib
+import io
+import itertools
+import random
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta
+
+WORDS = '''
+time light river stone night garden letter winter road silver memory island
+city fire shadow voice promise storm house forest ocean journey secret dream
+morning glass iron summer field harbor mountain song window bridge paper star
+crown wolf mirror lantern orchard tide valley thunder feather compass ember
+'''.split()
+
+REVIEW_WORDS = '''
+loved enjoyed slow gripping beautiful confusing brilliant predictable moving
+characters plot ending pacing prose chapters twist writing world dialogue
+recommend again favorite expected better worse first last great boring
+'''.split()
+
+# Percent of reviews given each star rating, 1 to 5
+RATING_WEIGHTS = (5, 8, 17, 35, 35)
+RATINGS = [rating for rating, weight in zip(range(1, 6), RATING_WEIGHTS) for _ in range(weight)]
+
+# Comments and replies are drawn from this many generated texts; building a
+# fresh one per row would dominate the run time at millions of rows
+PHRASE_POOL = 4096
+
+# Zipf exponents: higher is more skewed
+BOOK_SKEW = 1.0
+USER_SKEW = 0.6
+DISCUSSION_SKEW = 1.1
+
+# Every generated user signs in with this password
+PASSWORD = 'password'
+
+# The first users generated get these roles, so every role has an account to sign in as
+STAFF_ROLES = ('admin', 'tech_support')
+
+TABLES = {
+    'web': {
+        'users': 'user', 'books': 'book', 'reviews': 'review', 'library': 'user_library',
+        'discussions': 'discussion', 'replies': 'discussion_reply',
+    },
+    'desktop': {
+        'users': 'users', 'books': 'books', 'reviews': 'reviews', 'library': 'user_library',
+        'discussions': 'discussions', 'replies': 'discussion_replies',
+    },
+}
+
+
+def password_hash(schema):
+    """Hash PASSWORD once in the format each schema stores; every generated user shares it"""
+    salt = hashlib.sha256(f'synthetic-{schema}'.encode()).digest()
+    if schema == 'web':
+        # Werkzeug's "method$salt$hash" layout, which check_password_hash reads
+        salt = salt.hex()[:16].encode()
+        key = hashlib.pbkdf2_hmac('sha256', PASSWORD.encode('utf-8'), salt, 100000)
+        return f'pbkdf2:sha256:100000${salt.decode()}${key.hex()}'
+    # Database.hash_password's layout: the 32-byte salt followed by the key
+    return salt + hashlib.pbkdf2_hmac('sha256', PASSWORD.encode('utf-8'), salt, 100000)
+
+
+def _pdf_string(text):
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def make_pdf(pages):
+    """Return the bytes of a PDF with one page per list of text lines in ``pages``"""
+    objects = [None, None, b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>']
+    page_numbers = []
+    for lines in pages:
+        text = ' T* '.join(f'({_pdf_string(line)}) Tj' for line in lines)
+        stream = f'BT /F1 12 Tf 72 720 Td 16 TL {text} ET'.encode('latin-1', 'replace')
+        objects.append(b'<< /Length %d >>\nstream\n%s\nendstream' % (len(stream), stream))
+        objects.append(b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] '
+                       b'/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>' % len(objects))
+        page_numbers.append(len(objects))
+    objects[0] = b'<< /Type /Catalog /Pages 2 0 R >>'
+    kids = b' '.join(b'%d 0 R' % number for number in page_numbers)
+    objects[1] = b'<< /Type /Pages /Kids [%s] /Count %d >>' % (kids, len(page_numbers))
+
+    output = io.BytesIO()
+    output.write(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(output.tell())
+        output.write(b'%d 0 obj\n%s\nendobj\n' % (number, body))
+    xref = output.tell()
+    output.write(b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1))
+    for offset in offsets:
+        output.write(b'%010d 00000 n \n' % offset)
+    output.write(b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref))
+    return output.getvalue()
+
+
+def zipf_weights(count, skew):
+    """Cumulative Zipf weights for ranks 1..count, for random.choices"""
+    return list(itertools.accumulate(1 / rank ** skew for rank in range(1, count + 1)))
+
+
+def allocate(total, count, skew, cap, rng):
+    """Split ``total`` over ``count`` owners with Zipf-skewed shares, none above ``cap``.
+
+    Returns one amount per owner, with the large shares at seeded random
+    positions; the amounts add up to ``min(total, count * cap)``.
+    """
+    weights = [1 / rank ** skew for rank in range(1, count + 1)]
+    scale = total / sum(weights)
+    amounts = []
+    carry = 0.0
+    for weight in weights:
+        # What a capped owner could not take is carried to the next one
+        share = weight * scale + carry
+        amount = min(int(share), cap)
+        carry = share - amount
+        amounts.append(amount)
+    leftover = min(total, count * cap) - sum(amounts)
+    for position in range(count):
+        if leftover <= 0:
+            break
+        extra = min(cap - amounts[position], leftover)
+        amounts[position] += extra
+        leftover -= extra
+    rng.shuffle(amounts)
+    return amounts
+
+
+class DatasetGenerator:
+    """Appends generated rows to one database in either the 'web' or 'desktop' schema"""
+    def __init__(self, connection, schema, seed=0, batch_size=50000, progress=None, now=None):
+        if schema not in TABLES:
+            raise ValueError(f'Unknown schema {schema!r}')
+        self.connection = connection
+        self.schema = schema
+        self.tables = TABLES[schema]
+        self.seed = seed
+        self.batch_size = batch_size
+        self.progress = progress or (lambda table, rows, seconds: None)
+        self.now = now or datetime(2025, 1, 1)
+        self.start = self.now - timedelta(days=3 * 365)
+        self.user_keys = []
+        self.author_keys = []
+        self.book_ids = []
+        self.book_times = []
+        self.discussion_ids = []
+        self.discussion_times = []
+        self.password = password_hash(schema)
+
+    def rng(self, section):
+        # One stream per section, so changing one volume does not reshuffle the others
+        return random.Random(f'{self.seed}-{section}')
+
+    def timestamp(self, moment):
+        if self.schema == 'web':
+            return moment.isoformat(' ', 'microseconds')
+        return moment.isoformat(' ', 'seconds')
+
+    def phrases(self, rng, words, shortest, longest, ending='.'):
+        """Return a pool of PHRASE_POOL texts of ``shortest`` to ``longest`` words"""
+        return [' '.join(rng.choices(words, k=rng.randint(shortest, longest))).capitalize() + ending
+                for _ in range(PHRASE_POOL)]
+
+    def moment_after(self, rng, earliest):
+        return earliest + (self.now - earliest) * rng.random()
+
+    def next_id(self, table, column='id'):
+        return (self.connection.execute(f'SELECT MAX({column}) FROM "{table}"').fetchone()[0] or 0) + 1
+
+    def insert(self, section, sql, rows):
+        """Write rows in batches, committing after each, and report the total"""
+        started = time.perf_counter()
+        count = 0
+        rows = iter(rows)
+        while True:
+            batch = list(itertools.islice(rows, self.batch_size))
+            if not batch:
+                break
+            self.connection.executemany(sql, batch)
+            self.connection.commit()
+            count += len(batch)
+        self.progress(self.tables[section], count, time.perf_counter() - started)
+        return count
+
+    @contextlib.contextmanager
+    def bulk_load(self):
+        """Drop the loaded tables' indexes for the duration of the load, then rebuild them"""
+        names = ', '.join('?' * len(self.tables))
+        indexes = self.connection.execute(
+            f"SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL "
+            f"AND tbl_name IN ({names})", tuple(self.tables.values())).fetchall()
+        # A crash mid-load means regenerating anyway, so skip the fsyncs
+        synchronous = self.connection.execute('PRAGMA synchronous').fetchone()[0]
+        self.connection.execute('PRAGMA synchronous = OFF')
+        for name, _sql in indexes:
+            self.connection.execute(f'DROP INDEX "{name}"')
+        self.connection.commit()
+        try:
+            yield
+        finally:
+            started = time.perf_counter()
+            for _name, sql in indexes:
+                self.connection.execute(sql)
+            self.connection.commit()
+            self.connection.execute(f'PRAGMA synchronous = {synchronous}')
+            self.progress('indexes', len(indexes), time.perf_counter() - started)
+
+    def users(self, count, author_share=0.1):
+        rng = self.rng('users')
+        first = self.next_id('user') if self.schema == 'web' else self.next_id('users', 'rowid')
+        authors_every = max(1, round(1 / author_share)) if author_share else 0
+
+        def rows():
+            for number in range(first, first + count):
+                is_staff = number - first < len(STAFF_ROLES)
+                is_author = not is_staff and authors_every and number % authors_every == 0
+                user_type = STAFF_ROLES[number - first] if is_staff else 'author' if is_author else 'reader'
+                email = f'user{number}@synthetic.bookverse'
+                joined = self.timestamp(self.start + (self.now - self.start) * rng.random())
+                key = number if self.schema == 'web' else email
+                self.user_keys.append(key)
+                if is_author:
+                    self.author_keys.append(key)
+                if self.schema == 'web':
+                    yield (number, email, f'user{number}', self.password, f'Synthetic User {number}', user_type, joined)
+                else:
+                    yield (email, f'user{number}', self.password, f'Synthetic User {number}', user_type, joined)
+
+        if self.schema == 'web':
+            sql = ('INSERT INTO "user" (id, email, username, password_hash, full_name, user_type, created_at) '
+                   'VALUES (?, ?, ?, ?, ?, ?, ?)')
+        else:
+            sql = ('INSERT INTO users (email, username, password, full_name, user_type, created_at) '
+                   'VALUES (?, ?, ?, ?, ?, ?)')
+        return self.insert('users', sql, rows())
+
+    def books(self, count, max_pages=8, store_pdf=None):
+        """Generate books; ``store_pdf(data)`` returns (sha256, size) for the web schema's PDF store"""
+        if not self.author_keys:
+            raise ValueError('Generate users with at least one author before books')
+        rng = self.rng('books')
+        authors = self.author_keys
+        author_weights = zipf_weights(len(authors), USER_SKEW)
+        first = self.next_id(self.tables['books'])
+        span = self.now - self.start
+
+        def rows():
+            for offset, book_id in enumerate(range(first, first + count)):
+                title = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(2, 4))).title()
+                description = ' '.join(rng.choices(WORDS, k=rng.randint(15, 40))).capitalize() + '.'
+                author = rng.choices(authors, cum_weights=author_weights)[0]
+                # Ids increase with upload time, as they do in real use
+                created = self.start + span * ((offset + rng.random()) / count)
+                pages = [[f'{title} - page {page}'] +
+                         [' '.join(rng.choices(WORDS, k=10)) for _ in range(rng.randint(8, 20))]
+                         for page in range(1, rng.randint(1, max_pages) + 1)]
+                pdf = make_pdf(pages)
+                amazon_link = f'https://amazon.com/dp/SYN{book_id:07d}'
+                self.book_ids.append(book_id)
+                self.book_times.append(created)
+                if self.schema == 'web':
+                    sha256, size = store_pdf(pdf)
+                    stamp = self.timestamp(created)
+                    yield (book_id, title, description, author, sha256, size, 'application/pdf', stamp, stamp,
+                           amazon_link)
+                else:
+                    yield (book_id, title, description, author, amazon_link, pdf, self.timestamp(created))
+
+        if self.schema == 'web':
+            sql = ('INSERT INTO book (id, title, description, author_id, pdf_sha256, pdf_size, pdf_mimetype, '
+                   'pdf_updated_at, created_at, amazon_link) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)')
+        else:
+            sql = ('INSERT INTO books (id, title, description, author_email, amazon_link, pdf_data, upload_date) '
+                   'VALUES (?, ?, ?, ?, ?, ?, ?)')
+        return self.insert('books', sql, rows())
+
+    def _distinct_pairs(self, section, total):
+        """Yield (rng, user, book index) with each user and book paired at most once.
+
+        Some users are far more active than others, and their books lean
+        towards the popular ones.
+        """
+        rng = self.rng(section)
+        book_count = len(self.book_ids)
+        ranks = list(range(book_count))
+        rng.shuffle(ranks)  # popularity rank -> book index, so popular books are not just the oldest
+        book_weights = zipf_weights(book_count, BOOK_SKEW)
+        amounts = allocate(total, len(self.user_keys), USER_SKEW, book_count, rng)
+        for user, wanted in zip(self.user_keys, amounts):
+            if not wanted:
+                continue
+            if wanted > book_count // 2:
+                # Rejection sampling from the skewed weights would mostly draw repeats
+                chosen = rng.sample(range(book_count), wanted)
+            else:
+                seen = set()
+                chosen = []
+                while len(chosen) < wanted:
+                    for index in rng.choices(ranks, cum_weights=book_weights, k=(wanted - len(chosen)) * 2):
+                        if index not in seen:
+                            seen.add(index)
+                            chosen.append(index)
+                            if len(chosen) == wanted:
+                                break
+            for index in chosen:
+                yield rng, user, index
+
+    def reviews(self, count):
+        comments = self.phrases(self.rng('review-comments'), REVIEW_WORDS, 4, 25)
+
+        def rows():
+            for rng, user, index in self._distinct_pairs('reviews', count):
+                yield (self.book_ids[index], user, rng.choice(RATINGS), rng.choice(comments),
+                       self.timestamp(self.moment_after(rng, self.book_times[index])))
+
+        columns = ('book_id, user_id, rating, comment, created_at' if self.schema == 'web'
+                   else 'book_id, user_email, rating, comment, review_date')
+        return self.insert('reviews', f'INSERT INTO {self.tables["reviews"]} ({columns}) VALUES (?, ?, ?, ?, ?)',
+                           rows())
+
+    def library(self, count):
+        def rows():
+            for rng, user, index in self._distinct_pairs('library', count):
+                yield (user, self.book_ids[index], self.timestamp(self.moment_after(rng, self.book_times[index])))
+
+        columns = 'user_id, book_id, added_at' if self.schema == 'web' else 'user_email, book_id, last_read'
+        return self.insert('library', f'INSERT INTO user_library ({columns}) VALUES (?, ?, ?)', rows())
+
+    def discussions(self, count):
+        rng = self.rng('discussions')
+        book_weights = zipf_weights(len(self.book_ids), BOOK_SKEW)
+        ranks = list(range(len(self.book_ids)))
+        rng.shuffle(ranks)
+        user_weights = zipf_weights(len(self.user_keys), USER_SKEW)
+        first = self.next_id(self.tables['discussions'])
+        titles = self.phrases(rng, WORDS, 3, 7, '?')
+        contents = self.phrases(rng, REVIEW_WORDS + WORDS, 10, 60)
+
+        def rows():
+            for discussion_id in range(first, first + count):
+                index = rng.choices(ranks, cum_weights=book_weights)[0]
+                user = rng.choices(self.user_keys, cum_weights=user_weights)[0]
+                title = rng.choice(titles)
+                content = rng.choice(contents)
+                created = self.moment_after(rng, self.book_times[index])
+                self.discussion_ids.append(discussion_id)
+                self.discussion_times.append(created)
+                stamp = self.timestamp(created)
+                if self.schema == 'web':
+                    yield (discussion_id, self.book_ids[index], user, title, content, stamp, stamp)
+                else:
+                    yield (discussion_id, self.book_ids[index], user, title, content, stamp)
+
+        if self.schema == 'web':
+            sql = ('INSERT INTO discussion (id, book_id, user_id, title, content, created_at, last_activity_at, '
+                   'reply_count) VALUES (?, ?, ?, ?, ?, ?, ?, 0)')
+        else:
+            sql = ('INSERT INTO discussions (id, book_id, user_email, title, content, created_at) '
+                   'VALUES (?, ?, ?, ?, ?, ?)')
+        return self.insert('discussions', sql, rows())
+
+    def replies(self, count):
+        """Generate replies; web callers recompute the discussions' reply counts afterwards"""
+        rng = self.rng('replies')
+        weights = zipf_weights(len(self.discussion_ids), DISCUSSION_SKEW)
+        ranks = list(range(len(self.discussion_ids)))
+        rng.shuffle(ranks)
+        user_weights = zipf_weights(len(self.user_keys), USER_SKEW)
+        contents = self.phrases(rng, REVIEW_WORDS + WORDS, 5, 40)
+
+        def rows():
+            remaining = count
+            while remaining:
+                batch = min(remaining, self.batch_size)
+                remaining -= batch
+                users = rng.choices(self.user_keys, cum_weights=user_weights, k=batch)
+                for index, user in zip(rng.choices(ranks, cum_weights=weights, k=batch), users):
+                    yield (self.discussion_ids[index], user, rng.choice(contents),
+                           self.timestamp(self.moment_after(rng, self.discussion_times[index])))
+
+        columns = ('discussion_id, user_id, content, created_at' if self.schema == 'web'
+                   else 'discussion_id, user_email, content, created_at')
+        return self.insert('replies', f'INSERT INTO {self.tables["replies"]} ({columns}) VALUES (?, ?, ?, ?)',
+                           rows())
+
+    def generate(self, users=1000, books=200, reviews=5000, library=5000, discussions=500, replies=5000,
+                 max_pages=8, store_pdf=None):
+        """Generate every table in dependency order; returns the total number of rows"""
+        with self.bulk_load():
+            total = self.users(users)
+            total += self.books(books, max_pages, store_pdf)
+            total += self.reviews(reviews)
+            total += self.library(library)
+            total += self.discussions(discussions)
+            total += self.replies(replies)
+        return total
+
+
+def add_volume_arguments(parser):
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--books', type=int, default=200)
+    parser.add_argument('--reviews', type=int, default=5000)
+    parser.add_argument('--library', type=int, default=5000)
+    parser.add_argument('--discussions', type=int, default=500)
+    parser.add_argument('--replies', type=int, default=5000)
+    parser.add_argument('--max-pages', type=int, default=8, help='pages in the longest generated PDF')
+    parser.add_argument('--seed', type=int, default=0)
+
+
+def report(table, rows, seconds):
+    print(f'{table}: {rows:,} rows in {seconds:.1f}s')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fill the desktop database with synthetic data.')
+    parser.add_argument('database', nargs='?', default='bookverse.db')
+    add_volume_arguments(parser)
+    args = parser.parse_args()
+
+    connection = sqlite3.connect(args.database)
+    if not connection.execute("SELECT 1 FROM sqlite_master WHERE name = 'users'").fetchone():
+        sys.exit(f'{args.database} has no BookVerse tables; start the desktop app once to create them')
+    generator = DatasetGenerator(connection, 'desktop', seed=args.seed, progress=report)
+    started = time.perf_counter()
+    total = generator.generate(args.users, args.books, args.reviews, args.library, args.discussions,
+                               args.replies, args.max_pages)
+    connection.close()
+    print(f'Generated {total:,} rows in {time.perf_counter() - started:.1f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""Shared test setup.
+
+The web app reads its database URL and storage folders from the environment
+when it is imported, so they are pointed at a throwaway directory here,
+before ``app`` is first imported.
+"""
+import itertools
+import os
+import sys
+import tempfile
+
+import pytest
+
+# The app and its helper modules live at the top of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TEST_ROOT = tempfile.mkdtemp(prefix='bookverse-tests-')
+os.environ.update({
+    'DATABASE_URL': f'sqlite:///{os.path.join(TEST_ROOT, "bookverse.db")}',
+    'METRICS_DB': os.path.join(TEST_ROOT, 'metrics.db'),
+    'PDF_STORE_ROOT': os.path.join(TEST_ROOT, 'pdfs'),
+    'PAGE_CACHE_FOLDER': os.path.join(TEST_ROOT, 'pages'),
+    'ARTWORK_FOLDER': os.path.join(TEST_ROOT, 'artwork'),
+    'AVATAR_CACHE_FOLDER': os.path.join(TEST_ROOT, 'avatars'),
+})
+
+from app import (app, db, migrate_database, Book, Discussion, DiscussionReply, Review,
+                 SupportQuery, User, UserLibrary, rebuild_book_stats, rebuild_dashboard,
+                 rebuild_discussion_activity)
+
+_numbers = itertools.count(1)
+
+
+def add_user(user_type):
+    number = next(_numbers)
+    # Any hash will do: nobody logs in with a password here
+    user = User(email=f'{user_type}{number}@test.bookverse', username=f'{user_type}{number}',
+                full_name=f'Test {user_type.title()} {number}', user_type=user_type, password_hash='unused')
+    db.session.add(user)
+    return user
+
+
+def log_in(client, user_id):
+    with client.session_transaction() as client_session:
+        client_session.clear()
+        client_session['_user_id'] = str(user_id)
+        client_session['_fresh'] = True
+
+
+class Catalogue:
+    """A book, discussion and users of every role, with rows added around them on request"""
+    def __init__(self):
+        users = {user_type: add_user(user_type) for user_type in ('reader', 'author', 'admin', 'tech_support')}
+        book = Book(title='Subject Book', description='The book every page is about', author=users['author'])
+        db.session.add(book)
+        db.session.flush()
+        discussion = Discussion(book_id=book.id, user_id=users['reader'].id, title='Subject discussion',
+                                content='Discuss')
+        db.session.add(discussion)
+        db.session.commit()
+        self.user_ids = {user_type: user.id for user_type, user in users.items()}
+        self.book_id = book.id
+        self.discussion_id = discussion.id
+        self.size = 0
+
+    def grow(self, size):
+        """Add rows until every list the routes show has ``size`` entries"""
+        reader_id, author_id = self.user_ids['reader'], self.user_ids['author']
+        for number in range(self.size, size):
+            other = add_user('reader')
+            book = Book(title=f'Book {number}', description=f'Description {number}', author_id=author_id)
+            db.session.add(book)
+            db.session.flush()
+            db.session.add_all([
+                Review(book_id=self.book_id, user_id=other.id, rating=number % 5 + 1, comment='Good'),
+                Review(book_id=book.id, user_id=reader_id, rating=number % 5 + 1, comment='Fine'),
+                UserLibrary(user_id=reader_id, book_id=book.id),
+                Discussion(book_id=self.book_id, user_id=other.id, title=f'Topic {number}', content='Thoughts'),
+                Discussion(book_id=book.id, user_id=reader_id, title=f'Question {number}', content='Why?'),
+                DiscussionReply(discussion_id=self.discussion_id, user_id=other.id, content='Agreed'),
+                SupportQuery(user_id=other.id, subject=f'Help {number}', message='Please help'),
+            ])
+        db.session.commit()
+        rebuild_book_stats()
+        rebuild_dashboard()
+        rebuild_discussion_activity()
+        self.size = size
+
+
+@pytest.fixture(scope='session')
+def web_app():
+    """The Flask app on a freshly migrated database"""
+    app.config['TESTING'] = True
+    with app.app_context():
+        migrate_database()
+    return app
+
+
+@pytest.fixture(scope='session')
+def catalogue(web_app):
+    """The rows every list page is requested around; tests grow it as they need"""
+    with web_app.app_context():
+        return Catalogue()
+
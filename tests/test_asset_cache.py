@@ -0,0 +1,57 @@
+"""Cached desktop artwork goes stale when any of its drawing code changes."""
+from PIL import Image
+
+from asset_cache import AssetCache, code_version
+
+
+def fill_color():
+    return 'red'
+
+
+def draw_square(width, height):
+    return Image.new('RGB', (width, height), fill_color())
+
+
+class Artist:
+    def draw(self, width, height):
+        return Image.new('RGB', (width, height), self.color())
+
+    def color(self):
+        return 'blue'
+
+
+def test_version_follows_helpers(monkeypatch):
+    before = code_version(draw_square)
+    monkeypatch.setitem(draw_square.__globals__, 'fill_color', lambda: 'green')
+    assert code_version(draw_square) != before
+
+
+def test_version_follows_methods(monkeypatch):
+    before = code_version(Artist().draw)
+    monkeypatch.setattr(Artist, 'color', lambda self: 'green')
+    assert code_version(Artist().draw) != before
+
+
+def test_render_draws_once_then_loads(tmp_path):
+    cache = AssetCache(str(tmp_path), 'light')
+    cache.register('square', draw_square, 8, 8)
+    assert cache.render('square').getpixel((0, 0)) == (255, 0, 0)
+
+    reloaded = AssetCache(str(tmp_path), 'light')
+    reloaded.register('square', draw_square, 8, 8)
+    assert reloaded.render('square').convert('RGB').getpixel((0, 0)) == (255, 0, 0)
+    assert (reloaded.drawn, reloaded.loaded) == (0, 1)
+
+
+def test_editing_a_helper_redraws(tmp_path, monkeypatch):
+    cache = AssetCache(str(tmp_path), 'light')
+    cache.register('square', draw_square, 8, 8)
+    cache.render('square')
+
+    monkeypatch.setitem(draw_square.__globals__, 'fill_color', lambda: 'green')
+    edited = AssetCache(str(tmp_path), 'light')
+    edited.register('square', draw_square, 8, 8)
+    assert edited.render('square').getpixel((0, 0)) == (0, 128, 0)
+    assert edited.drawn == 1
+    # The stale copy was replaced, not kept beside the new one
+    assert len([name for name in tmp_path.iterdir() if name.suffix == '.tga']) == 1
@@ -0,0 +1,26 @@
+"""A book's stats row stays correct when it has to be created on first change."""
+from app import db, Book, BookStats, Review, UserLibrary
+from conftest import add_user, log_in
+
+
+def test_missing_stats_row_is_counted_from_the_tables(web_app):
+    with web_app.app_context():
+        readers = [add_user('reader') for _ in range(3)]
+        book = Book(title='Stats Never Built', description='Counters missing', author=add_user('author'))
+        db.session.add(book)
+        db.session.flush()
+        db.session.add_all([UserLibrary(user_id=reader.id, book_id=book.id) for reader in readers])
+        db.session.add_all([Review(book_id=book.id, user_id=reader.id, rating=5, comment='Great')
+                            for reader in readers[:2]])
+        db.session.commit()
+        BookStats.query.filter_by(book_id=book.id).delete()
+        db.session.commit()
+        book_id, reader_id = book.id, readers[0].id
+
+    client = web_app.test_client()
+    log_in(client, reader_id)
+    assert client.post(f'/library/remove/{book_id}').status_code == 302
+
+    with web_app.app_context():
+        stats = db.session.get(BookStats, book_id)
+        assert (stats.library_count, stats.review_count, stats.rating_sum, stats.rating_5_count) == (2, 2, 10, 2)
@@ -0,0 +1,120 @@
+"""Claiming, retrying and expiring background jobs.
+
+The queue lives in the suite's throwaway database, so each test starts by
+emptying it.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from app import app, db, Job, claim_job, enqueue_job, fail_job, finish_job, job_handler, run_job
+
+
+@pytest.fixture
+def queue(web_app):
+    with web_app.app_context():
+        Job.query.delete()
+        db.session.commit()
+        yield
+        db.session.rollback()
+
+
+def add_job(kind='test', **values):
+    job = enqueue_job(kind, {'value': 1})
+    for name, value in values.items():
+        setattr(job, name, value)
+    db.session.commit()
+    return job.id
+
+
+@job_handler('test-fails')
+def always_fail(payload):
+    raise RuntimeError('handler failed')
+
+
+def test_claim_leases_the_oldest_runnable_job(queue):
+    later = add_job(run_after=datetime.utcnow() + timedelta(hours=1))
+    first = add_job()
+    second = add_job()
+
+    job = claim_job('worker-1')
+    assert (job.id, job.status, job.attempts, job.worker) == (first, 'running', 1, 'worker-1')
+    assert job.lease_expires_at > datetime.utcnow() + timedelta(seconds=job.timeout)
+    assert claim_job('worker-2').id == second
+    # The remaining job is not due yet
+    assert claim_job('worker-3') is None
+    assert db.session.get(Job, later).status == 'queued'
+
+
+def test_failed_attempts_back_off_then_fail(queue):
+    job_id = add_job(kind='test-fails')
+    delay = app.config['JOB_RETRY_DELAY']
+
+    for attempt in range(1, app.config['JOB_MAX_ATTEMPTS']):
+        job = claim_job('worker')
+        assert job.attempts == attempt
+        started = datetime.utcnow()
+        assert run_job(job) is False
+
+        job = db.session.get(Job, job_id)
+        assert job.status == 'queued' and 'handler failed' in job.last_error
+        expected = started + timedelta(seconds=delay * 2 ** (attempt - 1))
+        assert abs(job.run_after - expected) < timedelta(seconds=5)
+        # Not claimable until the delay has passed
+        assert claim_job('worker') is None
+        Job.query.filter_by(id=job_id).update({Job.run_after: datetime.utcnow()})
+        db.session.commit()
+
+    assert run_job(claim_job('worker')) is False
+    job = db.session.get(Job, job_id)
+    assert (job.status, job.attempts) == ('failed', app.config['JOB_MAX_ATTEMPTS'])
+    assert job.finished_at is not None
+
+
+def test_expired_lease_is_claimed_again(queue):
+    job_id = add_job()
+    stale = claim_job('worker-1')
+    stale_attempts = stale.attempts
+    Job.query.filter_by(id=job_id).update({Job.lease_expires_at: datetime.utcnow() - timedelta(seconds=1)})
+    db.session.commit()
+
+    job = claim_job('worker-2')
+    assert (job.id, job.attempts, job.worker) == (job_id, stale_attempts + 1, 'worker-2')
+    # The first worker's late report is ignored: attempts no longer matches
+    assert finish_job(job_id, stale_attempts, 'done') is False
+    assert fail_job(job_id, stale_attempts, 'late') is False
+    assert finish_job(job_id, job.attempts, 'done') is True
+    assert db.session.get(Job, job_id).status == 'done'
+
+
+def test_expired_final_attempt_fails_the_job(queue):
+    job_id = add_job(status='running', attempts=app.config['JOB_MAX_ATTEMPTS'],
+                     lease_expires_at=datetime.utcnow() - timedelta(seconds=1))
+
+    assert claim_job('worker') is None
+    job = db.session.get(Job, job_id)
+    assert job.status == 'failed' and job.last_error == 'Lease expired on the final attempt'
+
+
+def test_claim_is_a_compare_and_set_on_attempts(queue):
+    job_id = add_job()
+    claims = []
+
+    def another_worker_claims_first(connection, cursor, statement, parameters, context, executemany):
+        # Another worker's claim lands between this worker's read and its update
+        if statement.startswith('UPDATE job') and not claims:
+            claims.append(statement)
+            lease = (datetime.utcnow() + timedelta(hours=1)).strftime('%Y-%m-%d %H:%M:%S.%f')
+            cursor.connection.execute("UPDATE job SET attempts = attempts + 1, status = 'running', "
+                                      "worker = 'other', lease_expires_at = ? WHERE id = ?", (lease, job_id))
+
+    event.listen(db.engine, 'before_cursor_execute', another_worker_claims_first)
+    try:
+        job = claim_job('worker')
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', another_worker_claims_first)
+    # This worker's update matched nothing, and the job is no longer claimable
+    assert claims and job is None
+    job = db.session.get(Job, job_id)
+    assert (job.worker, job.attempts) == ('other', 1)
@@ -0,0 +1,90 @@
+"""Metrics recorded by several processes are summed by a scrape from any of them."""
+import os
+import subprocess
+import sys
+
+import pytest
+
+from metrics import MetricsRegistry
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Records into the registry at argv[1], flushes, then waits for a line on stdin before exiting
+CHILD = '''
+import sys
+from metrics import MetricsRegistry
+registry = MetricsRegistry(sys.argv[1])
+registry.counter('requests_total', 'Requests', ('status',)).inc(3, status='200')
+registry.gauge('in_progress', 'In progress').inc(2)
+registry.histogram('latency_seconds', 'Latency', buckets=(0.1, 1.0)).observe(0.5)
+registry.flush()
+print('flushed', flush=True)
+sys.stdin.readline()
+'''
+
+
+def define(registry):
+    return (registry.counter('requests_total', 'Requests', ('status',)),
+            registry.gauge('in_progress', 'In progress'),
+            registry.histogram('latency_seconds', 'Latency', buckets=(0.1, 1.0)))
+
+
+def start_child(path):
+    child = subprocess.Popen([sys.executable, '-c', CHILD, path], cwd=REPOSITORY, text=True,
+                             stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    assert child.stdout.readline() == 'flushed\n'
+    return child
+
+
+def stop(child):
+    child.communicate('\n', timeout=10)
+    assert child.returncode == 0
+
+
+def test_scrape_sums_live_and_exited_processes(tmp_path):
+    path = str(tmp_path / 'metrics.db')
+    registry = MetricsRegistry(path, flush_interval=60)
+    requests, in_progress, latency = define(registry)
+    requests.inc(status='200')
+    in_progress.inc()
+    latency.observe(0.05)
+
+    children = [start_child(path), start_child(path)]
+    samples = registry.collect()
+    assert samples['requests_total'] == {(('status', '200'),): 7}
+    assert samples['in_progress'] == {(): 5}
+    assert samples['latency_seconds_count'] == {(): 3}
+    assert samples['latency_seconds_bucket'][(('le', '0.1'),)] == 1
+    assert samples['latency_seconds_bucket'][(('le', '1'),)] == 3
+
+    stop(children[0])
+    samples = registry.collect()
+    # An exited process's counters are kept; its gauges no longer count
+    assert samples['requests_total'] == {(('status', '200'),): 7}
+    assert samples['in_progress'] == {(): 3}
+
+    stop(children[1])
+    rendered = registry.render()
+    assert 'requests_total{status="200"} 7\n' in rendered
+    assert 'in_progress 1\n' in rendered
+    assert 'latency_seconds_bucket{le="+Inf"} 3\n' in rendered
+    assert 'latency_seconds_sum 1.05\n' in rendered
+
+
+@pytest.fixture
+def client(web_app):
+    return web_app.test_client()
+
+
+def test_metrics_are_closed_without_a_token(client, monkeypatch):
+    monkeypatch.setitem(client.application.config, 'METRICS_TOKEN', None)
+    assert client.get('/metrics').status_code == 404
+
+
+def test_metrics_require_the_token(client, monkeypatch):
+    monkeypatch.setitem(client.application.config, 'METRICS_TOKEN', 'secret')
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    response = client.get('/metrics', headers={'Authorization': 'Bearer secret'})
+    assert response.status_code == 200
+    assert b'# TYPE bookverse_http_requests_total counter' in response.data
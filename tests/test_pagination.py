@@ -0,0 +1,174 @@
+"""Cursor (keyset) pagination returns every row exactly once, in a stable order.
+
+Rows are given timestamps later than anything else in the shared database,
+so they fill the first pages, and several share a timestamp so the id has
+to break the tie.
+"""
+import re
+from datetime import datetime
+
+import pytest
+
+from app import db, Book, Discussion, Review, SupportQuery
+from conftest import add_user, log_in
+
+NEWEST = datetime(2999, 1, 2)
+TIED = datetime(2999, 1, 1)
+
+
+@pytest.fixture(scope='module')
+def reader_id(web_app):
+    with web_app.app_context():
+        reader = add_user('reader')
+        db.session.commit()
+        return reader.id
+
+
+@pytest.fixture
+def client(web_app, reader_id):
+    client = web_app.test_client()
+    log_in(client, reader_id)
+    return client
+
+
+@pytest.fixture(scope='module')
+def future_books(web_app):
+    """Ids of books created 'in the future', newest first: one, then five sharing a timestamp"""
+    with web_app.app_context():
+        author = add_user('author')
+        books = [Book(title=f'Tied {number}', description='Same time', author=author, created_at=TIED)
+                 for number in range(5)]
+        books.append(Book(title='Newest', description='Latest', author=author, created_at=NEWEST))
+        db.session.add_all(books)
+        db.session.commit()
+        return [books[-1].id] + sorted((book.id for book in books[:-1]), reverse=True)
+
+
+def walk_api(client, pages, limit):
+    """Return the book ids of the first ``pages`` pages of /api/books"""
+    ids, cursor = [], ''
+    for _ in range(pages):
+        data = client.get(f'/api/books?limit={limit}&cursor={cursor}').get_json()
+        ids.extend(book['id'] for book in data['books'])
+        cursor = data['next_cursor']
+        if not cursor:
+            break
+    return ids
+
+
+def test_api_pages_break_ties_on_id(client, future_books):
+    ids = walk_api(client, 3, 2)
+    assert ids == future_books
+
+
+def test_api_pages_do_not_shift_when_books_are_added(web_app, client, future_books):
+    first = client.get('/api/books?limit=3').get_json()
+    with web_app.app_context():
+        db.session.add(Book(title='Added meanwhile', description='Later', author=add_user('author'),
+                            created_at=TIED))
+        db.session.commit()
+    second = client.get(f'/api/books?limit=3&cursor={first["next_cursor"]}').get_json()
+
+    ids = [book['id'] for book in first['books'] + second['books']]
+    assert ids == future_books
+
+
+def test_browse_pages_match_the_api(web_app, client, future_books, monkeypatch):
+    monkeypatch.setitem(web_app.config, 'BOOKS_PER_PAGE', 2)
+    ids, cursor = [], ''
+    for _ in range(4):
+        page = client.get(f'/browse?cursor={cursor}').get_data(as_text=True)
+        ids.extend(int(book_id) for book_id in re.findall(r'href="/book/(\d+)"', page))
+        cursor = re.search(r'data-next-cursor="([^"]*)"', page).group(1)
+        if not cursor:
+            break
+    assert ids == walk_api(client, 4, 2)
+    assert set(future_books) <= set(ids)
+
+
+def test_malformed_cursor_is_rejected(client):
+    assert client.get('/api/books?cursor=not-a-cursor').status_code == 400
+    assert client.get('/browse?cursor=bm90IGpzb24=').status_code == 400
+
+
+def walk_pages(client, path, pattern, cursor_name='cursor'):
+    """Follow a page's "older" links to the end; return every match of ``pattern`` in order"""
+    found, url = [], path
+    while url:
+        page = client.get(url).get_data(as_text=True)
+        found.extend(re.findall(pattern, page))
+        cursor = re.search(rf'{cursor_name}=([^"&]+)"', page)
+        url = f'{path}?{cursor_name}={cursor.group(1)}' if cursor else None
+    return found
+
+
+def test_book_reviews_pages(web_app, client, monkeypatch):
+    monkeypatch.setitem(web_app.config, 'REVIEWS_PER_PAGE', 2)
+    with web_app.app_context():
+        book = Book(title='Much Reviewed', description='Reviewed', author=add_user('author'))
+        db.session.add(book)
+        db.session.flush()
+        reviews = [Review(book_id=book.id, user=add_user('reader'), rating=3, comment=f'Opinion {number}',
+                          created_at=TIED) for number in range(5)]
+        db.session.add_all(reviews)
+        db.session.commit()
+        book_id = book.id
+
+    comments = walk_pages(client, f'/book/{book_id}/reviews', r'Opinion \d')
+    assert comments == [f'Opinion {number}' for number in reversed(range(5))]
+
+
+def test_support_queries_page_independently(web_app, monkeypatch):
+    monkeypatch.setitem(web_app.config, 'SUPPORT_QUERIES_PER_PAGE', 2)
+    with web_app.app_context():
+        asker = add_user('reader')
+        db.session.flush()
+        db.session.add_all([SupportQuery(user_id=asker.id, subject=f'Ticket {number}', message='Help',
+                                         status='resolved' if number % 2 else 'open', created_at=TIED)
+                            for number in range(6)])
+        support = add_user('tech_support')
+        db.session.commit()
+        support_id = support.id
+    client = web_app.test_client()
+    log_in(client, support_id)
+
+    path = '/tech_support/dashboard'
+    opened = [ticket for ticket in walk_pages(client, path, r'Ticket \d', 'open_cursor') if ticket[-1] in '024']
+    assert opened[:3] == ['Ticket 4', 'Ticket 2', 'Ticket 0']
+    resolved = [ticket for ticket in walk_pages(client, path, r'Ticket \d', 'resolved_cursor') if ticket[-1] in '135']
+    assert resolved[:3] == ['Ticket 5', 'Ticket 3', 'Ticket 1']
+
+
+@pytest.fixture(scope='module')
+def future_discussions(web_app):
+    """Ids of five discussions whose last activity shares a future timestamp, newest id first"""
+    with web_app.app_context():
+        book = Book(title='Much Discussed', description='Discussed', author=add_user('author'))
+        starter = add_user('reader')
+        discussions = [Discussion(book=book, user=starter, title=f'Thread {number}', content='Talk',
+                                  created_at=TIED, last_activity_at=TIED) for number in range(5)]
+        db.session.add_all(discussions)
+        db.session.commit()
+        return sorted((discussion.id for discussion in discussions), reverse=True)
+
+
+def test_discussion_pages_break_ties_on_id(web_app, client, future_discussions, monkeypatch):
+    monkeypatch.setitem(web_app.config, 'DISCUSSIONS_PER_PAGE', 2)
+    ids = [int(discussion_id) for discussion_id in walk_pages(client, '/discussions', r'href="/discussion/(\d+)"')]
+    assert ids[:5] == future_discussions
+    assert len(ids) == len(set(ids))
+
+
+def test_admin_discussion_pages(web_app, future_discussions, monkeypatch):
+    monkeypatch.setitem(web_app.config, 'DISCUSSIONS_PER_PAGE', 2)
+    with web_app.app_context():
+        admin = add_user('admin')
+        db.session.commit()
+        admin_id = admin.id
+    client = web_app.test_client()
+    log_in(client, admin_id)
+
+    links = walk_pages(client, '/admin/discussions', r'href="/discussion/(\d+)"')
+    ids = [int(discussion_id) for discussion_id in links]
+    assert ids[:5] == future_discussions
+    assert len(ids) == len(set(ids))
@@ -0,0 +1,162 @@
+"""Range requests, ETags and revalidation on the PDF download and page routes."""
+import io
+import threading
+
+import pytest
+from sqlalchemy import event
+
+from app import db, Book, ensure_pdf_metadata, pdf_store, release_pdf
+from conftest import add_user, log_in
+from synthetic_data import make_pdf
+
+PDF = make_pdf([[f'Page {number}'] for number in range(1, 4)])
+
+
+@pytest.fixture(scope='module')
+def books(web_app):
+    """A stored PDF, a PDF still kept in its book row, a book without one, and a reader's id"""
+    with web_app.app_context():
+        reader = add_user('reader')
+        author = add_user('author')
+        stored = Book(title='Stored PDF', description='Stored', author=author)
+        stored.set_pdf(io.BytesIO(PDF))
+        legacy = Book(title='Legacy PDF', description='Legacy', author=author, pdf_data=PDF)
+        empty = Book(title='No PDF', description='Empty', author=author)
+        db.session.add_all([stored, legacy, empty])
+        db.session.commit()
+        return {'stored': stored.id, 'legacy': legacy.id, 'empty': empty.id, 'reader': reader.id}
+
+
+@pytest.fixture
+def client(web_app, books):
+    client = web_app.test_client()
+    log_in(client, books['reader'])
+    return client
+
+
+@pytest.mark.parametrize('kind', ['stored', 'legacy'])
+def test_pdf_full_download(client, books, kind):
+    response = client.get(f'/book/{books[kind]}/pdf')
+    assert response.status_code == 200
+    assert response.data == PDF
+    assert response.headers['Accept-Ranges'] == 'bytes'
+    assert response.headers['ETag']
+
+
+@pytest.mark.parametrize('kind', ['stored', 'legacy'])
+def test_pdf_range(client, books, kind):
+    response = client.get(f'/book/{books[kind]}/pdf', headers={'Range': 'bytes=10-19'})
+    assert response.status_code == 206
+    assert response.data == PDF[10:20]
+    assert response.headers['Content-Range'] == f'bytes 10-19/{len(PDF)}'
+
+    response = client.get(f'/book/{books[kind]}/pdf', headers={'Range': 'bytes=-5'})
+    assert response.status_code == 206
+    assert response.data == PDF[-5:]
+
+
+def test_pdf_range_past_the_end(client, books):
+    response = client.get(f'/book/{books["stored"]}/pdf', headers={'Range': f'bytes={len(PDF)}-'})
+    assert response.status_code == 416
+    assert response.headers['Content-Range'] == f'bytes */{len(PDF)}'
+
+
+def test_pdf_revalidation(client, books):
+    etag = client.get(f'/book/{books["stored"]}/pdf').headers['ETag']
+    response = client.get(f'/book/{books["stored"]}/pdf', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+
+    response = client.get(f'/book/{books["stored"]}/pdf', headers={'If-None-Match': '"stale"'})
+    assert response.status_code == 200
+
+
+def test_pdf_range_ignored_for_stale_if_range(client, books):
+    response = client.get(f'/book/{books["stored"]}/pdf',
+                          headers={'Range': 'bytes=0-9', 'If-Range': '"stale"'})
+    assert response.status_code == 200
+    assert response.data == PDF
+
+
+def test_missing_pdf_is_not_found(client, books):
+    assert client.get(f'/book/{books["empty"]}/pdf').status_code == 404
+    assert client.get(f'/book/{books["empty"]}/page/1').status_code == 404
+
+
+def test_page(client, books):
+    response = client.get(f'/book/{books["stored"]}/page/2')
+    assert response.status_code == 200
+    assert response.data.startswith(b'%PDF')
+    etag = response.headers['ETag']
+
+    response = client.get(f'/book/{books["stored"]}/page/2', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+
+    length = len(client.get(f'/book/{books["stored"]}/page/2').data)
+    response = client.get(f'/book/{books["stored"]}/page/2', headers={'Range': 'bytes=0-3'})
+    assert response.status_code == 206
+    assert response.data == b'%PDF'
+
+    response = client.get(f'/book/{books["stored"]}/page/2', headers={'Range': f'bytes={length}-'})
+    assert response.status_code == 416
+
+
+def test_page_past_the_end(client, books):
+    assert client.get(f'/book/{books["stored"]}/page/4').status_code == 404
+
+
+def test_missing_pdf_metadata_is_backfilled_once(web_app, books):
+    statements = []
+
+    def count(connection, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with web_app.app_context():
+        book = db.session.get(Book, books['empty'])
+        ensure_pdf_metadata(book)
+        assert book.pdf_size == 0 and book.pdf_sha256
+
+        event.listen(db.engine, 'before_cursor_execute', count)
+        try:
+            ensure_pdf_metadata(db.session.get(Book, books['empty']))
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', count)
+    assert statements == []
+
+
+def test_release_keeps_referenced_pdf(web_app, books):
+    with web_app.app_context():
+        sha256 = db.session.get(Book, books['stored']).pdf_sha256
+        release_pdf(sha256)
+        assert pdf_store.exists(sha256)
+
+
+def test_release_deletes_unreferenced_pdf(web_app):
+    with web_app.app_context():
+        sha256, size = pdf_store.put(io.BytesIO(b'%PDF unreferenced'))
+        release_pdf(sha256)
+        assert not pdf_store.exists(sha256)
+
+
+def test_release_waits_for_upload_to_commit(web_app, books):
+    """An upload that dedupes to a file being released keeps the file"""
+    content = b'%PDF shared'
+    with web_app.app_context():
+        sha256, size = pdf_store.put(io.BytesIO(content))
+        released = threading.Event()
+
+        def release():
+            with web_app.app_context():
+                release_pdf(sha256)
+            released.set()
+
+        with pdf_store.lock():
+            book = Book(title='Deduped PDF', description='Deduped', author_id=books['reader'])
+            book.set_pdf(io.BytesIO(content))
+            thread = threading.Thread(target=release)
+            thread.start()
+            assert not released.wait(0.2)
+            db.session.add(book)
+            db.session.commit()
+        thread.join()
+        assert pdf_store.exists(sha256)
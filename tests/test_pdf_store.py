@@ -0,0 +1,105 @@
+"""Resumable uploads staged by UploadStaging."""
+import hashlib
+import io
+import threading
+
+import pytest
+
+from pdf_store import PDFStore, UploadStaging
+
+CONTENT = bytes(range(256)) * 40
+
+
+@pytest.fixture
+def staging(tmp_path):
+    return UploadStaging(PDFStore(str(tmp_path), chunk_size=1000))
+
+
+def test_upload_in_chunks(staging):
+    upload_id = staging.start(size=len(CONTENT))
+    for start in range(0, len(CONTENT), 3000):
+        assert staging.append(upload_id, start, io.BytesIO(CONTENT[start:start + 3000])) == \
+            min(start + 3000, len(CONTENT))
+
+    sha256, size = staging.finish(upload_id)
+    assert (sha256, size) == (hashlib.sha256(CONTENT).hexdigest(), len(CONTENT))
+    with staging.store.open(sha256) as stored:
+        assert stored.read() == CONTENT
+    with pytest.raises(KeyError):
+        staging.offset(upload_id)
+
+
+def test_resume_in_another_process(staging):
+    upload_id = staging.start(size=len(CONTENT))
+    staging.append(upload_id, 0, io.BytesIO(CONTENT[:5000]))
+
+    # A fresh instance has no running hash, as in another worker or after a restart
+    resumed = UploadStaging(staging.store)
+    assert resumed.offset(upload_id) == 5000
+    resumed.append(upload_id, 5000, io.BytesIO(CONTENT[5000:]))
+    assert resumed.finish(upload_id)[0] == hashlib.sha256(CONTENT).hexdigest()
+
+
+def test_out_of_order_chunk_is_refused(staging):
+    upload_id = staging.start(size=len(CONTENT))
+    staging.append(upload_id, 0, io.BytesIO(CONTENT[:1000]))
+    with pytest.raises(ValueError, match='expected offset 1000'):
+        staging.append(upload_id, 2000, io.BytesIO(CONTENT[2000:3000]))
+    assert staging.offset(upload_id) == 1000
+
+
+def test_duplicate_chunk_is_refused(staging):
+    upload_id = staging.start(size=len(CONTENT))
+    staging.append(upload_id, 0, io.BytesIO(CONTENT[:1000]))
+    with pytest.raises(ValueError, match='expected offset 1000'):
+        staging.append(upload_id, 0, io.BytesIO(CONTENT[:1000]))
+    staging.append(upload_id, 1000, io.BytesIO(CONTENT[1000:]))
+    assert staging.finish(upload_id)[0] == hashlib.sha256(CONTENT).hexdigest()
+
+
+def test_upload_past_its_size_is_truncated(staging):
+    upload_id = staging.start(size=1500)
+    with pytest.raises(ValueError, match='exceeds 1500'):
+        staging.append(upload_id, 0, io.BytesIO(CONTENT[:3000]), limit=1500)
+    # Only the whole chunks that fit are kept
+    assert staging.offset(upload_id) == 1000
+
+
+class SlowStream(io.BytesIO):
+    """A request body whose first read waits until the test lets it go on"""
+    def __init__(self, data, started, release):
+        super().__init__(data)
+        self.started, self.release = started, release
+
+    def read(self, size=-1):
+        self.started.set()
+        self.release.wait(5)
+        return super().read(size)
+
+
+def test_concurrent_duplicate_chunks_are_written_once(staging):
+    upload_id = staging.start(size=len(CONTENT))
+    started, release = threading.Event(), threading.Event()
+    results = []
+
+    def send(stream):
+        try:
+            results.append(staging.append(upload_id, 0, stream))
+        except ValueError as error:
+            results.append(str(error))
+
+    first = threading.Thread(target=send, args=(SlowStream(CONTENT[:2000], started, release),))
+    first.start()
+    started.wait(5)
+    second = threading.Thread(target=send, args=(io.BytesIO(CONTENT[:2000]),))
+    second.start()
+    # The second request waits for the first while it is still reading its body
+    second.join(0.2)
+    assert second.is_alive()
+    release.set()
+    first.join()
+    second.join()
+
+    assert results == [2000, 'expected offset 2000']
+    staging.append(upload_id, 2000, io.BytesIO(CONTENT[2000:]))
+    assert staging.finish(upload_id)[0] == hashlib.sha256(CONTENT).hexdigest()
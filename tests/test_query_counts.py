@@ -0,0 +1,81 @@
+"""The list pages must issue the same number of queries however many rows they show.
+
+Each route is requested once over a small catalogue and again after more
+rows have been added around the same book, discussion and users; a route
+that loads related rows one at a time (an N+1) runs more queries the second
+time.
+"""
+import pytest
+from sqlalchemy import event
+
+from app import app, db
+from conftest import log_in
+
+LIST_ROUTES = [
+    ('reader', '/browse'),
+    ('reader', '/api/books'),
+    ('reader', '/book/{book}'),
+    ('reader', '/book/{book}/reviews'),
+    ('reader', '/book/{book}/discussions'),
+    ('reader', '/discussions'),
+    ('reader', '/discussion/{discussion}'),
+    ('reader', '/library'),
+    ('reader', '/profile'),
+    ('author', '/author/dashboard'),
+    ('author', '/author/reviews'),
+    ('author', '/author/discussions'),
+    ('admin', '/admin/dashboard'),
+    ('admin', '/admin/reviews'),
+    ('admin', '/admin/discussions'),
+    ('tech_support', '/tech_support/dashboard'),
+]
+
+SMALL = 2
+LARGE = 12
+
+
+def count_queries(client, catalogue):
+    """Return {(user type, path): (status code, statements run)} for every list route"""
+    statements = []
+
+    def count(connection, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    results = {}
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', count)
+    try:
+        for user_type, path in LIST_ROUTES:
+            log_in(client, catalogue.user_ids[user_type])
+            del statements[:]
+            # A fresh app context per request, so g and the session start empty as in production
+            with app.app_context():
+                response = client.get(path.format(book=catalogue.book_id, discussion=catalogue.discussion_id))
+            results[(user_type, path)] = (response.status_code, len(statements))
+    finally:
+        event.remove(engine, 'before_cursor_execute', count)
+    return results
+
+
+@pytest.fixture(scope='module')
+def query_counts(web_app, catalogue):
+    """Query counts of every list route over a small catalogue and over a larger one"""
+    client = web_app.test_client()
+    with web_app.app_context():
+        catalogue.grow(SMALL)
+    small = count_queries(client, catalogue)
+    with web_app.app_context():
+        catalogue.grow(LARGE)
+    large = count_queries(client, catalogue)
+    return small, large
+
+
+@pytest.mark.parametrize('user_type, path', LIST_ROUTES)
+def test_query_count_does_not_grow_with_rows(query_counts, user_type, path):
+    small, large = query_counts
+    small_status, small_queries = small[(user_type, path)]
+    large_status, large_queries = large[(user_type, path)]
+    assert small_status == 200 and large_status == 200
+    assert large_queries == small_queries, (
+        f'{path} ran {small_queries} queries with {SMALL} rows but {large_queries} with {LARGE}')
@@ -0,0 +1,92 @@
+"""Every hot query must stay on its indexes once the migrations have run.
+
+The web routes are requested and each SELECT they send is explained, as
+``flask check-query-plans`` does. The desktop statements are explained from
+desktop_sql, the same strings bookverse.py executes, against a database the
+desktop client has created and migrated.
+"""
+import os
+import sqlite3
+import sys
+
+import pytest
+
+import desktop_sql
+import query_plans
+from app import QUERY_PLAN_ROUTES, explain_route_queries
+
+
+@pytest.fixture(scope='module')
+def desktop_database(tmp_path_factory):
+    """A connection to a database set up by the desktop client, as on its first launch"""
+    directory = tmp_path_factory.mktemp('desktop')
+    # bookverse makes its assets directory in the working directory when imported
+    previous = os.getcwd()
+    os.chdir(directory)
+    try:
+        from bookverse import Database
+        database = Database(str(directory / 'bookverse.db'))
+    finally:
+        os.chdir(previous)
+    yield database.conn
+    database.conn.close()
+
+
+def run_main(monkeypatch, *args):
+    """Run ``python -m query_plans`` with args; return its exit code"""
+    monkeypatch.setattr(sys, 'argv', ['query_plans', *args])
+    with pytest.raises(SystemExit) as exit_info:
+        query_plans.main()
+    return exit_info.value.code
+
+
+def test_web_routes_use_indexes(web_app, catalogue):
+    with web_app.app_context():
+        catalogue.grow(1)
+        results = explain_route_queries(catalogue.user_ids, catalogue.book_id, catalogue.discussion_id)
+    assert len(results) == sum(len(paths) for paths in QUERY_PLAN_ROUTES.values())
+    assert {path: problems for path, statement_count, problems in results if problems} == {}
+
+
+def test_desktop_database_is_fully_migrated(desktop_database):
+    version = desktop_database.execute('PRAGMA user_version').fetchone()[0]
+    assert version == len(desktop_sql.SCHEMA_MIGRATIONS)
+
+
+def test_desktop_queries_use_indexes(desktop_database):
+    assert query_plans.desktop_queries()
+    assert query_plans.check_desktop_queries(desktop_database) == {}
+
+
+def test_allowed_scans_and_sorts_name_real_statements():
+    names = {name for name, sql in query_plans.desktop_queries()}
+    assert query_plans.DESKTOP_FULL_READS <= names
+    assert query_plans.DESKTOP_SORTED_QUERIES <= names
+
+
+def test_unmigrated_database_is_reported(monkeypatch, tmp_path, capsys):
+    database = tmp_path / 'old.db'
+    connection = sqlite3.connect(database)
+    connection.execute('CREATE TABLE users (email TEXT PRIMARY KEY)')
+    connection.close()
+
+    code = run_main(monkeypatch, str(database))
+    assert 'has 0 of' in str(code) and '--migrate' in str(code)
+    assert 'queries use indexes' not in capsys.readouterr().out
+
+
+def test_missing_database_is_reported(monkeypatch, tmp_path):
+    database = tmp_path / 'missing.db'
+    assert 'does not exist' in str(run_main(monkeypatch, str(database)))
+    assert not database.exists()
+
+
+def test_migrate_then_check(monkeypatch, tmp_path, capsys):
+    database = tmp_path / 'old.db'
+    sqlite3.connect(database).close()
+    # bookverse makes its assets directory in the working directory when imported
+    monkeypatch.chdir(tmp_path)
+
+    assert run_main(monkeypatch, str(database), '--migrate') == 0
+    total = len(query_plans.desktop_queries())
+    assert f'{total} of {total} queries use indexes' in capsys.readouterr().out
@@ -0,0 +1,21 @@
+"""Search works on a database set up by the migrations alone."""
+from app import db, Book
+from conftest import add_user, log_in
+
+
+def test_migrated_database_searches_new_books(web_app):
+    with web_app.app_context():
+        reader = add_user('reader')
+        author = add_user('author')
+        db.session.add(Book(title='Quixotic Zephyrs', description='Searchable', author=author))
+        db.session.commit()
+        reader_id, author_name = reader.id, author.username
+
+    client = web_app.test_client()
+    log_in(client, reader_id)
+    response = client.get('/search?q=zephyr')
+    assert response.status_code == 200
+    assert b'Quixotic <mark>Zephyrs</mark>' in response.data
+
+    response = client.get(f'/search?q={author_name}')
+    assert b'Quixotic' in response.data
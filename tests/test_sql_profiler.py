@@ -0,0 +1,26 @@
+"""The SQL profiler only hooks cursor events while it is enabled."""
+from sqlalchemy import create_engine, event, text
+
+from sql_profiler import SQLProfiler
+
+
+def test_profiler_is_off_until_enabled():
+    engine = create_engine('sqlite://')
+    profiler = SQLProfiler()
+    profiler.install(engine)
+    assert not event.contains(engine, 'before_cursor_execute', profiler._before_execute)
+
+    profiler.enabled = True
+    assert event.contains(engine, 'after_cursor_execute', profiler._after_execute)
+    profiler.start('GET', '/books')
+    with engine.connect() as connection:
+        connection.execute(text('SELECT 1'))
+        connection.execute(text('SELECT 2'))
+    record = profiler.finish('books', 200)
+    assert record['query_count'] == 2
+
+    profiler.enabled = False
+    assert not event.contains(engine, 'before_cursor_execute', profiler._before_execute)
+    profiler.start('GET', '/books')
+    assert profiler.finish('books', 200) is None
+
@@ -0,0 +1,126 @@
+"""A scrollable grid of fixed-size cards that only builds the cards on screen.
+
+Building a widget tree for every item makes a long list slow to build and
+heavy to hold, so VirtualGrid keeps a pool of card widgets just large
+enough to cover the viewport plus ``overscan`` rows above and below it. As
+the view scrolls, cards that leave it are refilled with the items coming in
+and moved into place, so building, scrolling and replacing the items cost
+the same whether there are ten items or a hundred thousand.
+"""
+import tkinter as tk
+from tkinter import ttk
+
+
+class VirtualGrid:
+    """Shows ``items`` as cards in ``columns`` columns of rows ``row_height`` pixels tall.
+
+    ``create_card(parent)`` builds one empty card and returns a dict of its
+    widgets, the top-level one under 'frame'; ``fill_card(card, item)``
+    shows an item on an existing card. Cards are reused for other items as
+    the grid scrolls, so ``fill_card`` must reset everything it sets.
+    """
+    def __init__(self, parent, create_card, fill_card, row_height, columns=3, padding=10, overscan=1,
+                 background=None, scrollbar_style=None, empty_font=None, empty_color=None):
+        self.create_card = create_card
+        self.fill_card = fill_card
+        self.row_height = row_height
+        self.columns = columns
+        self.padding = padding
+        self.overscan = overscan
+        self.items = []
+        self.visible = {}  # item index -> (canvas window id, card)
+        self.spare = []  # (canvas window id, card) pairs not showing an item
+        self._refresh_pending = False
+
+        self.frame = tk.Frame(parent, bg=background)
+        scrollbar_options = {'style': scrollbar_style} if scrollbar_style else {}
+        self.scrollbar = ttk.Scrollbar(self.frame, orient='vertical', command=self.yview, **scrollbar_options)
+        self.scrollbar.pack(side=tk.RIGHT, fill='y')
+        self.canvas = tk.Canvas(self.frame, bg=background, highlightthickness=0, height=500,
+                                yscrollcommand=self.scrollbar.set, yscrollincrement=row_height // 8)
+        self.canvas.pack(side=tk.LEFT, fill='both', expand=True)
+        self.message = self.canvas.create_text(20, 20, anchor='nw', text='', font=empty_font, fill=empty_color)
+
+        self.canvas.bind('<Configure>', lambda event: self.refresh())
+        self._bind_wheel(self.canvas)
+
+    def pack(self, **options):
+        self.frame.pack(**options)
+
+    def set_items(self, items, empty_text=''):
+        """Replace the items shown and scroll back to the top"""
+        self.items = list(items)
+        for index in list(self.visible):
+            self._release(index)
+        self.canvas.itemconfigure(self.message, text='' if self.items else empty_text)
+        self.canvas.yview_moveto(0)
+        self.refresh()
+
+    def yview(self, *args):
+        self.canvas.yview(*args)
+        self.refresh()
+
+    def card_count(self):
+        """Number of card widget trees built so far, shown or spare"""
+        return len(self.visible) + len(self.spare)
+
+    def refresh(self):
+        """Show the cards for the rows in and near the viewport, recycling the rest"""
+        width = max(self.canvas.winfo_width(), 100)
+        height = max(self.canvas.winfo_height(), 100)
+        rows = -(-len(self.items) // self.columns)
+        self.canvas.configure(scrollregion=(0, 0, width, max(rows * self.row_height + self.padding, height)))
+
+        top = self.canvas.canvasy(0)
+        first_row = max(int(top // self.row_height) - self.overscan, 0)
+        last_row = int((top + height) // self.row_height) + self.overscan
+        wanted = range(first_row * self.columns, min((last_row + 1) * self.columns, len(self.items)))
+
+        for index in list(self.visible):
+            if index not in wanted:
+                self._release(index)
+
+        column_width = width / self.columns
+        for index in wanted:
+            entry = self.visible.get(index)
+            if entry is None:
+                entry = self.spare.pop() if self.spare else self._build_card()
+                self.fill_card(entry[1], self.items[index])
+                self.visible[index] = entry
+            row, column = divmod(index, self.columns)
+            self.canvas.coords(entry[0], column * column_width + self.padding, row * self.row_height + self.padding)
+            self.canvas.itemconfigure(entry[0], width=column_width - 2 * self.padding,
+                                      height=self.row_height - 2 * self.padding)
+
+    def _build_card(self):
+        card = self.create_card(self.canvas)
+        window = self.canvas.create_window(0, 0, window=card['frame'], anchor='nw')
+        self._bind_wheel(card['frame'])
+        return window, card
+
+    def _release(self, index):
+        window, card = self.visible.pop(index)
+        # Parked out of sight; hiding embedded windows is unreliable across Tk versions
+        self.canvas.coords(window, -10000, -10000)
+        self.spare.append((window, card))
+
+    def _bind_wheel(self, widget):
+        widget.bind('<MouseWheel>', self._on_wheel, add='+')
+        widget.bind('<Button-4>', self._on_wheel, add='+')
+        widget.bind('<Button-5>', self._on_wheel, add='+')
+        for child in widget.winfo_children():
+            self._bind_wheel(child)
+
+    def _on_wheel(self, event):
+        if event.num == 4 or getattr(event, 'delta', 0) > 0:
+            self.canvas.yview_scroll(-3, 'units')
+        else:
+            self.canvas.yview_scroll(3, 'units')
+        # A fast wheel sends many events; lay out once for the lot
+        if not self._refresh_pending:
+            self._refresh_pending = True
+            self.canvas.after_idle(self._refresh_after_wheel)
+
+    def _refresh_after_wheel(self):
+        self._refresh_pending = False
+        self.refresh()
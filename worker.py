@@ -0,0 +1,124 @@
+"""Worker pool for the background job queue defined in app.py.
+
+Run with ``python -m worker [--processes N]``. Each child process claims jobs
+from the ``job`` table and runs them; the parent restarts children that die
+and kills any child whose job runs past its timeout, so a hung PDF cannot
+block a worker forever. Failed or killed attempts are retried with backoff
+until the job runs out of attempts.
+
+Children may be killed at any moment, so nothing they share with the parent
+takes a lock: a child killed while holding one (as a ``multiprocessing.Event``
+waiter or a locked ``Value`` does) would leave the parent blocked on it for
+good. The stop flag and the job reports are plain shared memory instead, and
+idle children poll the flag.
+"""
+import argparse
+import multiprocessing
+import os
+import signal
+import socket
+import time
+
+from app import app, db, claim_job, fail_job, run_job
+
+STOP_POLL_INTERVAL = 0.2  # seconds between an idle child's checks of the stop flag
+
+
+class WorkerSlot:
+    """A child process plus the shared values it uses to report its current job"""
+    def __init__(self, index, stop):
+        self.index = index
+        self.stop = stop
+        self.job_id = multiprocessing.RawValue('i', 0)
+        self.attempts = multiprocessing.RawValue('i', 0)
+        self.timeout = multiprocessing.RawValue('d', 0.0)
+        self.started_at = multiprocessing.RawValue('d', 0.0)
+        self.process = None
+
+    def start(self):
+        self.job_id.value = 0
+        self.process = multiprocessing.Process(
+            target=work, name=f'bookverse-worker-{self.index}',
+            args=(self.stop, self.job_id, self.attempts, self.timeout, self.started_at),
+        )
+        self.process.start()
+
+    def overdue(self):
+        return self.job_id.value and time.time() - self.started_at.value > self.timeout.value
+
+
+def work(stop, job_id, attempts, timeout, started_at):
+    """Child process loop: claim a job, run it, repeat until asked to stop"""
+    # Ctrl+C and service managers signal the whole process group; the parent
+    # handles both and shuts children down through ``stop`` once their job ends
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    worker_name = f'{socket.gethostname()}:{os.getpid()}'
+    with app.app_context():
+        # Never reuse connections inherited from the parent across a fork
+        db.engine.dispose(close=False)
+        while not stop.value:
+            job = claim_job(worker_name)
+            if job is None:
+                idle_until = time.monotonic() + app.config['JOB_POLL_INTERVAL']
+                while not stop.value and time.monotonic() < idle_until:
+                    time.sleep(STOP_POLL_INTERVAL)
+                continue
+
+            started_at.value = time.time()
+            timeout.value = job.timeout
+            attempts.value = job.attempts
+            job_id.value = job.id
+            try:
+                run_job(job)
+            finally:
+                job_id.value = 0
+                db.session.remove()
+
+
+def supervise(processes):
+    # Let service managers stop the pool the same way as Ctrl+C
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    stop = multiprocessing.RawValue('b', 0)
+    slots = [WorkerSlot(index, stop) for index in range(processes)]
+    for slot in slots:
+        slot.start()
+    print(f'Started {processes} worker processes')
+
+    try:
+        with app.app_context():
+            while True:
+                for slot in slots:
+                    job_id, attempts = slot.job_id.value, slot.attempts.value
+                    if slot.overdue():
+                        # SIGTERM is ignored by children, and a hung job may never return to Python anyway
+                        slot.process.kill()
+                        slot.process.join()
+                        fail_job(job_id, attempts, f'Timed out after {slot.timeout.value:.0f} seconds')
+                        slot.start()
+                    elif not slot.process.is_alive():
+                        if job_id:
+                            fail_job(job_id, attempts, f'Worker exited with code {slot.process.exitcode}')
+                        slot.start()
+                db.session.remove()
+                time.sleep(1)
+    except KeyboardInterrupt:
+        print('Stopping workers')
+    finally:
+        stop.value = 1
+        for slot in slots:
+            slot.process.join(app.config['JOB_TIMEOUT'])
+            if slot.process.is_alive():
+                slot.process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run BookVerse background job workers.')
+    parser.add_argument('--processes', type=int, default=os.cpu_count() or 1,
+                        help='number of worker processes (default: one per CPU)')
+    args = parser.parse_args()
+    supervise(max(args.processes, 1))
+
+
+if __name__ == '__main__':
+    main()